@@ -0,0 +1,8 @@
+"""
+Performance benchmarks for mc_calculator. Not installed with the package;
+run them from a source checkout:
+
+    python -m benchmarks run --shape chain --size 500 --output chain.json
+    python -m benchmarks compare baseline.json chain.json
+    python -m benchmarks.bench_auto_log
+"""
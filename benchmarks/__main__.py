@@ -0,0 +1,88 @@
+"""
+Command line entry point of the benchmark suite.
+
+    python -m benchmarks run --shape chain --size 500 --output chain.json
+    python -m benchmarks run --shape random --size 100000 --repeat 3
+    python -m benchmarks compare baseline.json chain.json --threshold 0.1
+
+``compare`` exits with status 1 when any benchmark regressed.
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+from . import generators, suite
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the benchmark command line.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to sys.argv.
+
+    Returns:
+        int: The process exit status.
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="generate a database and time it")
+    run.add_argument(
+        "--shape", choices=sorted(generators.SHAPES), action="append"
+    )
+    run.add_argument("--size", type=int, default=1000, help="recipes to generate")
+    run.add_argument("--repeat", type=int, default=5, help="timed runs each")
+    run.add_argument("--qty", type=int, default=64, help="quantity to calculate")
+    run.add_argument(
+        "--loader", choices=("auto", "save", "import"), default="auto"
+    )
+    run.add_argument("--workdir", help="keep the generated databases here")
+    run.add_argument("--output", help="write JSON results to this file")
+
+    cmp = subparsers.add_parser("compare", help="flag regressions between runs")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument(
+        "--threshold",
+        type=float,
+        default=suite.DEFAULT_THRESHOLD,
+        help="relative slowdown to flag (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        reports = []
+        for shape in args.shape or sorted(generators.SHAPES):
+            report = suite.run_suite(
+                shape, args.size, args.repeat, args.qty, args.loader, args.workdir
+            )
+            print(suite.format_results(report), file=sys.stderr)
+            reports.append(report)
+        merged = {
+            "meta": {"runs": [report["meta"] for report in reports]},
+            "results": {
+                f"{report['meta']['shape']}.{name}": result
+                for report in reports
+                for name, result in report["results"].items()
+            },
+        }
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as stream:
+                json.dump(merged, stream, indent=2)
+        else:
+            json.dump(merged, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        return 0
+
+    rows = suite.compare(
+        suite.load_results(args.baseline),
+        suite.load_results(args.current),
+        args.threshold,
+    )
+    print(suite.format_comparison(rows))
+    return 1 if any(row["regressed"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Micro-benchmark of the auto_log decorator overhead.
+
+Times a trivial function bare and wrapped by auto_log with its logger
+disabled, enabled, and enabled with 1% sampling, and prints the cost per
+call in nanoseconds.
+
+    python -m benchmarks.bench_auto_log [--calls N]
+"""
+import argparse
+import logging
+import time
+from mc_calculator.decorator import auto_log, reset_timings
+
+LOGGER_NAME = "benchmarks.auto_log"
+
+
+def _noop(value):
+    return value
+
+
+def _time_per_call(func, calls: int) -> float:
+    start = time.perf_counter_ns()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter_ns() - start) / calls
+
+
+def run(calls: int) -> dict:
+    """
+    Runs the benchmark.
+
+    Args:
+        calls (int): Number of calls timed per variant.
+
+    Returns:
+        dict: Nanoseconds per call keyed by variant name.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.propagate = False
+    wrapped = auto_log(LOGGER_NAME)(_noop)
+    sampled = auto_log(LOGGER_NAME, sample_rate=0.01)(_noop)
+
+    results = {"bare": _time_per_call(_noop, calls)}
+    logger.setLevel(logging.WARNING)
+    results["disabled"] = _time_per_call(wrapped, calls)
+    logger.setLevel(logging.INFO)
+    results["enabled"] = _time_per_call(wrapped, calls)
+    results["sampled_1pct"] = _time_per_call(sampled, calls)
+    reset_timings()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+    results = run(args.calls)
+    for name, ns in results.items():
+        overhead = ns - results["bare"]
+        print(f"{name:>14}: {ns:8.1f} ns/call  (+{overhead:.1f} ns)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Deep-chain benchmark of the nested recipe walks.
+
+Builds a chain of recipes (10,000 deep by default), each needing one of the
+one below, and times every walk over it: the calculators, batch planning,
+the SQL expansion, printing deeply nested steps, the save-time cycle check,
+and detecting a cycle that closes the whole chain.
+
+    python -m benchmarks.bench_deep_chain [--size N] [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+from typing import Any, Callable, Dict
+from mc_calculator import database_ops as db
+from mc_calculator import recipe_logic as rl
+from mc_calculator import traversal
+from mc_calculator.batch import _plans, calculate_batch
+from mc_calculator.exceptions import RecipeCycleError
+from mc_calculator.recipe import Recipe
+from mc_calculator.recipe_graph import RecipeGraph, load_graph
+from . import generators
+from .suite import _measure
+
+
+def _expect_cycle(func: Callable[[], Any]) -> None:
+    try:
+        func()
+    except RecipeCycleError:
+        return
+    raise AssertionError("cycle not detected")
+
+
+def run(size: int, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs the benchmark. The default database is reconfigured to a
+    temporary one.
+
+    Args:
+        size (int): Depth of the chain.
+        repeat (int): Timed runs per benchmark.
+
+    Returns:
+        dict: Timings keyed by benchmark, as returned by suite._measure().
+    """
+    traversal.set_max_depth(max(traversal.MAX_DEPTH, size))
+    recipes = generators.chain(size)
+    with tempfile.TemporaryDirectory() as workdir:
+        db.configure(db_path=os.path.join(workdir, "bench_deep_chain.db"))
+        try:
+            return _run(recipes, repeat)
+        finally:
+            db.close_connections()
+
+
+def _run(recipes: list, repeat: int) -> Dict[str, Dict[str, Any]]:
+    size = len(recipes)
+    conn = db.get_connection()
+    generators.populate(recipes, conn, "save")
+    graph = load_graph(conn=conn)
+    root = graph.recipe(len(graph) - 1)
+
+    # Steps nested as deep as the chain, one level per recipe.
+    steps: list = []
+    for recipe in recipes[:-1]:
+        steps = [(recipe.name, 1, 1, steps, 0)]
+
+    def print_steps() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            rl.print_steps(steps)
+
+    def calculate_cold() -> None:
+        rl.expansion_cache.clear()
+        rl.calculate(root, 64, graph)
+
+    def plan_batch() -> None:
+        _plans.clear()
+        calculate_batch([(root.name, 64)], graph)
+
+    # The same chain closed into a loop: the bottom recipe needs the top one.
+    looped = recipes[:]
+    looped[0] = Recipe("R1", "ctable3", nested_recipes={size: 1})
+    cyclic = RecipeGraph.build(enumerate(looped, 1))
+
+    benchmarks: Dict[str, Callable[[], Any]] = {
+        "calculate": calculate_cold,
+        "calculate_aggregated": lambda: rl.calculate_aggregated(root, 64, graph),
+        "calculate_batch": plan_batch,
+        "fetch_base_ingredients": lambda: db.fetch_base_ingredients(
+            size, 64, conn=conn
+        ),
+        "print_steps": print_steps,
+        "check_for_cycles": lambda: db.check_for_cycles([size], conn=conn),
+        "detect_cycle": lambda: _expect_cycle(
+            lambda: rl.calculate(cyclic.recipe(0), 1, cyclic)
+        ),
+    }
+    return {name: _measure(func, repeat) for name, func in benchmarks.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for name, result in run(args.size, args.repeat).items():
+        if "error" in result:
+            print(f"{name:>24}: {result['error']}")
+        else:
+            print(f"{name:>24}: {result['median'] * 1e3:10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Scaling benchmark of calculate_many().
+
+Prices a sweep of random (recipe, quantity) requests against a generated
+graph, first in-process with calculate_batch() and then with 1, 2, 4, ...
+worker processes up to the CPU count, and reports throughput and speedup
+over one worker. Every variant builds all per-request results. Requests are
+aggregated, since unrolling the deep recipes of a random graph per branch
+grows exponentially.
+
+    python -m benchmarks.bench_parallel [--size N] [--requests N]
+"""
+import argparse
+import os
+import random
+import time
+from typing import Dict, List, Tuple
+from mc_calculator.batch import calculate_batch
+from mc_calculator.parallel import calculate_many
+from mc_calculator.recipe_graph import RecipeGraph
+from . import generators
+
+
+def _worker_counts(limit: int) -> List[int]:
+    counts = [1]
+    while counts[-1] * 2 <= limit:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != limit:
+        counts.append(limit)
+    return counts
+
+
+def run(size: int, requests: int, max_workers: int) -> Dict[str, float]:
+    """
+    Runs the benchmark.
+
+    Args:
+        size (int): Number of recipes to generate.
+        requests (int): Number of requests in the sweep.
+        max_workers (int): Largest worker count to try.
+
+    Returns:
+        dict: Seconds per variant, keyed "batch" and "workers=N".
+    """
+    graph = RecipeGraph.build(enumerate(generators.random_dag(size), 1))
+    rng = random.Random(0)
+    sweep: List[Tuple[str, int]] = [
+        (graph.names[rng.randrange(len(graph))], rng.randint(1, 1000))
+        for _ in range(requests)
+    ]
+    results = {}
+    start = time.perf_counter()
+    list(calculate_batch(sweep, graph, aggregate=True))
+    results["batch"] = time.perf_counter() - start
+    for workers in _worker_counts(max_workers):
+        start = time.perf_counter()
+        calculate_many(sweep, graph, aggregate=True, workers=workers)
+        results[f"workers={workers}"] = time.perf_counter() - start
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=1_000)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    results = run(args.size, args.requests, args.max_workers)
+    single = results.get("workers=1")
+    for name, seconds in results.items():
+        speedup = f"{single / seconds:5.2f}x" if name != "batch" else "     "
+        print(
+            f"{name:>12}: {seconds:8.3f} s  "
+            f"{args.requests / seconds:10.0f} requests/s  {speedup}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Decode benchmark of stored recipe payloads.
+
+Encodes generated recipes as JSON and in the binary layout, then reports
+the time per recipe to decode each: as fetched (binary names and slots
+still pending), and with every field accessed.
+
+    python -m benchmarks.bench_recipe_decode [--size N]
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+from mc_calculator.recipe import Recipe
+from . import generators
+
+
+def _ns_per_recipe(rows: List[tuple], decode: Callable[[tuple], object]) -> float:
+    start = time.perf_counter_ns()
+    for row in rows:
+        decode(row)
+    return (time.perf_counter_ns() - start) / len(rows)
+
+
+def _touch(recipe: Recipe) -> None:
+    for _ in recipe.ingredients.items():
+        pass
+    for _ in recipe.nested_recipes.items():
+        pass
+    recipe.slots  # pylint: disable=pointless-statement
+
+
+def run(size: int) -> Dict[str, float]:
+    """
+    Runs the benchmark.
+
+    Args:
+        size (int): Number of recipes to decode.
+
+    Returns:
+        dict: Nanoseconds per recipe keyed by variant, plus average payload
+        sizes in bytes.
+    """
+    recipes = generators.random_dag(size)
+    json_rows = [
+        (recipe.to_json(), json.dumps(dict(recipe.nested_recipes)))
+        for recipe in recipes
+    ]
+    binary_rows = [(recipe.to_bytes(), None) for recipe in recipes]
+    return {
+        "json": _ns_per_recipe(json_rows, lambda row: Recipe.from_row(*row)),
+        "json_full": _ns_per_recipe(
+            json_rows, lambda row: _touch(Recipe.from_row(*row))
+        ),
+        "binary": _ns_per_recipe(binary_rows, lambda row: Recipe.from_row(*row)),
+        "binary_full": _ns_per_recipe(
+            binary_rows, lambda row: _touch(Recipe.from_row(*row))
+        ),
+        "json_bytes": sum(len(a) + len(b) for a, b in json_rows) / size,
+        "binary_bytes": sum(len(a) for a, _ in binary_rows) / size,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100_000)
+    args = parser.parse_args()
+    results = run(args.size)
+    for name in ("json", "json_full", "binary", "binary_full"):
+        print(f"{name:>12}: {results[name]:8.0f} ns/recipe")
+    print(
+        f"     payload: {results['json_bytes']:.0f} B JSON, "
+        f"{results['binary_bytes']:.0f} B binary"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Memory benchmark of Recipe objects.
+
+Decodes generated recipes from their stored JSON, as fetches from the
+database do, and reports the bytes allocated per recipe by the compact
+Recipe and by a dict-per-field layout equivalent to the previous Recipe.
+
+    python -m benchmarks.bench_recipe_memory [--size N]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Any, Callable, Dict, List
+from mc_calculator.recipe import Recipe
+from . import generators
+
+
+class DictRecipe:
+    """
+    The previous Recipe layout: a __dict__ holding three plain dicts.
+    """
+
+    def __init__(self, data: Dict[str, Any], nested_recipes: Dict[str, int]) -> None:
+        self.name = data["name"]
+        self.crafting_block = data["crafting_block"]
+        self.output_count = data["output_count"]
+        self.shaped = data["shaped"]
+        self.slots = data["slots"] or {}
+        self.ingredients = data["ingredients"] or {}
+        self.nested_recipes = nested_recipes or {}
+
+
+def _bytes_per_recipe(
+    rows: List[tuple], decode: Callable[[str, str], Any]
+) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    recipes = [decode(recipe_json, nested_json) for recipe_json, nested_json in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del recipes
+    return (after - before) / len(rows)
+
+
+def run(size: int) -> Dict[str, float]:
+    """
+    Runs the benchmark.
+
+    Args:
+        size (int): Number of recipes to decode.
+
+    Returns:
+        dict: Bytes per recipe keyed by layout.
+    """
+    rows = [
+        (recipe.to_json(), json.dumps(dict(recipe.nested_recipes)))
+        for recipe in generators.random_dag(size)
+    ]
+    return {
+        "dict": _bytes_per_recipe(
+            rows,
+            lambda recipe_json, nested_json: DictRecipe(
+                json.loads(recipe_json), json.loads(nested_json)
+            ),
+        ),
+        "compact": _bytes_per_recipe(rows, Recipe.from_json),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100_000)
+    args = parser.parse_args()
+    results = run(args.size)
+    for name, per_recipe in results.items():
+        print(f"{name:>8}: {per_recipe:8.1f} bytes/recipe")
+    print(f"   saved: {1 - results['compact'] / results['dict']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
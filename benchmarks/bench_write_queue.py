@@ -0,0 +1,152 @@
+"""
+Concurrency stress benchmark of recipe saves under WAL.
+
+Writer threads save recipes while reader threads keep searching and reading
+them, first with one save_recipe_to_db() commit per recipe and then through
+a WriteQueue that groups pending saves into shared transactions, with each
+writer waiting for its saves to commit at the end. Reports saves and reads
+per second, transactions committed and any SQLite errors such as "database
+is locked".
+
+    python -m benchmarks.bench_write_queue [--writers N] [--saves N]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+from mc_calculator import database_ops as db
+from mc_calculator.recipe import Recipe
+
+
+def _stress(
+    db_path: str,
+    writers: int,
+    saves: int,
+    readers: int,
+    save: Callable[[db.ConnectionManager, Recipe], Any],
+) -> Dict[str, Any]:
+    errors: List[BaseException] = []
+    reads = [0] * readers
+    done = threading.Event()
+
+    def write(writer: int) -> None:
+        manager = db.ConnectionManager(db_path)
+        try:
+            recipes = (
+                Recipe(f"W{writer}-{i}", "ctable3", ingredients={"Ore": 1})
+                for i in range(saves)
+            )
+            pending = [save(manager, recipe) for recipe in recipes]
+            for result in pending:
+                if isinstance(result, Future):
+                    result.result()
+        except sqlite3.Error as exc:
+            errors.append(exc)
+        finally:
+            manager.close()
+
+    def read(reader: int) -> None:
+        manager = db.ConnectionManager(db_path)
+        conn = manager.connection()
+        try:
+            while not done.is_set():
+                db.search_recipes("W1", conn=conn)
+                db.fetch_recipe_summary(1, conn=conn)
+                reads[reader] += 1
+        except sqlite3.Error as exc:
+            errors.append(exc)
+        finally:
+            manager.close()
+
+    reader_threads = [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+    writer_threads = [threading.Thread(target=write, args=(n,)) for n in range(writers)]
+    for thread in reader_threads:
+        thread.start()
+    start = time.perf_counter()
+    for thread in writer_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for thread in reader_threads:
+        thread.join()
+    return {
+        "seconds": elapsed,
+        "saves_per_second": writers * saves / elapsed,
+        "reads_per_second": sum(reads) / elapsed,
+        "errors": len(errors),
+    }
+
+
+def run(
+    writers: int, saves: int, readers: int, flush_latency: float
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs the benchmark on temporary databases.
+
+    Args:
+        writers (int): Number of writer threads.
+        saves (int): Recipes saved by each writer.
+        readers (int): Number of reader threads.
+        flush_latency (float): Flush latency of the write queue, in seconds.
+
+    Returns:
+        dict: Results keyed "per_save_commit" and "write_queue".
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in ("per_save_commit", "write_queue"):
+            db_path = os.path.join(workdir, f"{name}.db")
+            manager = db.ConnectionManager(db_path)
+            db.setup_database(conn=manager.connection())
+            manager.close()
+            if name == "per_save_commit":
+                results[name] = _stress(
+                    db_path,
+                    writers,
+                    saves,
+                    readers,
+                    lambda manager, recipe: db.save_recipe_to_db(
+                        recipe, conn=manager.connection()
+                    ),
+                )
+                results[name]["transactions"] = writers * saves
+            else:
+                write_queue = db.WriteQueue(db_path, flush_latency)
+                results[name] = _stress(
+                    db_path,
+                    writers,
+                    saves,
+                    readers,
+                    lambda _, recipe: write_queue.save_recipe(recipe),
+                )
+                write_queue.close()
+                results[name]["transactions"] = write_queue.batches
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--saves", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument(
+        "--flush-latency", type=float, default=db.DEFAULT_FLUSH_LATENCY
+    )
+    args = parser.parse_args()
+    results = run(args.writers, args.saves, args.readers, args.flush_latency)
+    for name, result in results.items():
+        print(
+            f"{name:>16}: {result['saves_per_second']:8.0f} saves/s "
+            f"{result['reads_per_second']:8.0f} reads/s "
+            f"{result['transactions']:6d} transactions {result['errors']} errors"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Synthetic recipe graphs for benchmarks.
+
+Every generator returns recipes in insertion order, with nested recipes
+keyed by the ID each recipe gets when the list is saved into an empty
+database (1, 2, 3, ...). Children always precede their parents, so the last
+recipe is the root of the graph.
+"""
+import random
+import sqlite3
+from typing import Callable, Dict, List, Optional
+from mc_calculator import database_ops as db
+from mc_calculator import recipe_io
+from mc_calculator.recipe import Recipe
+
+# Recipes saved one by one through save_recipe_to_db up to this size; larger
+# graphs go through the bulk importer unless a loader is chosen explicitly.
+SAVE_LOADER_LIMIT = 20_000
+
+
+def _recipe(
+    index: int,
+    ingredients: Optional[Dict[str, int]] = None,
+    nested_recipes: Optional[Dict[int, int]] = None,
+    output_count: int = 1,
+) -> Recipe:
+    return Recipe(
+        name=f"R{index}",
+        crafting_block="ctable3",
+        output_count=output_count,
+        ingredients=ingredients or {},
+        nested_recipes=nested_recipes or {},
+    )
+
+
+def chain(size: int) -> List[Recipe]:
+    """
+    A single chain: each recipe needs one of the previous one.
+
+    Args:
+        size (int): Number of recipes, i.e. the depth of the chain.
+
+    Returns:
+        list: The recipes.
+    """
+    recipes = [_recipe(1, ingredients={"Ore": 1})]
+    for index in range(2, size + 1):
+        recipes.append(
+            _recipe(index, ingredients={"Fuel": 1}, nested_recipes={index - 1: 1})
+        )
+    return recipes
+
+
+def fanout(size: int) -> List[Recipe]:
+    """
+    One root recipe needing every other recipe once.
+
+    Args:
+        size (int): Number of recipes, including the root.
+
+    Returns:
+        list: The recipes.
+    """
+    recipes = [
+        _recipe(index, ingredients={f"Item{index % 100}": 2}, output_count=3)
+        for index in range(1, size)
+    ]
+    recipes.append(
+        _recipe(size, nested_recipes={index: 1 for index in range(1, size)})
+    )
+    return recipes
+
+
+def diamond(size: int, width: int = 4) -> List[Recipe]:
+    """
+    Layers of ``width`` recipes where every recipe needs every recipe of the
+    layer below, so each intermediate is shared by many parents.
+
+    Args:
+        size (int): Approximate number of recipes.
+        width (int): Recipes per layer.
+
+    Returns:
+        list: The recipes.
+    """
+    layers = max(1, (size - 1) // width)
+    recipes = [
+        _recipe(index, ingredients={"Ore": 1}, output_count=2)
+        for index in range(1, width + 1)
+    ]
+    for layer in range(1, layers):
+        below = range(len(recipes) - width + 1, len(recipes) + 1)
+        for _ in range(width):
+            recipes.append(
+                _recipe(
+                    len(recipes) + 1,
+                    ingredients={"Fuel": 1},
+                    nested_recipes={child: 1 for child in below},
+                    output_count=2,
+                )
+            )
+    below = range(len(recipes) - width + 1, len(recipes) + 1)
+    recipes.append(
+        _recipe(len(recipes) + 1, nested_recipes={child: 1 for child in below})
+    )
+    return recipes
+
+
+def random_dag(
+    size: int, max_children: int = 4, items: int = 1000, seed: int = 0
+) -> List[Recipe]:
+    """
+    A random DAG resembling a large modpack: each recipe has one to three
+    base ingredients and up to ``max_children`` earlier recipes as nested
+    recipes. The root needs a sample of the most recent recipes.
+
+    Args:
+        size (int): Number of recipes.
+        max_children (int): Maximum nested recipes per recipe.
+        items (int): Number of distinct base ingredients.
+        seed (int): Random seed, so runs are comparable.
+
+    Returns:
+        list: The recipes.
+    """
+    rng = random.Random(seed)
+    recipes = []
+    for index in range(1, size):
+        children = min(index - 1, rng.randint(0, max_children))
+        # Prefer recent recipes, so chains get deep as the graph grows.
+        nested = {
+            max(1, index - 1 - int(rng.expovariate(1 / 50))): rng.randint(1, 4)
+            for _ in range(children)
+        }
+        ingredients = {
+            f"Item{rng.randrange(items)}": rng.randint(1, 8)
+            for _ in range(rng.randint(1, 3))
+        }
+        recipes.append(
+            _recipe(index, ingredients, nested, output_count=rng.randint(1, 4))
+        )
+    recipes.append(
+        _recipe(
+            size,
+            nested_recipes={
+                child: 1 for child in range(max(1, size - 16), max(1, size))
+            },
+        )
+    )
+    return recipes
+
+
+SHAPES: Dict[str, Callable[[int], List[Recipe]]] = {
+    "chain": chain,
+    "fanout": fanout,
+    "diamond": diamond,
+    "random": random_dag,
+}
+
+
+def populate(
+    recipes: List[Recipe], conn: sqlite3.Connection, loader: str = "auto"
+) -> str:
+    """
+    Creates the schema and stores generated recipes in an empty database.
+
+    Args:
+        recipes (list): Recipes from one of the generators.
+        conn (sqlite3.Connection): Connection to the empty database.
+        loader (str): "save" to call save_recipe_to_db per recipe, "import"
+        for recipe_io.import_recipes, or "auto" to pick by size.
+
+    Returns:
+        str: The loader used.
+    """
+    if loader == "auto":
+        loader = "save" if len(recipes) <= SAVE_LOADER_LIMIT else "import"
+    db.setup_database(conn=conn)
+    if loader == "save":
+        for recipe in recipes:
+            db.save_recipe_to_db(recipe, conn=conn)
+    elif loader == "import":
+        recipe_io.import_recipes(
+            (
+                {
+                    "name": recipe.name,
+                    "output_count": recipe.output_count,
+                    "ingredients": dict(recipe.ingredients),
+                    "nested_recipes": {
+                        recipes[n_id - 1].name: qty
+                        for n_id, qty in recipe.nested_recipes.items()
+                    },
+                }
+                for recipe in recipes
+            ),
+            conn=conn,
+        )
+    else:
+        raise ValueError(f"Unknown loader: {loader}")
+    return loader
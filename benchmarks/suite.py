@@ -0,0 +1,242 @@
+"""
+Benchmark suite: times the calculator's main operations against a synthetic
+database and compares result files to flag regressions.
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+from mc_calculator import database_ops as db
+from mc_calculator import recipe_logic as rl
+from mc_calculator.recipe_graph import load_graph, refresh_graph
+from . import generators
+
+# A benchmark regresses when its median grows by more than this fraction.
+DEFAULT_THRESHOLD = 0.10
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    Times ``repeat`` calls of ``func``. Failures (e.g. RecursionError on
+    very deep graphs) are recorded instead of aborting the suite.
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception as exc:  # pylint: disable=broad-except
+            return {"error": f"{type(exc).__name__}: {exc}"[:200]}
+        seconds.append(time.perf_counter() - start)
+    return {
+        "runs": seconds,
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+    }
+
+
+def _cold_start(db_path: str) -> None:
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(rl.__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [package_root, env.get("PYTHONPATH")])
+    )
+    subprocess.run(
+        [sys.executable, "-m", "mc_calculator", "--db", db_path, "list"],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        cwd=os.path.dirname(db_path),
+        env=env,
+    )
+
+
+def run_suite(
+    shape: str,
+    size: int,
+    repeat: int = 5,
+    quantity: int = 64,
+    loader: str = "auto",
+    workdir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Generates a database and times every benchmark against it. The default
+    database is reconfigured to the generated one.
+
+    Args:
+        shape (str): One of generators.SHAPES.
+        size (int): Number of recipes to generate.
+        repeat (int): Timed runs per benchmark.
+        quantity (int): Quantity of the root recipe to calculate.
+        loader (str): How to store the recipes, see generators.populate().
+        workdir (str, optional): Directory for the database file. Defaults to
+        a temporary directory.
+
+    Returns:
+        dict: "meta" describing the run and "results" keyed by benchmark.
+    """
+    recipes = generators.SHAPES[shape](size)
+    with contextlib.ExitStack() as stack:
+        if workdir is None:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+        db_path = os.path.abspath(os.path.join(workdir, f"bench_{shape}.db"))
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        db.configure(db_path=db_path)
+        conn = db.get_connection()
+
+        results: Dict[str, Dict[str, Any]] = {}
+        start = time.perf_counter()
+        used_loader = generators.populate(recipes, conn, loader)
+        elapsed = time.perf_counter() - start
+        results["bulk_insert"] = {
+            "runs": [elapsed],
+            "min": elapsed,
+            "median": elapsed,
+            "loader": used_loader,
+            "recipes_per_second": len(recipes) / elapsed if elapsed else None,
+        }
+
+        graph = refresh_graph()
+        root = graph.recipe(len(graph) - 1)
+        runs = -(-quantity // root.output_count)
+
+        def calculate_cold() -> None:
+            rl.expansion_cache.clear()
+            rl.calculate(root, quantity, graph)
+
+        def print_steps() -> None:
+            _, steps = rl.calculate(root, quantity, graph)
+            with contextlib.redirect_stdout(io.StringIO()):
+                rl.print_steps(steps)
+
+        benchmarks: Dict[str, Callable[[], Any]] = {
+            "load_graph": lambda: load_graph(conn=conn),
+            "list_recipes": lambda: db.list_recipes(conn=conn),
+            "search_recipes": lambda: db.search_recipes(
+                f"R{len(graph) // 2}", conn=conn
+            ),
+            "calculate": calculate_cold,
+            "calculate_warm": lambda: rl.calculate(root, quantity, graph),
+            "calculate_aggregated": lambda: rl.calculate_aggregated(
+                root, quantity, graph
+            ),
+            "calculate_base_ingredients": lambda: rl.calculate_base_ingredients(
+                root, runs, graph
+            ),
+            "print_steps": print_steps,
+        }
+        for name, func in benchmarks.items():
+            results[name] = _measure(func, repeat)
+        conn.commit()
+        db.close_connections()
+        results["cold_start"] = _measure(lambda: _cold_start(db_path), repeat)
+
+    return {
+        "meta": {
+            "shape": shape,
+            "size": len(recipes),
+            "quantity": quantity,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[Dict[str, Any]]:
+    """
+    Compares the medians of two result files.
+
+    Args:
+        baseline (dict): Results of the reference run.
+        current (dict): Results of the run to check.
+        threshold (float): Relative slowdown above which a benchmark is
+        flagged, e.g. 0.10 for 10%.
+
+    Returns:
+        list: One dict per benchmark present in both runs with "name",
+        "baseline", "current", "ratio" and "regressed".
+    """
+    rows = []
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None or "median" not in base or "median" not in cur:
+            continue
+        ratio = cur["median"] / base["median"] if base["median"] else float("inf")
+        rows.append(
+            {
+                "name": name,
+                "baseline": base["median"],
+                "current": cur["median"],
+                "ratio": ratio,
+                "regressed": ratio > 1 + threshold,
+            }
+        )
+    return rows
+
+
+def format_results(report: Dict[str, Any]) -> str:
+    """
+    Formats a result file as a table of medians.
+
+    Args:
+        report (dict): Output of run_suite().
+
+    Returns:
+        str: The table.
+    """
+    meta = report["meta"]
+    lines = [f"{meta['shape']} ({meta['size']} recipes, qty {meta['quantity']}):"]
+    for name, result in report["results"].items():
+        if "error" in result:
+            lines.append(f"  {name:<36} {result['error']}")
+        else:
+            lines.append(f"  {name:<36} {result['median'] * 1e3:10.3f} ms")
+    return "\n".join(lines)
+
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    """
+    Formats the output of compare() as a table.
+
+    Args:
+        rows (list): Output of compare().
+
+    Returns:
+        str: The table, with regressions marked.
+    """
+    lines = []
+    for row in rows:
+        flag = "  REGRESSION" if row["regressed"] else ""
+        lines.append(
+            f"  {row['name']:<36} {row['baseline'] * 1e3:10.3f} ms -> "
+            f"{row['current'] * 1e3:10.3f} ms ({row['ratio']:.2f}x){flag}"
+        )
+    return "\n".join(lines)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """
+    Reads a result file written by ``python -m benchmarks run``.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        dict: The results.
+    """
+    with open(path, encoding="utf-8") as stream:
+        return json.load(stream)
@@ -2,12 +2,17 @@
 This module is the entry point for the Minecraft Recipe Calculator application.
 
 It provides a menu-driven interface for interacting with the application, enabling users to create,
-list, and calculate ingredients for recipes, as well as exit the application.
+list, and calculate ingredients for recipes, as well as exit the application. Subcommands such as
+``calc``, ``list``, ``show``, ``import`` and ``export`` run a single task non-interactively, so the
+calculator can be scripted, and ``serve`` runs it as an HTTP/JSON service. Modules are imported
+lazily by the commands that need them to keep one-shot invocations fast to start. ``--set`` picks
+the recipe set (one database per modpack) to work on, and ``sets`` lists the sets.
 """
+import argparse
 import logging
-from . import database_ops as db
-from .decorator import auto_log
-from . import recipe_logic as rl
+import sys
+from typing import Any, Dict, List, Optional
+from .decorator import auto_log, log_timings
 
 MC_CALC_TITLE = """
       __      __             __                 ___  __   __  
@@ -29,20 +34,17 @@ def display_credits() -> None:
 
 
 @auto_log(__name__)
-def main() -> None:
+def run_menu() -> None:
     """
-    Main function to run the Minecraft Recipe Calculator application.
+    Runs the interactive menu of the Minecraft Recipe Calculator application.
 
     This function provides a menu-driven interface for the user to interact with the application.
     It allows users to create new recipes, list all recipes, calculate ingredients for a recipe,
     and exit the application.
     """
-    logging.basicConfig(
-        level=logging.DEBUG,
-        filename="mccalculator.log",
-        filemode="a",
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    )
+    from . import database_ops as db
+    from . import recipe_logic as rl
+
     print("Setting up DB. This may take a moment. . .")
     db.setup_database()
     print(MC_CALC_TITLE)
@@ -69,5 +71,477 @@ def main() -> None:
             print("Invalid option.")
 
 
+@auto_log(__name__)
+def import_command(args: argparse.Namespace) -> int:
+    """
+    Imports recipes from a JSON Lines or CSV file.
+    """
+    from . import database_ops as db
+    from . import recipe_io
+
+    db.setup_database()
+    if args.path == "-":
+        records = recipe_io.read_records(sys.stdin, args.format or "jsonl")
+        count = recipe_io.import_recipes(records)
+    else:
+        count = recipe_io.import_file(args.path, args.format)
+    print(f"Imported {count} recipe(s).")
+    return 0
+
+
+@auto_log(__name__)
+def export_command(args: argparse.Namespace) -> int:
+    """
+    Exports every recipe to a JSON Lines or CSV file.
+    """
+    from . import database_ops as db
+    from . import recipe_io
+
+    db.setup_database()
+    if args.path == "-":
+        records = recipe_io.iter_export_records()
+        recipe_io.write_records(records, sys.stdout, args.format or "jsonl")
+    else:
+        count = recipe_io.export_file(args.path, args.format)
+        print(f"Exported {count} recipe(s).")
+    return 0
+
+
+def _print_json(data: Any) -> None:
+    import json
+
+    json.dump(data, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+@auto_log(__name__)
+def calc_command(args: argparse.Namespace) -> int:
+    """
+    Calculates the ingredients and steps for a quantity of a recipe.
+
+    With --profile or --metrics-file, metrics are recorded for the run and
+    reported afterwards.
+    """
+    from . import metrics
+
+    profiling = args.profile or args.metrics_file
+    if profiling:
+        metrics.enable()
+    try:
+        return _run_calc(args)
+    finally:
+        if args.profile:
+            print(metrics.format_report(), file=sys.stderr)
+        if args.metrics_file:
+            metrics.write_prometheus(args.metrics_file)
+
+
+def _run_calc(args: argparse.Namespace) -> int:
+    from . import database_ops as db
+    from . import recipe_logic as rl
+    from . import rendering
+    from . import traversal
+    from .exceptions import RecipeCycleError, RecipeDepthError
+    from .recipe_graph import get_graph
+
+    if args.max_depth is not None:
+        traversal.set_max_depth(args.max_depth)
+    db.setup_database()
+    graph = get_graph()
+    node = graph.node_by_name(args.recipe)
+    if node is None:
+        found = db.resolve_recipe_name(args.recipe)
+        if found is None or found[0] == db.current_recipe_set():
+            print(f"Recipe not found: {args.recipe}", file=sys.stderr)
+            return 1
+        # A recipe shared by every set, e.g. a vanilla one.
+        db.select_recipe_set(found[0])
+        graph = get_graph()
+        node = graph.node_by_name(args.recipe)
+    try:
+        if args.format == "text":
+            rl.calculate_ingredients(args.recipe, args.qty, graph, args.aggregate)
+            return 0
+        calculator = rl.calculate_aggregated if args.aggregate else rl.calculate
+        ingredients, steps = calculator(graph.recipe(node), args.qty, graph)
+        if args.format != "json":
+            sink = rendering.make_sink(args.format)
+            rendering.render_steps(steps, sink, graph)
+            return 0
+    except (RecipeCycleError, RecipeDepthError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    _print_json(rl.calculation_to_dict(args.recipe, args.qty, ingredients, steps))
+    return 0
+
+
+@auto_log(__name__)
+def list_command(args: argparse.Namespace) -> int:
+    """
+    Lists every recipe with its ID and output count.
+    """
+    from . import database_ops as db
+
+    db.setup_database()
+    recipes = db.list_recipes()
+    if args.format == "json":
+        _print_json(
+            [
+                {"id": recipe_id, "name": name, "output_count": output_count}
+                for recipe_id, name, output_count in recipes
+            ]
+        )
+    else:
+        for recipe_id, name, output_count in recipes:
+            print(f"{recipe_id}. {name} (Output: {output_count})")
+    return 0
+
+
+@auto_log(__name__)
+def search_command(args: argparse.Namespace) -> int:
+    """
+    Lists a page of the recipes whose name starts with a prefix.
+    """
+    from . import database_ops as db
+
+    db.setup_database()
+    try:
+        recipes = db.search_recipes(args.query, args.limit + 1, args.after)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    next_after = recipes[args.limit - 1][0] if len(recipes) > args.limit else None
+    recipes = recipes[: args.limit]
+    if args.format == "json":
+        _print_json(
+            {
+                "recipes": [
+                    {"id": recipe_id, "name": name, "output_count": output_count}
+                    for recipe_id, name, output_count in recipes
+                ],
+                "next_after": next_after,
+            }
+        )
+    else:
+        for recipe_id, name, output_count in recipes:
+            print(f"{recipe_id}. {name} (Output: {output_count})")
+        if next_after is not None:
+            print(f"More matches: add --after {next_after}", file=sys.stderr)
+    return 0
+
+
+@auto_log(__name__)
+def show_command(args: argparse.Namespace) -> int:
+    """
+    Shows a single recipe, with nested recipes referenced by name.
+    """
+    from . import database_ops as db
+
+    db.setup_database()
+    recipe = db.fetch_recipe_by_name(args.recipe)
+    if recipe is None:
+        print(f"Recipe not found: {args.recipe}", file=sys.stderr)
+        return 1
+    nested = db.fetch_recipes_by_ids(recipe.nested_recipes)
+    nested_recipes: Dict[str, int] = {
+        nested[int(n_id)].name: qty
+        for n_id, qty in recipe.nested_recipes.items()
+        if int(n_id) in nested
+    }
+    if args.format == "json":
+        _print_json(
+            {
+                "name": recipe.name,
+                "output_count": recipe.output_count,
+                "shaped": bool(recipe.shaped),
+                "crafting_block": getattr(recipe.crafting_block, "name", None),
+                "ingredients": dict(recipe.ingredients),
+                "nested_recipes": nested_recipes,
+            }
+        )
+    else:
+        print(f"{recipe.name} (Output: {recipe.output_count})")
+        for ingredient, quantity in recipe.ingredients.items():
+            print(f"- {quantity} {ingredient}")
+        for name, quantity in nested_recipes.items():
+            print(f"- {quantity} {name} (recipe)")
+    return 0
+
+
+@auto_log(__name__)
+def snapshot_command(args: argparse.Namespace) -> int:
+    """
+    Writes the compiled recipe graph to a snapshot file that later runs map
+    instead of compiling the graph from the database.
+    """
+    from . import database_ops as db
+    from . import snapshot
+
+    db.setup_database()
+    path = args.path or snapshot.snapshot_path()
+    count = snapshot.write_snapshot(path)
+    print(f"Wrote a snapshot of {count} recipe(s) to {path}.")
+    return 0
+
+
+@auto_log(__name__)
+def sets_command(args: argparse.Namespace) -> int:
+    """
+    Lists the recipe sets, marking the shared one and the current one.
+    """
+    from . import database_ops as db
+
+    names = db.list_recipe_sets()
+    if args.format == "json":
+        _print_json(
+            {
+                "sets": names,
+                "shared": db.SHARED_SET,
+                "current": db.current_recipe_set(),
+            }
+        )
+        return 0
+    for name in names:
+        marks = [
+            label
+            for label, flag in (
+                ("shared", name == db.SHARED_SET),
+                ("current", name == db.current_recipe_set()),
+            )
+            if flag
+        ]
+        print(f"{name} ({', '.join(marks)})" if marks else name)
+    if not names:
+        print(f"No recipe sets in {db.RECIPE_SETS_DIR}.")
+    return 0
+
+
+@auto_log(__name__)
+def serve_command(args: argparse.Namespace) -> int:
+    """
+    Serves the calculator over HTTP until interrupted.
+    """
+    import asyncio
+    from . import database_ops as db
+    from . import server
+
+    db.setup_database()
+    print(f"Serving on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _positive_int(value: str) -> int:
+    """
+    Parses a command line argument that must be a positive integer.
+
+    Raises:
+        argparse.ArgumentTypeError: If it is not one.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value!r}")
+    return number
+
+
+def _port(value: str) -> int:
+    """
+    Parses a command line argument that must be a TCP port number, 0 to
+    65535 (0 picks a free port).
+
+    Raises:
+        argparse.ArgumentTypeError: If it is not one.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if not 0 <= number <= 65535:
+        raise argparse.ArgumentTypeError(f"must be a port from 0 to 65535: {value!r}")
+    return number
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Builds the command line parser. Without a subcommand the interactive
+    menu is started.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog="mc-calculator", description="Minecraft recipe calculator"
+    )
+    parser.add_argument(
+        "--db",
+        help="recipe database file (default: $MC_CALCULATOR_DB or minecraft_recipes.db)",
+    )
+    parser.add_argument(
+        "--set",
+        metavar="NAME",
+        help="work on the recipe set NAME, stored in "
+        "$MC_CALCULATOR_SETS_DIR/NAME.db, instead of --db "
+        "(default: $MC_CALCULATOR_SET)",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+        help="level logged to mccalculator.log "
+        "(default: DEBUG for the menu, WARNING for subcommands)",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    calc = subparsers.add_parser("calc", help="calculate ingredients for a recipe")
+    calc.add_argument("--recipe", required=True, help="recipe name")
+    calc.add_argument(
+        "--qty", type=_positive_int, default=1, help="quantity to make (default: 1)"
+    )
+    calc.add_argument(
+        "--aggregate",
+        action="store_true",
+        help="share leftovers of intermediates between branches",
+    )
+    calc.add_argument(
+        "--max-depth",
+        type=_positive_int,
+        metavar="N",
+        help="maximum nesting depth to follow "
+        "(default: $MC_CALCULATOR_MAX_DEPTH or 10000)",
+    )
+    calc.add_argument(
+        "--profile",
+        action="store_true",
+        help="print query, cache, traversal and timing metrics to stderr",
+    )
+    calc.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        help="write the metrics to PATH in Prometheus text format",
+    )
+    calc.set_defaults(func=calc_command)
+
+    list_parser = subparsers.add_parser("list", help="list all recipes")
+    list_parser.set_defaults(func=list_command)
+
+    search = subparsers.add_parser(
+        "search", help="find recipes by name prefix, a page at a time"
+    )
+    search.add_argument(
+        "query", nargs="?", default="", help="name prefix, case-insensitive"
+    )
+    search.add_argument(
+        "--limit",
+        type=_positive_int,
+        default=20,
+        help="recipes per page (default: 20)",
+    )
+    search.add_argument(
+        "--after",
+        type=int,
+        metavar="ID",
+        help="continue after the recipe with this ID (the last one shown)",
+    )
+    search.set_defaults(func=search_command)
+
+    show = subparsers.add_parser("show", help="show a recipe")
+    show.add_argument("recipe", help="recipe name")
+    show.set_defaults(func=show_command)
+
+    snapshot = subparsers.add_parser(
+        "snapshot", help="write the recipe graph to a snapshot for fast startup"
+    )
+    snapshot.add_argument(
+        "path",
+        nargs="?",
+        help="snapshot file (default: the database path plus .graph, "
+        "where it is used automatically)",
+    )
+    snapshot.set_defaults(func=snapshot_command)
+
+    sets = subparsers.add_parser("sets", help="list the recipe sets")
+    sets.set_defaults(func=sets_command)
+
+    serve = subparsers.add_parser("serve", help="serve the calculator over HTTP")
+    serve.add_argument("--host", default="127.0.0.1", help="default: 127.0.0.1")
+    serve.add_argument("--port", type=_port, default=8080, help="default: 8080")
+    serve.add_argument(
+        "--workers",
+        type=_positive_int,
+        help="maximum concurrent calculations (default: CPU count, at most 4)",
+    )
+    serve.set_defaults(func=serve_command)
+
+    calc.add_argument(
+        "--format",
+        choices=("text", "json", "jsonl", "markdown", "csv"),
+        default="text",
+        help="jsonl, markdown and csv print only the steps (default: text)",
+    )
+    for sub in (list_parser, search, show, sets):
+        sub.add_argument("--format", choices=("text", "json"), default="text")
+
+    for name, func, help_text in (
+        ("import", import_command, "import recipes from a JSONL or CSV file"),
+        ("export", export_command, "export all recipes to a JSONL or CSV file"),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("path", help="file path, or - for stdin/stdout")
+        sub.add_argument(
+            "--format",
+            choices=("jsonl", "csv"),
+            help="file format (default: guessed from the extension)",
+        )
+        sub.set_defaults(func=func)
+    return parser
+
+
+@auto_log(__name__)
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Main function to run the Minecraft Recipe Calculator application.
+
+    Runs the requested subcommand, or the interactive menu if none is given.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to sys.argv.
+
+    Returns:
+        int: The process exit status.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    default_level = "DEBUG" if args.command is None else "WARNING"
+    logging.basicConfig(
+        level=getattr(logging, args.log_level or default_level),
+        filename="mccalculator.log",
+        filemode="a",
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    if args.db:
+        from . import database_ops as db
+
+        db.configure(db_path=args.db)
+    if args.set:
+        from . import database_ops as db
+
+        try:
+            db.select_recipe_set(args.set)
+        except ValueError as exc:
+            parser.error(str(exc))
+    try:
+        if args.command is None:
+            run_menu()
+            return 0
+        return args.func(args)
+    finally:
+        log_timings()
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+This module provides an asyncio API for the calculator, for applications
+such as chat bots that serve many users from one event loop.
+
+SQLite is only touched from a dedicated database thread, so queries never
+block the event loop and share that thread's managed connection.
+Calculations run on a small pool of worker threads against the compiled
+recipe graph. Identical requests that are in flight at the same time are
+coalesced: every caller awaits one shared computation, and results are
+shared between them, so treat them as read-only.
+
+Calls run against the current recipe set of the calling task; wrap them in
+``database_ops.use_recipe_set(name)`` to pick another. Requests are only
+coalesced with identical ones for the same set.
+
+Cancelling a call stops waiting for it at once. A computation is cancelled
+when its last waiter is; if it was still queued it never runs, and if it
+had already started, the calculation stops at the next recipe it expands
+(see traversal.cancellation()), freeing its compute worker.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from . import database_ops as db
+from . import recipe_logic as rl
+from . import recipe_graph
+from . import traversal
+from .recipe import Recipe
+from .recipe_graph import RecipeGraph
+
+DEFAULT_COMPUTE_WORKERS = min(4, os.cpu_count() or 1)
+_compute_workers = DEFAULT_COMPUTE_WORKERS
+
+_executor_lock = threading.Lock()
+_db_executor: Optional[ThreadPoolExecutor] = None
+_compute_executor: Optional[ThreadPoolExecutor] = None
+# In-flight computations keyed by (event loop, recipe set, request key).
+_inflight: Dict[Tuple[int, Optional[str], Hashable], "_Shared"] = {}
+
+
+def _executors() -> Tuple[ThreadPoolExecutor, ThreadPoolExecutor]:
+    global _db_executor, _compute_executor
+    if _db_executor is None or _compute_executor is None:
+        with _executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="mc-calculator-db"
+                )
+            if _compute_executor is None:
+                _compute_executor = ThreadPoolExecutor(
+                    max_workers=_compute_workers,
+                    thread_name_prefix="mc-calculator-compute",
+                )
+    return _db_executor, _compute_executor
+
+
+def configure(compute_workers: int) -> None:
+    """
+    Sets the size of the compute pool, replacing the current pool.
+
+    Args:
+        compute_workers (int): Maximum number of concurrent calculations.
+
+    Raises:
+        ValueError: If compute_workers is less than 1.
+    """
+    global _compute_workers
+    if compute_workers < 1:
+        raise ValueError("compute_workers must be at least 1")
+    _compute_workers = compute_workers
+    shutdown(wait=False)
+
+
+def shutdown(wait: bool = True) -> None:
+    """
+    Stops the database and compute threads. They are started again on the
+    next call.
+
+    Args:
+        wait (bool): Wait for running work to finish.
+    """
+    global _db_executor, _compute_executor
+    with _executor_lock:
+        executors = (_db_executor, _compute_executor)
+        _db_executor = _compute_executor = None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+async def run_db(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Runs a function on the database thread.
+
+    Args:
+        func (callable): Typically a database_ops function; it receives the
+        thread's managed connection through with_db_connection.
+        *args: Positional arguments for ``func``.
+
+    Returns:
+        The function's return value.
+    """
+    db_executor, _ = _executors()
+    # Run in a copy of the caller's context, so it sees its recipe set.
+    call = functools.partial(contextvars.copy_context().run, func, *args)
+    return await asyncio.get_running_loop().run_in_executor(db_executor, call)
+
+
+async def run_compute(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Runs a CPU-bound function on the compute pool.
+
+    Args:
+        func (callable): The function to run.
+        *args: Positional arguments for ``func``.
+
+    Returns:
+        The function's return value.
+    """
+    _, compute_executor = _executors()
+    call = functools.partial(contextvars.copy_context().run, func, *args)
+    return await asyncio.get_running_loop().run_in_executor(compute_executor, call)
+
+
+class _Shared:
+    """
+    One in-flight computation and the number of callers awaiting it.
+    """
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+async def coalesce(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Awaits the computation for ``key``, starting it with ``factory`` unless
+    an identical one is already in flight on this event loop.
+
+    Args:
+        key (hashable): Identifies the request, e.g. its name and arguments.
+        factory (callable): Returns the awaitable that computes the result.
+
+    Returns:
+        The shared result.
+    """
+    inflight_key = (id(asyncio.get_running_loop()), db.current_recipe_set(), key)
+    shared = _inflight.get(inflight_key)
+    if shared is None:
+        shared = _Shared(asyncio.ensure_future(factory()))
+        _inflight[inflight_key] = shared
+
+        def forget(_: "asyncio.Task[Any]", entry: _Shared = shared) -> None:
+            if _inflight.get(inflight_key) is entry:
+                del _inflight[inflight_key]
+
+        shared.task.add_done_callback(forget)
+
+    shared.waiters += 1
+    try:
+        return await asyncio.shield(shared.task)
+    finally:
+        shared.waiters -= 1
+        if not shared.waiters and not shared.task.done():
+            shared.task.cancel()
+
+
+async def get_graph() -> RecipeGraph:
+    """
+    Get the shared recipe graph of the current recipe set, compiling it on
+    the database thread if a recipe has been saved since it was built.
+
+    Returns:
+        RecipeGraph: The up-to-date graph.
+    """
+    return await coalesce(("graph", db.data_version()), _load_graph)
+
+
+async def _load_graph() -> RecipeGraph:
+    return await run_db(recipe_graph.get_graph)
+
+
+async def fetch_recipe_by_name(recipe_name: str) -> Optional[Recipe]:
+    """
+    Get a recipe from the database by name.
+
+    Args:
+        recipe_name (str): The name of the recipe to query for.
+
+    Returns:
+        Recipe object, or None if there is no such recipe.
+    """
+    return await coalesce(
+        ("fetch_recipe_by_name", recipe_name),
+        lambda: run_db(db.fetch_recipe_by_name, recipe_name),
+    )
+
+
+async def list_recipes() -> List[Tuple[int, str, int]]:
+    """
+    Get all recipes.
+
+    Returns:
+        A list of (id, name, output_count) for all recipes in DB.
+    """
+    return await coalesce(("list_recipes",), lambda: run_db(db.list_recipes))
+
+
+async def search_recipes(
+    query: str = "", limit: int = db.SEARCH_PAGE_SIZE, after: Optional[int] = None
+) -> List[Tuple[int, str, int]]:
+    """
+    Get a page of the recipes whose name starts with a prefix; see
+    database_ops.search_recipes().
+
+    Args:
+        query (str): The name prefix, matched ignoring ASCII case.
+        limit (int): Maximum number of recipes to return.
+        after (int, optional): ID of the last recipe of the previous page.
+
+    Returns:
+        A list of (id, name, output_count).
+    """
+    return await coalesce(
+        ("search_recipes", query, limit, after),
+        lambda: run_db(db.search_recipes, query, limit, after),
+    )
+
+
+async def save_recipe(recipe: Recipe) -> int:
+    """
+    Saves a recipe through the current recipe set's write queue, so saves
+    from many tasks share transactions; see database_ops.WriteQueue.
+
+    Args:
+        recipe (Recipe): The recipe to be saved.
+
+    Returns:
+        int: The ID of the new recipe, once it is committed.
+
+    Raises:
+        RecipeCycleError: If the recipe would (indirectly) contain itself.
+    """
+    return await asyncio.wrap_future(db.enqueue_recipe(recipe))
+
+
+async def calculate(
+    recipe_name: str, desired_quantity: int, aggregate: bool = False
+) -> Tuple[Dict[str, int], List[Tuple[str, int, int, List, int]]]:
+    """
+    Calculates the ingredients and steps required for a quantity of a recipe.
+    A recipe the current set does not have is calculated in the shared set
+    if that has it, as recipe_logic.calculate_ingredients() does.
+
+    Args:
+        recipe_name (str): The name of the recipe.
+        desired_quantity (int): The desired quantity of the final product.
+        aggregate (bool): Use calculate_aggregated() instead of calculate().
+
+    Returns:
+        tuple: The ingredients and steps, as returned by recipe_logic.
+
+    Raises:
+        ValueError: If there is no recipe with that name.
+    """
+    return await coalesce(
+        ("calculate", recipe_name, desired_quantity, aggregate),
+        lambda: _calculate(recipe_name, desired_quantity, aggregate),
+    )
+
+
+async def _calculate(
+    recipe_name: str, desired_quantity: int, aggregate: bool
+) -> Tuple[Dict[str, int], List[Tuple[str, int, int, List, int]]]:
+    graph = await get_graph()
+    node = graph.node_by_name(recipe_name)
+    if node is None:
+        found = await run_db(db.resolve_recipe_name, recipe_name)
+        if found is None or found[0] == db.current_recipe_set():
+            raise ValueError(f"Recipe not found: {recipe_name}")
+        with db.use_recipe_set(found[0]):
+            return await _calculate(recipe_name, desired_quantity, aggregate)
+    calculator = rl.calculate_aggregated if aggregate else rl.calculate
+    # run_compute() copies this task's context, cancel event included.
+    with traversal.cancellation(threading.Event()) as cancelled:
+        try:
+            return await run_compute(
+                calculator, graph.recipe(node), desired_quantity, graph
+            )
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
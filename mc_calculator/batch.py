@@ -0,0 +1,463 @@
+"""
+This module provides calculate_batch(), which prices many (recipe, quantity)
+requests at once for planning jobs.
+
+Each requested recipe is compiled into a level-by-level plan of the recipes
+it expands into. All requests for the same recipe are then evaluated together:
+a whole column of runs per request is pushed through the plan one level at a
+time, rounding up with vectorized integer division. NumPy is used when it is
+installed (``pip install mc_calculator[batch]``); otherwise the same plan is
+evaluated with plain Python lists. Plans whose results could overflow int64
+for the requested quantities are evaluated with Python integers as well.
+
+A per-branch plan has a row per nested recipe occurrence, which grows
+exponentially when sub-recipes are shared. Recipes that would unroll into
+more than MAX_PLAN_ROWS rows are calculated with calculate() instead, whose
+expansion cache handles shared sub-recipes.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from . import metrics
+from . import traversal
+from .cache import VersionedLRUCache
+from .exceptions import RecipeDepthError
+from .recipe_graph import RecipeGraph, get_graph, track_cache
+from .recipe_logic import calculate, ceil_div
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised when NumPy is missing
+    np = None
+
+# Plans keyed by (root recipe id, aggregate) depend only on the graph, so they
+# are reused across batches, and across saves of recipes they do not contain.
+_plans = VersionedLRUCache(256)
+metrics.register_cache("batch_plans", _plans.info)
+track_cache(_plans)
+# Nested recipe occurrences a per-branch plan may unroll into.
+MAX_PLAN_ROWS = 100_000
+_INT64_LIMIT = 2**63
+
+
+class _Plan:
+    """
+    Evaluation plan for one root recipe.
+
+    Every recipe instance reached from the root gets a row. Rows are grouped
+    into contiguous levels, and each row's demand is the sum over its incoming
+    edges of ``quantity * runs[source row]``. In tree mode every nested recipe
+    occurrence is its own row with exactly one incoming edge, which reproduces
+    calculate()'s per-branch rounding. In aggregate mode every recipe is one
+    row fed by all of its parents, which reproduces calculate_aggregated().
+
+    A per-branch plan that would exceed MAX_PLAN_ROWS keeps only the root and
+    its step rows, and is evaluated one request at a time with calculate().
+    """
+
+    def __init__(self, graph: RecipeGraph, root: int, aggregate: bool) -> None:
+        self.aggregate = aggregate
+        self.nodes: List[int] = [root]
+        self.level_bounds: List[Tuple[int, int]] = [(0, 1)]
+        # Per level (from level 1): (src rows, dst offsets within level, qty)
+        self.level_edges: List[Tuple[List[int], List[int], List[int]]] = []
+        self.fallback: Optional[Tuple[RecipeGraph, List[int]]] = None
+        if aggregate:
+            self._build_aggregated(graph, root)
+        else:
+            order = graph.topological_order([root])  # Refuse cycles first
+            if _tree_rows(graph, order) > MAX_PLAN_ROWS:
+                self._build_fallback(graph, root, order)
+            else:
+                self._build_tree(graph, root)
+        self.outputs = [graph.output_counts[node] for node in self.nodes]
+
+        self.items: List[int] = []  # Local item -> graph item index
+        local_items: Dict[int, int] = {}
+        self.ing_rows: List[int] = []
+        self.ing_items: List[int] = []
+        self.ing_qty: List[int] = []
+        if self.fallback is not None:
+            for node in self.fallback[1]:
+                for item, _ in graph.ingredients(node):
+                    if item not in local_items:
+                        local_items[item] = len(self.items)
+                        self.items.append(item)
+            return
+        for row in self._ingredient_order():
+            for item, quantity in graph.ingredients(self.nodes[row]):
+                if item not in local_items:
+                    local_items[item] = len(self.items)
+                    self.items.append(item)
+                self.ing_rows.append(row)
+                self.ing_items.append(local_items[item])
+                self.ing_qty.append(quantity)
+
+        # Every runs, demand and total value is at most gain times the
+        # largest requested quantity, as rounding up never exceeds demand.
+        bound = [0] * len(self.nodes)
+        bound[0] = 1
+        for (start, _), (srcs, dsts, qtys) in zip(
+            self.level_bounds[1:], self.level_edges
+        ):
+            for src, dst, quantity in zip(srcs, dsts, qtys):
+                bound[start + dst] += quantity * bound[src]
+        item_bound = [0] * len(self.items)
+        for row, item, quantity in zip(self.ing_rows, self.ing_items, self.ing_qty):
+            item_bound[item] += quantity * bound[row]
+        self.gain = max(bound + item_bound)
+        self.max_output = max(self.outputs)
+
+        if np is not None:
+            self.np_outputs = np.array(self.outputs, dtype=np.int64)[:, None]
+            self.np_level_edges = [
+                tuple(np.array(part, dtype=np.int64) for part in edges)
+                for edges in self.level_edges
+            ]
+            self.np_ing = tuple(
+                np.array(part, dtype=np.int64)
+                for part in (self.ing_rows, self.ing_items, self.ing_qty)
+            )
+
+    def _build_tree(self, graph: RecipeGraph, root: int) -> None:
+        self.children: List[List[int]] = [[]]
+        start, end = 0, 1
+        while True:
+            srcs, dsts, qtys = [], [], []
+            for row in range(start, end):
+                for child, quantity in graph.children(self.nodes[row]):
+                    dsts.append(len(self.nodes) - end)
+                    self.children[row].append(len(self.nodes))
+                    self.nodes.append(child)
+                    self.children.append([])
+                    srcs.append(row)
+                    qtys.append(quantity)
+            if not srcs:
+                break
+            start, end = end, len(self.nodes)
+            self.level_bounds.append((start, end))
+            self.level_edges.append((srcs, dsts, qtys))
+            if len(self.level_edges) > traversal.MAX_DEPTH:
+                raise RecipeDepthError(graph.names[root], traversal.MAX_DEPTH)
+        # calculate() reports one step per nested recipe of the root.
+        self.step_rows = []
+        if self.level_edges:
+            self.step_rows = list(range(*self.level_bounds[1]))
+
+    def _build_fallback(self, graph: RecipeGraph, root: int, order: List[int]) -> None:
+        children = list(graph.children(root))
+        if children:
+            self.level_bounds.append((1, 1 + len(children)))
+        self.nodes.extend(child for child, _ in children)
+        self.step_rows = list(range(1, len(self.nodes)))
+        self.fallback = (graph, order)
+
+    def _build_aggregated(self, graph: RecipeGraph, root: int) -> None:
+        roots = []
+        for child, _ in graph.children(root):
+            if child not in roots:
+                roots.append(child)
+        order = graph.topological_order(roots) if roots else []
+        # Level of each intermediate: its longest path from the root.
+        depth = {node: 1 for node in roots}
+        for node in order:
+            for child, _ in graph.children(node):
+                depth[child] = max(depth.get(child, 1), depth[node] + 1)
+
+        row_of = {}
+        by_level: Dict[int, List[int]] = {}
+        for node in order:
+            by_level.setdefault(depth[node], []).append(node)
+        for level in range(1, len(by_level) + 1):
+            start = len(self.nodes)
+            for node in by_level[level]:
+                row_of[node] = len(self.nodes)
+                self.nodes.append(node)
+            self.level_bounds.append((start, len(self.nodes)))
+            self.level_edges.append(([], [], []))
+
+        for src_row, src in enumerate(self.nodes):
+            for child, quantity in graph.children(src):
+                dst_row = row_of[child]
+                level = depth[child]
+                srcs, dsts, qtys = self.level_edges[level - 1]
+                srcs.append(src_row)
+                dsts.append(dst_row - self.level_bounds[level][0])
+                qtys.append(quantity)
+        # calculate_aggregated() reports one step per intermediate, in the
+        # graph's topological order.
+        self.step_rows = [row_of[node] for node in order]
+
+    def _ingredient_order(self) -> List[int]:
+        """
+        Rows in the order calculate() first meets their ingredients: the root,
+        then depth first through the tree (or topological order when aggregated).
+        """
+        if self.aggregate:
+            return [0] + self.step_rows
+        order, stack = [], [0]
+        while stack:
+            row = stack.pop()
+            order.append(row)
+            stack.extend(reversed(self.children[row]))
+        return order
+
+    def evaluate(self, quantities: List[int]) -> Tuple[Any, Any, Any]:
+        """
+        Evaluates the plan for a column of requested quantities.
+
+        Returns:
+            tuple: (item totals, step runs, step waste), each shaped
+            (rows, len(quantities)).
+        """
+        if self.fallback is not None:
+            return self._evaluate_calculate(quantities)
+        largest = max((abs(quantity) for quantity in quantities), default=0)
+        if np is not None and largest * self.gain + self.max_output < _INT64_LIMIT:
+            return self._evaluate_numpy(quantities)
+        return self._evaluate_python(quantities)
+
+    def _evaluate_calculate(self, quantities: List[int]) -> Tuple[Any, Any, Any]:
+        graph = self.fallback[0]
+        recipe = graph.recipe(self.nodes[0])
+        local_items = {graph.item_names[item]: i for i, item in enumerate(self.items)}
+        totals = [[0] * len(quantities) for _ in self.items]
+        step_runs = [[0] * len(quantities) for _ in self.step_rows]
+        step_waste = [[0] * len(quantities) for _ in self.step_rows]
+        for col, quantity in enumerate(quantities):
+            ingredients, steps = calculate(recipe, quantity, graph)
+            for name, total in ingredients.items():
+                totals[local_items[name]][col] = total
+            for pos, (_, runs, _, _, waste) in enumerate(steps):
+                step_runs[pos][col] = runs
+                step_waste[pos][col] = waste
+        return totals, step_runs, step_waste
+
+    def _evaluate_numpy(self, quantities: List[int]) -> Tuple[Any, Any, Any]:
+        columns = len(quantities)
+        outputs = self.np_outputs
+        runs = np.zeros((len(self.nodes), columns), dtype=np.int64)
+        demand = np.zeros_like(runs)
+        demand[0] = quantities
+        runs[0] = -(-demand[0] // outputs[0])
+        for (start, end), (srcs, dsts, qtys) in zip(
+            self.level_bounds[1:], self.np_level_edges
+        ):
+            level_demand = demand[start:end]
+            np.add.at(level_demand, dsts, qtys[:, None] * runs[srcs])
+            runs[start:end] = -(-level_demand // outputs[start:end])
+
+        totals = np.zeros((len(self.items), columns), dtype=np.int64)
+        rows, items, qtys = self.np_ing
+        np.add.at(totals, items, qtys[:, None] * runs[rows])
+        step_rows = np.array(self.step_rows, dtype=np.int64)
+        step_runs = runs[step_rows]
+        return totals, step_runs, step_runs * outputs[step_rows] - demand[step_rows]
+
+    def _evaluate_python(self, quantities: List[int]) -> Tuple[Any, Any, Any]:
+        columns = range(len(quantities))
+        runs = [[0] * len(quantities) for _ in self.nodes]
+        demand = [[0] * len(quantities) for _ in self.nodes]
+        demand[0] = list(quantities)
+        runs[0] = [ceil_div(qty, self.outputs[0]) for qty in quantities]
+        for (start, end), (srcs, dsts, qtys) in zip(
+            self.level_bounds[1:], self.level_edges
+        ):
+            for src, dst, quantity in zip(srcs, dsts, qtys):
+                row_demand = demand[start + dst]
+                for col in columns:
+                    row_demand[col] += quantity * runs[src][col]
+            for row in range(start, end):
+                output = self.outputs[row]
+                runs[row] = [ceil_div(need, output) for need in demand[row]]
+
+        totals = [[0] * len(quantities) for _ in self.items]
+        ingredients = zip(self.ing_rows, self.ing_items, self.ing_qty)
+        for row, item, quantity in ingredients:
+            for col in columns:
+                totals[item][col] += quantity * runs[row][col]
+        step_runs = [runs[row] for row in self.step_rows]
+        step_waste = [
+            [runs[row][col] * self.outputs[row] - demand[row][col] for col in columns]
+            for row in self.step_rows
+        ]
+        return totals, step_runs, step_waste
+
+
+class BatchResult:
+    """
+    Represents the results of calculate_batch(), one row per request.
+
+    Attributes:
+        requests (list): (recipe name, quantity) of each row.
+        ingredient_names (list): Column labels of ``totals``.
+        totals: Base ingredient totals, shaped (requests, ingredient_names).
+        step_names (list): Column labels of ``runs`` and ``waste``.
+        runs: Runs of each step recipe, shaped (requests, step_names).
+        waste: Leftover output of each step recipe, shaped (requests, step_names).
+
+    The matrices are NumPy int64 arrays when NumPy is installed and lists of
+    lists otherwise. When a value could overflow int64 they are NumPy arrays
+    of Python integers (dtype object) instead. Steps sharing a recipe name
+    are summed into one column.
+    """
+
+    def __init__(self, graph: RecipeGraph) -> None:
+        self._graph = graph
+        self.requests: List[Tuple[str, int]] = []
+        self.ingredient_names: List[str] = []
+        self.step_names: List[str] = []
+        self.totals: Any = None
+        self.runs: Any = None
+        self.waste: Any = None
+        # Per request: (plan, group outputs, column within the group)
+        self._rows: List[Tuple[_Plan, Tuple[Any, Any, Any], int]] = []
+
+    def __len__(self) -> int:
+        return len(self.requests)
+
+    def result(
+        self, index: int
+    ) -> Tuple[Dict[str, int], List[Tuple[str, int, int, List, int]]]:
+        """
+        Get one request's result in the shape calculate() returns.
+
+        Args:
+            index (int): Row of the request.
+
+        Returns:
+            dict: A dictionary of ingredients and their required quantities.
+            list: A list of steps involved in making the recipe.
+        """
+        plan, (totals, step_runs, step_waste), col = self._rows[index]
+        graph = self._graph
+        ingredients = {
+            graph.item_names[item]: int(totals[local][col])
+            for local, item in enumerate(plan.items)
+        }
+        steps = [
+            (
+                graph.names[plan.nodes[row]],
+                int(step_runs[pos][col]),
+                plan.outputs[row],
+                [],
+                int(step_waste[pos][col]),
+            )
+            for pos, row in enumerate(plan.step_rows)
+        ]
+        return ingredients, steps
+
+    def __iter__(self):
+        for index in range(len(self.requests)):
+            yield self.result(index)
+
+    def _fill_matrices(self) -> None:
+        ingredient_columns: Dict[str, int] = {}
+        step_columns: Dict[str, int] = {}
+        for plan, _, _ in self._rows:
+            for item in plan.items:
+                ingredient_columns.setdefault(
+                    self._graph.item_names[item], len(ingredient_columns)
+                )
+            for row in plan.step_rows:
+                step_columns.setdefault(
+                    self._graph.names[plan.nodes[row]], len(step_columns)
+                )
+        self.ingredient_names = list(ingredient_columns)
+        self.step_names = list(step_columns)
+
+        shape_i = (len(self._rows), len(ingredient_columns))
+        shape_s = (len(self._rows), len(step_columns))
+        if np is not None:
+            exact = all(
+                isinstance(outputs[0], np.ndarray) for _, outputs, _ in self._rows
+            )
+            dtype = np.int64 if exact else object
+            self.totals = np.zeros(shape_i, dtype=dtype)
+            self.runs = np.zeros(shape_s, dtype=dtype)
+            self.waste = np.zeros(shape_s, dtype=dtype)
+        else:
+            self.totals = [[0] * shape_i[1] for _ in range(shape_i[0])]
+            self.runs = [[0] * shape_s[1] for _ in range(shape_s[0])]
+            self.waste = [[0] * shape_s[1] for _ in range(shape_s[0])]
+
+        for index, (plan, (totals, step_runs, step_waste), col) in enumerate(
+            self._rows
+        ):
+            for local, item in enumerate(plan.items):
+                column = ingredient_columns[self._graph.item_names[item]]
+                self.totals[index][column] += totals[local][col]
+            for pos, row in enumerate(plan.step_rows):
+                column = step_columns[self._graph.names[plan.nodes[row]]]
+                self.runs[index][column] += step_runs[pos][col]
+                self.waste[index][column] += step_waste[pos][col]
+
+
+def _tree_rows(graph: RecipeGraph, order: List[int]) -> int:
+    """
+    Counts the rows of a per-branch plan, i.e. the paths from the root to
+    every node, without unrolling them. ``order`` starts at the root.
+    """
+    paths = dict.fromkeys(order, 0)
+    paths[order[0]] = 1
+    for node in order:
+        for child, _ in graph.children(node):
+            paths[child] += paths[node]
+    return sum(paths.values())
+
+
+def calculate_batch(
+    requests: Iterable[Tuple[Union[str, int], int]],
+    graph: Optional[RecipeGraph] = None,
+    aggregate: bool = False,
+) -> BatchResult:
+    """
+    Calculates base ingredient totals and waste for many requests at once.
+
+    Row ``i`` of the result matches ``calculate()`` (or, with ``aggregate``,
+    ``calculate_aggregated()``) for request ``i`` exactly.
+
+    Args:
+        requests (iterable): (recipe name or database ID, desired quantity)
+        pairs.
+        graph (RecipeGraph, optional): Compiled graph to run against.
+        Defaults to the shared graph of the database.
+        aggregate (bool): Share leftover output of intermediates across
+        branches, like calculate_aggregated().
+
+    Returns:
+        BatchResult: Per-request totals, runs and waste.
+
+    Raises:
+        ValueError: If a requested recipe does not exist, RecipeCycleError if
+        it contains a cycle, or RecipeDepthError if it is nested deeper than
+        traversal.MAX_DEPTH (per-branch mode only).
+    """
+    if graph is None:
+        graph = get_graph()
+    result = BatchResult(graph)
+
+    groups: Dict[int, List[int]] = {}
+    quantities: List[int] = []
+    for recipe, quantity in requests:
+        if isinstance(recipe, str):
+            node = graph.node_by_name(recipe)
+        else:
+            node = graph.node(recipe)
+        if node is None:
+            raise ValueError(f"Recipe not found: {recipe}")
+        groups.setdefault(node, []).append(len(quantities))
+        quantities.append(quantity)
+        result.requests.append((graph.names[node], quantity))
+
+    result._rows = [None] * len(quantities)  # type: ignore[list-item]
+    for root, indexes in groups.items():
+        key = (graph.recipe_ids[root], aggregate)
+        plan = _plans.get(graph.token, key, graph.db_path)
+        if plan is None:
+            plan = _Plan(graph, root, aggregate)
+            _plans.put(graph.token, key, plan, graph.db_path)
+        outputs = plan.evaluate([quantities[index] for index in indexes])
+        for col, index in enumerate(indexes):
+            result._rows[index] = (plan, outputs, col)
+
+    result._fill_matrices()
+    return result
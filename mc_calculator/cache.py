@@ -0,0 +1,171 @@
+"""
+This module defines the VersionedLRUCache class, a bounded cache whose
+entries are dropped wholesale when the data they were computed from changes,
+unless the caller says which of them are still valid (see rebase()).
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+
+class CacheInfo(NamedTuple):
+    """
+    Statistics of a cache, in the spirit of functools.lru_cache's cache_info().
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    maxsize: int
+    currsize: int
+
+
+class VersionedLRUCache:
+    """
+    Represents a least-recently-used cache tied to a data version.
+
+    Every lookup names the version (any hashable token) its caller is working
+    against. When it differs from the version the entries were stored under,
+    the cache is emptied first, so stale results are never returned.
+
+    Entries can also be split into scopes, such as the database files of
+    several recipe sets, each with its own version: a version change only
+    empties its own scope. All scopes share maxsize and the LRU order.
+
+    Attributes:
+        maxsize (int): Maximum number of entries kept before evicting.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that found nothing.
+        evictions (int): Entries dropped to respect maxsize.
+        invalidations (int): Times the cache was emptied by a version change.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._versions: Dict[Hashable, Any] = {}
+        # Keyed by (scope, key).
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, scope: Hashable, version: Any) -> None:
+        if version != self._versions.get(scope):
+            if self._drop(scope, lambda key: True):
+                self.invalidations += 1
+            self._versions[scope] = version
+
+    def _drop(self, scope: Hashable, is_stale: Callable[[Any], bool]) -> int:
+        stale = [
+            entry
+            for entry in self._data
+            if entry[0] == scope and is_stale(entry[1])
+        ]
+        for entry in stale:
+            del self._data[entry]
+        return len(stale)
+
+    def get(
+        self, version: Any, key: Hashable, scope: Hashable = None
+    ) -> Optional[Any]:
+        """
+        Get a cached value.
+
+        Args:
+            version: Data version the caller is working against.
+            key: Cache key.
+            scope (optional): Scope of the entry.
+
+        Returns:
+            The cached value, or None on a miss.
+        """
+        with self._lock:
+            self._check_version(scope, version)
+            key = (scope, key)
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(
+        self, version: Any, key: Hashable, value: Any, scope: Hashable = None
+    ) -> None:
+        """
+        Stores a value, evicting the least recently used entries if full.
+
+        Args:
+            version: Data version the value was computed from.
+            key: Cache key.
+            value: Value to cache. Must not be None.
+            scope (optional): Scope of the entry.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._check_version(scope, version)
+            key = (scope, key)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def rebase(
+        self,
+        old_version: Any,
+        new_version: Any,
+        is_stale: Callable[[Any], bool],
+        scope: Hashable = None,
+    ) -> int:
+        """
+        Moves the entries of a scope stored under ``old_version`` to
+        ``new_version``, dropping only those ``is_stale`` rejects. Does
+        nothing if the scope holds another version, which is then dropped on
+        the next lookup.
+
+        Args:
+            old_version: Version the entries were stored under.
+            new_version: Version to keep the remaining entries under.
+            is_stale (callable): Called with each key; returns True if the
+            entry is no longer valid under ``new_version``.
+            scope (optional): Scope of the entries.
+
+        Returns:
+            int: The number of entries dropped.
+        """
+        with self._lock:
+            if self._versions.get(scope) != old_version:
+                return 0
+            self._versions[scope] = new_version
+            return self._drop(scope, is_stale)
+
+    def clear(self) -> None:
+        """
+        Empties the cache and resets its statistics.
+        """
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def info(self) -> CacheInfo:
+        """
+        Get the cache statistics.
+
+        Returns:
+            CacheInfo: Hit, miss, eviction and size counters.
+        """
+        return CacheInfo(
+            self.hits,
+            self.misses,
+            self.evictions,
+            self.invalidations,
+            self.maxsize,
+            len(self._data),
+        )
@@ -2,30 +2,784 @@
 This module handles database operations for the Minecraft
 Recipe Calculator application, including setup and recipe management.
 """
+import atexit
+import contextlib
 import functools
 import json
+import os
+import queue
+import re
+import secrets
 import sqlite3
-from typing import Optional, Callable, List, Tuple, Any
+import threading
+import time
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+from . import metrics
+from . import traversal
+from .exceptions import RecipeCycleError, RecipeDepthError
 from .recipe import Recipe
 
 # from mc_calculator.c_crafting_block import CraftingBlock
 
+# Data versions are numbered across all databases of the process, but each
+# database only moves to a new one when its own recipes change.
+_data_version = 0
+_versions: Dict[str, int] = {}
+# The database and recipe ids changed by each recent data version; the ids
+# are None when the change is not limited to known recipes (schema
+# migrations, switching databases).
+CHANGE_LOG_SIZE = 256
+_changes: Dict[int, Tuple[str, Optional[FrozenSet[int]]]] = {}
+_version_lock = threading.Lock()
 
-def with_db_connection(db_path: str = "minecraft_recipes.db") -> Callable:
+
+def data_version(db_path: Optional[str] = None) -> int:
+    """
+    Get the data version of this process' view of a database.
+
+    The version is bumped every time a recipe is saved, so compiled
+    structures such as the recipe graph can tell when they are stale.
+    Saving to one recipe set leaves the versions of the others unchanged.
+
+    Args:
+        db_path (str, optional): The database file. Defaults to the
+        database of the current recipe set.
+
+    Returns:
+        int: The current data version.
+    """
+    return _versions.get(db_path or database_path(), 0)
+
+
+def bump_data_version(
+    recipe_ids: Optional[Iterable[int]] = None, db_path: Optional[str] = None
+) -> int:
+    """
+    Marks compiled recipe data of a database as stale.
+
+    Args:
+        recipe_ids (iterable, optional): IDs of the recipes that were added
+        or changed. If not provided, all recipes are treated as changed.
+        db_path (str, optional): The database file. Defaults to the
+        database of the current recipe set.
+
+    Returns:
+        int: The new data version.
+    """
+    global _data_version
+    changed = None if recipe_ids is None else frozenset(map(int, recipe_ids))
+    key = db_path or database_path()
+    with _version_lock:
+        _data_version += 1
+        _versions[key] = _data_version
+        _changes[_data_version] = (key, changed)
+        _changes.pop(_data_version - CHANGE_LOG_SIZE, None)
+        return _data_version
+
+
+def changed_since(version: int, db_path: Optional[str] = None) -> Optional[Set[int]]:
+    """
+    Get the IDs of the recipes of a database added or changed after a data
+    version.
+
+    Args:
+        version (int): A version previously returned by data_version().
+        db_path (str, optional): The database file. Defaults to the
+        database of the current recipe set.
+
+    Returns:
+        set: The recipe IDs, or None if the changes are unknown, e.g.
+        because they are older than the last CHANGE_LOG_SIZE versions or
+        were not limited to particular recipes.
+    """
+    key = db_path or database_path()
+    changed: Set[int] = set()
+    with _version_lock:
+        for newer in range(version + 1, _data_version + 1):
+            entry = _changes.get(newer)
+            if entry is None:
+                return None
+            path, recipe_ids = entry
+            if path != key:
+                continue
+            if recipe_ids is None:
+                return None
+            changed |= recipe_ids
+    return changed
+
+
+DEFAULT_DB_PATH = os.environ.get("MC_CALCULATOR_DB", "minecraft_recipes.db")
+# Recipe sets, e.g. one per modpack, each keep their recipes in their own
+# database file in this directory.
+RECIPE_SETS_DIR = os.environ.get("MC_CALCULATOR_SETS_DIR", "recipe_sets")
+# The set of recipes common to every other set, such as vanilla Minecraft's.
+# Its database is attached to their connections under SHARED_SCHEMA.
+SHARED_SET = os.environ.get("MC_CALCULATOR_SHARED_SET", "vanilla")
+SHARED_SCHEMA = "shared"
+_SET_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+# Encoding of the recipes.ingredients column for newly saved recipes, "json"
+# or "binary" (see Recipe.to_bytes). Rows of either encoding are always read.
+RECIPE_ENCODINGS = ("json", "binary")
+RECIPE_ENCODING = os.environ.get("MC_CALCULATOR_ENCODING", "json")
+# SQLite builds before 3.32 cap bound parameters per statement at 999.
+MAX_QUERY_PARAMS = 999
+# Recipes per page of search_recipes() results.
+SEARCH_PAGE_SIZE = 20
+# Sorts after every character, closing the index range of a name prefix.
+_PREFIX_END = chr(0x10FFFF)
+# WAL lets readers proceed while another connection writes; writers wait up
+# to busy_timeout milliseconds for the write lock instead of failing with
+# "database is locked". In-memory databases ignore journal_mode.
+DEFAULT_PRAGMAS = {
+    "busy_timeout": 5000,
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,  # 16 MiB page cache
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+
+def set_recipe_encoding(encoding: str) -> None:
+    """
+    Sets how newly saved recipes are encoded.
+
+    Args:
+        encoding (str): "json" or "binary".
+
+    Raises:
+        ValueError: If the encoding is unknown.
+    """
+    global RECIPE_ENCODING
+    if encoding not in RECIPE_ENCODINGS:
+        raise ValueError(f"Unknown recipe encoding: {encoding}")
+    RECIPE_ENCODING = encoding
+
+
+def encode_recipe(recipe: Recipe) -> Tuple[Any, Optional[str]]:
+    """
+    Encodes a recipe for the ingredients and nested_recipes_json columns
+    using RECIPE_ENCODING.
+
+    Binary payloads carry their nested recipes, so nested_recipes_json is
+    left NULL for them rather than storing the edges twice.
+
+    Args:
+        recipe (Recipe): The recipe to encode.
+
+    Returns:
+        tuple: The ingredients and nested_recipes_json column values.
+    """
+    if RECIPE_ENCODING == "binary":
+        return recipe.to_bytes(), None
+    return recipe.to_json(), json.dumps(dict(recipe.nested_recipes))
+
+
+class ConnectionManager:
+    """
+    Hands out one long-lived connection per thread for a database file.
+
+    Connections are opened lazily on first use, configured with the given
+    pragmas once, and reuse SQLite's prepared statement cache across calls.
+
+    Attributes:
+        db_path (str): Path of the SQLite database file.
+        pragmas (dict): PRAGMA name/value pairs applied to new connections.
+        cached_statements (int): Size of each connection's statement cache.
+        attach (dict): Database files attached to new connections, keyed by
+        schema name. Files that do not exist yet are skipped.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_DB_PATH,
+        pragmas: Optional[Dict[str, Any]] = None,
+        cached_statements: int = 256,
+        attach: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.db_path = db_path
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self.attach = dict(attach or {})
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._pid = os.getpid()
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get the calling thread's connection, opening it if needed.
+
+        Returns:
+            sqlite3.Connection: The thread's connection.
+        """
+        if self._pid != os.getpid():  # Never share connections across fork()
+            self._local = threading.local()
+            self._connections = []
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                cached_statements=self.cached_statements,
+                check_same_thread=False,
+            )
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            for schema, path in self.attach.items():
+                if os.path.exists(path):
+                    conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+            metrics.inc("db_connections_opened")
+            if metrics.enabled():
+                conn.set_trace_callback(metrics.count_query)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """
+        Closes every connection opened by this manager.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+_manager = ConnectionManager()
+_path_managers: Dict[str, ConnectionManager] = {}
+_set_managers: Dict[str, ConnectionManager] = {}
+_set_managers_lock = threading.Lock()
+# The recipe set used by calls that do not name one; None for the default
+# database. Context-local, so threads and asyncio tasks can differ.
+_recipe_set: "ContextVar[Optional[str]]" = ContextVar(
+    "recipe_set", default=os.environ.get("MC_CALCULATOR_SET") or None
+)
+
+
+def configure(
+    db_path: Optional[str] = None,
+    pragmas: Optional[Dict[str, Any]] = None,
+    cached_statements: Optional[int] = None,
+    sets_dir: Optional[str] = None,
+) -> ConnectionManager:
+    """
+    Replaces the default connection manager, closing its open connections
+    and those of the recipe sets.
+
+    Args:
+        db_path (str, optional): Database file to use. Keeps the current path
+        if not provided.
+        pragmas (dict, optional): PRAGMA values applied to new connections,
+        merged over the current ones.
+        cached_statements (int, optional): Size of each connection's prepared
+        statement cache.
+        sets_dir (str, optional): Directory of the recipe sets' database
+        files. Keeps the current RECIPE_SETS_DIR if not provided.
+
+    Returns:
+        ConnectionManager: The new default manager.
+    """
+    global _manager, RECIPE_SETS_DIR
+    merged = dict(_manager.pragmas)
+    merged.update(pragmas or {})
+    new_manager = ConnectionManager(
+        db_path if db_path is not None else _manager.db_path,
+        merged,
+        cached_statements
+        if cached_statements is not None
+        else _manager.cached_statements,
+    )
+    _manager.close()
+    _manager = new_manager
+    if sets_dir is not None:
+        RECIPE_SETS_DIR = sets_dir
+    with _set_managers_lock:
+        managers = list(_set_managers.values())
+        _set_managers.clear()
+    for manager in managers:
+        manager.close()
+    _close_write_queues()
+    bump_data_version(db_path=_manager.db_path)
+    return _manager
+
+
+def recipe_set_path(name: str) -> str:
+    """
+    Get the database file of a recipe set.
+
+    Args:
+        name (str): The set's name: letters, digits, '_', '-' and '.', not
+        starting with a punctuation character.
+
+    Returns:
+        str: The path of the set's database in RECIPE_SETS_DIR.
+
+    Raises:
+        ValueError: If the name is not a valid set name.
+    """
+    if not _SET_NAME.fullmatch(name):
+        raise ValueError(f"Invalid recipe set name: {name!r}")
+    return os.path.join(RECIPE_SETS_DIR, f"{name}.db")
+
+
+def list_recipe_sets() -> List[str]:
+    """
+    Get the names of the recipe sets that have a database file.
+
+    Returns:
+        list: The set names, sorted.
+    """
+    try:
+        files = os.listdir(RECIPE_SETS_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        file[: -len(".db")]
+        for file in files
+        if file.endswith(".db") and _SET_NAME.fullmatch(file[: -len(".db")])
+    )
+
+
+def current_recipe_set() -> Optional[str]:
+    """
+    Get the recipe set that calls use when they do not name one.
+
+    Returns:
+        str: The set's name, or None for the default database.
+    """
+    return _recipe_set.get()
+
+
+def select_recipe_set(name: Optional[str]) -> None:
+    """
+    Makes a recipe set the current one for the rest of the calling context,
+    e.g. for a whole command line invocation.
+
+    Args:
+        name (str, optional): The set's name, or None for the default
+        database.
+
+    Raises:
+        ValueError: If the name is not a valid set name.
+    """
+    if name is not None:
+        recipe_set_path(name)
+    _recipe_set.set(name)
+
+
+@contextlib.contextmanager
+def use_recipe_set(name: Optional[str]) -> Iterator[None]:
+    """
+    Makes a recipe set the current one inside a with block.
+
+    Every function decorated with with_db_connection() also accepts a
+    ``recipe_set`` keyword argument that does the same for one call, e.g.
+    ``fetch_recipe_by_name("Iron Plate", recipe_set="gtnh")``.
+
+    Args:
+        name (str, optional): The set's name, or None for the default
+        database.
+
+    Raises:
+        ValueError: If the name is not a valid set name.
+    """
+    if name is not None:
+        recipe_set_path(name)
+    token = _recipe_set.set(name)
+    try:
+        yield
+    finally:
+        _recipe_set.reset(token)
+
+
+def recipe_set_manager(name: Optional[str] = None) -> ConnectionManager:
+    """
+    Get the connection manager of a recipe set, creating it if needed.
+
+    Connections to any set but SHARED_SET have the shared set's database
+    attached as SHARED_SCHEMA, if it exists when they are opened.
+
+    Args:
+        name (str, optional): The set's name, or None for the default
+        database.
+
+    Returns:
+        ConnectionManager: The set's manager.
+
+    Raises:
+        ValueError: If the name is not a valid set name.
+    """
+    if name is None:
+        return _manager
+    manager = _set_managers.get(name)
+    if manager is None:
+        path = recipe_set_path(name)
+        attach = {}
+        if name != SHARED_SET:
+            attach[SHARED_SCHEMA] = recipe_set_path(SHARED_SET)
+        with _set_managers_lock:
+            manager = _set_managers.get(name)
+            if manager is None:
+                os.makedirs(RECIPE_SETS_DIR, exist_ok=True)
+                manager = ConnectionManager(
+                    path, _manager.pragmas, _manager.cached_statements, attach
+                )
+                _set_managers[name] = manager
+    return manager
+
+
+def database_path() -> str:
+    """
+    Get the path of the current recipe set's database file.
+
+    Returns:
+        str: The path the current set's connection manager connects to.
+    """
+    return recipe_set_manager(_recipe_set.get()).db_path
+
+
+def connection_path(conn: sqlite3.Connection) -> str:
+    """
+    Get the database file a connection is open on, spelled as the path of
+    the connection manager connecting to it, so it can key data versions.
+
+    Args:
+        conn (sqlite3.Connection): The connection.
+
+    Returns:
+        str: The manager's path, or the file SQLite reports if no manager
+        connects to it ("" for in-memory databases).
+    """
+    filename = next(
+        row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"
+    )
+    manager = _find_manager(filename) if filename else None
+    return manager.db_path if manager is not None else filename
+
+
+def _find_manager(db_path: str) -> Optional[ConnectionManager]:
+    """
+    Get the connection manager connecting to a database file, if any.
+    """
+    with _set_managers_lock:
+        managers = [_manager, *_set_managers.values(), *_path_managers.values()]
+    for manager in managers:
+        if manager.db_path == db_path:
+            return manager
+    for manager in managers:
+        try:
+            if os.path.samefile(manager.db_path, db_path):
+                return manager
+        except OSError:  # Not created yet, or not a file
+            continue
+    return None
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Get the calling thread's connection to the current recipe set's database.
+
+    Returns:
+        sqlite3.Connection: The thread's connection.
+    """
+    return recipe_set_manager(_recipe_set.get()).connection()
+
+
+def close_connections() -> None:
+    """
+    Closes every connection held by the connection managers.
+    """
+    _manager.close()
+    for manager in list(_path_managers.values()) + list(_set_managers.values()):
+        manager.close()
+
+
+# Seconds a queued write waits for others to join its transaction.
+DEFAULT_FLUSH_LATENCY = float(os.environ.get("MC_CALCULATOR_FLUSH_LATENCY", 0.005))
+DEFAULT_MAX_BATCH = 500
+
+
+class WriteQueue:
+    """
+    Performs writes for any number of threads on one writer thread, grouping
+    the writes that are pending at the same time into a single transaction.
+
+    A write waits at most flush_latency seconds for others to join its batch.
+    Each write runs in a savepoint, so one that fails is rolled back alone and
+    the rest of its batch still commits. Futures resolve once their batch has
+    committed. Combined with WAL, readers never wait for the writer, and a
+    burst of saves costs one commit instead of one each.
+
+    The writer connects with the pragmas, statement cache size and attached
+    databases of the connection manager of its database, or of the default
+    one if no manager connects to it.
+
+    Attributes:
+        db_path (str): Path of the SQLite database file. Defaults to the
+        database of the current recipe set.
+        flush_latency (float): Longest time a write waits for its batch.
+        max_batch (int): Most writes committed in one transaction.
+        batches (int): Transactions committed so far.
+        writes (int): Writes committed so far.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        flush_latency: float = DEFAULT_FLUSH_LATENCY,
+        max_batch: int = DEFAULT_MAX_BATCH,
+    ) -> None:
+        if db_path is None:
+            template = recipe_set_manager(_recipe_set.get())
+            db_path = template.db_path
+        else:
+            template = _find_manager(db_path) or _manager
+        self.db_path = db_path
+        self.flush_latency = flush_latency
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._manager = ConnectionManager(
+            db_path, template.pragmas, template.cached_statements, template.attach
+        )
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="mc-calculator-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self, func: Callable[[sqlite3.Connection], Any], changes_recipes: bool = True
+    ) -> "Future[Any]":
+        """
+        Queues a write.
+
+        Args:
+            func (callable): Called with the writer's connection inside the
+            batch transaction; it must not commit or roll back.
+            changes_recipes (bool): Whether the write changes recipes, so
+            results derived from them are invalidated once it commits.
+
+        Returns:
+            Future: Resolves to the return value of ``func`` after commit.
+
+        Raises:
+            RuntimeError: If the queue has been closed.
+        """
+        return self._put(func, "changes" if changes_recipes else None)
+
+    def _put(self, func: Callable[[sqlite3.Connection], Any], kind: Any) -> Future:
+        # kind: "saves" if func returns the ID of a recipe it inserted,
+        # "changes" if it changes recipes otherwise, None if it does not.
+        future: "Future[Any]" = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The write queue is closed.")
+            self._queue.put((func, future, kind))
+        return future
+
+    def save_recipe(self, recipe: Recipe) -> "Future[int]":
+        """
+        Queues saving a recipe, as save_recipe_to_db() does.
+
+        Args:
+            recipe (Recipe): The recipe to be saved.
+
+        Returns:
+            Future: Resolves to the ID of the new recipe, or raises
+            RecipeCycleError if it would (indirectly) contain itself.
+        """
+        return self._put(functools.partial(_insert_recipe, recipe=recipe), "saves")
+
+    def flush(self) -> None:
+        """
+        Waits until every write queued so far has been committed.
+        """
+        self.submit(lambda conn: None, changes_recipes=False).result()
+
+    def close(self) -> None:
+        """
+        Commits the queued writes and stops the writer thread.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_latency
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(
+                        timeout=max(deadline - time.monotonic(), 0)
+                    )
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+        self._manager.close()
+
+    def _write(self, batch: List[tuple]) -> None:
+        conn = self._manager.connection()
+        outcomes = []
+        try:
+            if conn.in_transaction:
+                conn.commit()
+            conn.execute("BEGIN IMMEDIATE")
+            for func, future, kind in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT queued_write")
+                try:
+                    value = func(conn)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO queued_write")
+                    conn.execute("RELEASE queued_write")
+                    outcomes.append((future, False, exc, kind))
+                else:
+                    conn.execute("RELEASE queued_write")
+                    outcomes.append((future, True, value, kind))
+            conn.commit()
+        except BaseException as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.batches += 1
+        self.writes += len(outcomes)
+        metrics.inc("db_write_batches")
+        kinds = {kind for _, ok, _, kind in outcomes if ok}
+        if "changes" in kinds:
+            bump_data_version(db_path=self.db_path)
+        elif "saves" in kinds:
+            bump_data_version(
+                [value for _, ok, value, kind in outcomes if ok and kind == "saves"],
+                self.db_path,
+            )
+        for future, ok, value, _ in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+# One write queue per database file.
+_write_queues: Dict[str, WriteQueue] = {}
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue() -> WriteQueue:
+    """
+    Get the write queue of the current recipe set's database, starting it if
+    needed. It is closed, committing pending writes, at interpreter exit or
+    when the databases are reconfigured.
+
+    Returns:
+        WriteQueue: The queue.
     """
-    Open new connection if not already supplied.
+    path = database_path()
+    with _write_queue_lock:
+        write_queue = _write_queues.get(path)
+        if write_queue is None:
+            write_queue = _write_queues[path] = WriteQueue(path)
+            atexit.register(write_queue.close)
+        return write_queue
+
+
+def _close_write_queues() -> None:
+    with _write_queue_lock:
+        write_queues = list(_write_queues.values())
+        _write_queues.clear()
+    for write_queue in write_queues:
+        write_queue.close()
+        atexit.unregister(write_queue.close)
+
+
+def enqueue_recipe(recipe: Recipe) -> "Future[int]":
+    """
+    Saves a recipe to the current recipe set's database through its write
+    queue, sharing a transaction with the saves queued around the same time.
+
+    Args:
+        recipe (Recipe): The recipe to be saved.
+
+    Returns:
+        Future: Resolves to the ID of the new recipe once it is committed,
+        or raises RecipeCycleError if it would (indirectly) contain itself.
+    """
+    return get_write_queue().save_recipe(recipe)
+
+
+def with_db_connection(db_path: Optional[str] = None) -> Callable:
+    """
+    Use the thread's managed connection if one is not already supplied.
+
+    The decorated function also accepts a ``recipe_set`` keyword argument,
+    naming the recipe set to run against instead of the current one (see
+    use_recipe_set()).
+
+    Args:
+        db_path (str, optional): Database file to connect to. Defaults to
+        the database of the current recipe set.
     """
 
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper_decorator(*args: Any, **kwargs: Any) -> Any:
+            if "recipe_set" in kwargs:
+                with use_recipe_set(kwargs.pop("recipe_set")):
+                    return wrapper_decorator(*args, **kwargs)
             # Check if 'conn' is already supplied
             conn = kwargs.get("conn")
             if conn is not None and isinstance(conn, sqlite3.Connection):
                 return func(*args, **kwargs)
+            if args and isinstance(args[-1], sqlite3.Connection):
+                return func(*args, **kwargs)
 
-            # Manage a new connection
-            with sqlite3.connect(db_path) as conn:
+            if db_path is None:
+                manager = recipe_set_manager(_recipe_set.get())
+            else:
+                manager = _path_managers.get(db_path)
+                if manager is None:
+                    manager = _path_managers.setdefault(
+                        db_path, ConnectionManager(db_path)
+                    )
+            # Commit on success and roll back on error, as a fresh
+            # connection's context manager would, but keep it open.
+            with manager.connection() as conn:
                 kwargs["conn"] = conn
                 return func(*args, **kwargs)
 
@@ -34,17 +788,12 @@ def with_db_connection(db_path: str = "minecraft_recipes.db") -> Callable:
     return decorator
 
 
-@with_db_connection()
-def setup_database(conn: Optional[sqlite3.Connection] = None) -> None:
+def _migrate_v1(conn: sqlite3.Connection) -> None:
     """
-    Sets up the database for storing recipes.
-
-    Args:
-        conn (sqlite3.Connection, optional): An existing database
-        connection. If not provided, a new connection will be created.
+    Schema v1: the recipes table with nested recipes split out into the
+    'nested_recipes_json' column.
     """
-    cursor = conn.cursor()
-    cursor.execute(
+    conn.execute(
         """
         CREATE TABLE IF NOT EXISTS recipes (
             id INTEGER PRIMARY KEY,
@@ -56,36 +805,167 @@ def setup_database(conn: Optional[sqlite3.Connection] = None) -> None:
         )
     """
     )
-    conn.commit()
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(recipes)")}
+    if "nested_recipes_json" not in columns:
+        conn.execute(
+            """
+        ALTER TABLE recipes
+        ADD COLUMN nested_recipes_json TEXT DEFAULT '{}'
+        """
+        )
+        migrate_nested_recipes(conn=conn)
 
-    cursor.execute(
+
+def _migrate_v2(conn: sqlite3.Connection) -> None:
+    """
+    Schema v2: normalized ingredient and edge tables, indexed by recipe name
+    and child recipe, filled from the existing JSON columns.
+    """
+    conn.execute(
         """
-        CREATE TABLE IF NOT EXISTS flags (
-            key TEXT PRIMARY KEY,
-            value TEXT
+        CREATE TABLE recipe_ingredients (
+            recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+            ingredient TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            UNIQUE (recipe_id, ingredient)
         )
         """
     )
-    conn.commit()
+    conn.execute(
+        """
+        CREATE TABLE recipe_edges (
+            parent_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+            child_id INTEGER NOT NULL REFERENCES recipes(id),
+            quantity INTEGER NOT NULL,
+            UNIQUE (parent_id, child_id)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_recipe_edges_child ON recipe_edges (child_id)")
+    conn.execute("CREATE INDEX idx_recipes_name ON recipes (name)")
 
-    cursor.execute(
-        "SELECT value FROM flags WHERE key = 'nested_recipes_migration_done'"
+    recipe_ids = {row[0] for row in conn.execute("SELECT id FROM recipes")}
+    rows = conn.execute(
+        "SELECT id, ingredients, nested_recipes_json FROM recipes ORDER BY id"
+    ).fetchall()
+    for recipe_id, ingredients, nested_recipes_json in rows:
+        recipe = Recipe.from_row(ingredients, nested_recipes_json)
+        # Links to recipes that no longer exist are dropped, as the
+        # calculator already skipped them.
+        nested_recipes = {
+            n_id: qty
+            for n_id, qty in recipe.nested_recipes.items()
+            if int(n_id) in recipe_ids
+        }
+        _insert_recipe_rows(conn, recipe_id, recipe, nested_recipes)
+
+
+def _migrate_v3(conn: sqlite3.Connection) -> None:
+    """
+    Schema v3: a case-insensitive index on recipe names, ordered by ID
+    within a name, for prefix search and keyset pagination.
+    """
+    conn.execute(
+        "CREATE INDEX idx_recipes_name_nocase ON recipes (name COLLATE NOCASE, id)"
     )
-    migration_done = cursor.fetchone()  # Check if key exists.
-    if not migration_done:  # If key doesn't exist, perform migration on all recipes
-        cursor.execute(
+
+
+def _migrate_v4(conn: sqlite3.Connection) -> None:
+    """
+    Schema v4: a meta table holding a random database ID and a data version
+    that triggers bump on every change to the recipes table, so other
+    processes can tell whether data derived from the database is current.
+    """
+    conn.execute(
+        "CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL) "
+        "WITHOUT ROWID"
+    )
+    conn.executemany(
+        "INSERT INTO meta (key, value) VALUES (?, ?)",
+        [("database_id", secrets.randbits(63)), ("data_version", 0)],
+    )
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(
+            f"""
+            CREATE TRIGGER recipes_{event.lower()}_bump AFTER {event} ON recipes
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+            END
             """
-        ALTER TABLE recipes
-        ADD COLUMN nested_recipes_json TEXT DEFAULT '{}'
-        """
         )
+
+
+# Migration i upgrades a database from user_version i to i + 1.
+_MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+]
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Get the schema version of a database, as stored in PRAGMA user_version.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+
+    Returns:
+        int: The schema version, 0 for a new or pre-versioning database.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def database_stamp(conn: sqlite3.Connection) -> Tuple[int, int, int]:
+    """
+    Get what identifies the current contents of a database across
+    processes: its schema version, random database ID and persistent data
+    version. Any committed change to a recipe changes the stamp.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+
+    Returns:
+        tuple: (schema version, database ID, data version).
+    """
+    meta = dict(conn.execute("SELECT key, value FROM meta"))
+    return schema_version(conn), meta["database_id"], meta["data_version"]
+
+
+@with_db_connection()
+def setup_database(conn: Optional[sqlite3.Connection] = None) -> None:
+    """
+    Sets up the database for storing recipes, migrating it to the
+    current SCHEMA_VERSION.
+
+    Each pending migration runs in its own write transaction together with
+    the user_version bump, so an interrupted upgrade leaves the database at
+    the last version that completed, and processes starting at the same time
+    migrate it once.
+
+    Args:
+        conn (sqlite3.Connection, optional): An existing database
+        connection. If not provided, a new connection will be created.
+    """
+    if conn.in_transaction:
         conn.commit()
-        migrate_nested_recipes()
-        cursor.execute(
-            "INSERT INTO flags (key, value) VALUES (?, ?)",
-            ("nested_recipes_migration_done", "true"),
-        )
+    version = schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have run it while this one waited.
+            if schema_version(conn) < target:
+                _MIGRATIONS[target - 1](conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+        except BaseException:
+            conn.rollback()
+            raise
         conn.commit()
+    bump_data_version(db_path=connection_path(conn))
 
 
 @with_db_connection()
@@ -112,13 +992,80 @@ def migrate_nested_recipes(conn: Optional[sqlite3.Connection] = None) -> None:
             (nested_recipes_json, recipe_id),
         )
 
-    conn.commit()
+
+def _insert_recipe_rows(
+    conn: sqlite3.Connection,
+    recipe_id: int,
+    recipe: Recipe,
+    nested_recipes: Optional[Dict[int, int]] = None,
+) -> None:
+    """
+    Writes the normalized ingredient and edge rows of a recipe.
+    """
+    if nested_recipes is None:
+        nested_recipes = recipe.nested_recipes
+    conn.executemany(
+        "INSERT INTO recipe_ingredients (recipe_id, ingredient, quantity) "
+        "VALUES (?, ?, ?)",
+        [(recipe_id, ing, qty) for ing, qty in recipe.ingredients.items()],
+    )
+    conn.executemany(
+        "INSERT INTO recipe_edges (parent_id, child_id, quantity) VALUES (?, ?, ?)",
+        [(recipe_id, int(n_id), qty) for n_id, qty in nested_recipes.items()],
+    )
+
+
+def _check_nested_recipes(conn: sqlite3.Connection, recipe: Recipe) -> None:
+    """
+    Checks that the recipes a recipe about to be written nests exist in its
+    database.
+
+    Nested recipes are stored as IDs of the recipe's own database, so a
+    recipe set's recipe cannot nest a recipe only the attached shared set
+    has either: the ID would be taken as one of the set's own, now or once a
+    recipe with that ID is saved.
+
+    Raises:
+        ValueError: If a nested recipe ID is missing from the database,
+        naming the missing IDs.
+    """
+    nested_ids = {int(n_id) for n_id in recipe.nested_recipes}
+    if not nested_ids:
+        return
+    placeholders = ", ".join("?" * len(nested_ids))
+    found = {
+        row[0]
+        for row in conn.execute(
+            f"SELECT id FROM main.recipes WHERE id IN ({placeholders})",
+            list(nested_ids),
+        )
+    }
+    missing = sorted(nested_ids - found)
+    if not missing:
+        return
+    shared_only = []
+    if _has_shared_recipes(conn):
+        shared_only = [
+            row[0]
+            for row in conn.execute(
+                f"SELECT id FROM {SHARED_SCHEMA}.recipes "
+                f"WHERE id IN ({', '.join('?' * len(missing))}) ORDER BY id",
+                missing,
+            )
+        ]
+    if shared_only:
+        raise ValueError(
+            "Nested recipes not found in this recipe set: "
+            f"{', '.join(map(str, shared_only))}. Recipes of the shared set "
+            f"{SHARED_SET!r} cannot be nested in another set's recipes."
+        )
+    raise ValueError(f"Nested recipes not found: {', '.join(map(str, missing))}")
 
 
 @with_db_connection()
 def save_recipe_to_db(
     recipe: Recipe, conn: Optional[sqlite3.Connection] = None
-) -> None:
+) -> int:
     """
     Saves a recipe to the database.
 
@@ -127,21 +1074,230 @@ def save_recipe_to_db(
         conn (sqlite3.Connection, optional): An existing
         database connection. If not provided, a new connection
         will be created.
+
+    Returns:
+        int: The ID of the new recipe.
+
+    Raises:
+        ValueError: If a nested recipe ID is not in the recipe's database
+        (see _check_nested_recipes()), or RecipeCycleError if the recipe
+        would (indirectly) contain itself. Nothing is saved in either case.
+    """
+    try:
+        recipe_id = _insert_recipe(conn, recipe)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    bump_data_version([recipe_id], connection_path(conn))
+    return recipe_id
+
+
+def _insert_recipe(conn: sqlite3.Connection, recipe: Recipe) -> int:
     """
+    Inserts a recipe in the current transaction, without committing.
+
+    Raises:
+        ValueError: If a nested recipe ID is not in the database.
+        RecipeCycleError: If the recipe would (indirectly) contain itself.
+    """
+    _check_nested_recipes(conn, recipe)
+    payload, nested_recipes_json = encode_recipe(recipe)
     cursor = conn.cursor()
     cursor.execute(
         "INSERT INTO recipes (name, ingredients, shaped, crafting_block, output_count, nested_recipes_json) "
         "VALUES (?, ?, ?, ?, ?, ?)",
         (
             recipe.name,
-            recipe.to_json(),
+            payload,
             recipe.shaped,
             recipe.crafting_block.name,
             recipe.output_count,
-            json.dumps(recipe.nested_recipes),
+            nested_recipes_json,
         ),
     )
+    recipe_id = cursor.lastrowid
+    _insert_recipe_rows(conn, recipe_id, recipe)
+    # Stored recipes form no cycle, so a new one can only close a cycle if
+    # an existing recipe already refers to its ID.
+    if conn.execute(
+        "SELECT 1 FROM recipe_edges WHERE child_id = ? LIMIT 1", (recipe_id,)
+    ).fetchone():
+        check_for_cycles([recipe_id], conn=conn)
+    return recipe_id
+
+
+@with_db_connection()
+def update_recipe(
+    recipe_id: int, recipe: Recipe, conn: Optional[sqlite3.Connection] = None
+) -> None:
+    """
+    Replaces a stored recipe, keeping its ID so recipes that use it as a
+    nested recipe now use the new version.
+
+    Only results derived from this recipe and the recipes that (indirectly)
+    contain it are invalidated; see recipe_graph.get_graph().
+
+    Args:
+        recipe_id (int): The ID of the recipe to replace.
+        recipe (Recipe): The new recipe.
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Raises:
+        ValueError: If there is no recipe with that ID or with one of the
+        nested recipe IDs.
+        RecipeCycleError: If the recipe would (indirectly) contain itself.
+    """
+    update_recipes({recipe_id: recipe}, conn=conn)
+
+
+@with_db_connection()
+def update_recipes(
+    recipes: Mapping[int, Recipe], conn: Optional[sqlite3.Connection] = None
+) -> None:
+    """
+    Replaces several stored recipes in one transaction.
+
+    Args:
+        recipes (mapping): New recipes keyed by the ID they replace.
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Raises:
+        ValueError: If one of the IDs or a nested recipe ID does not exist,
+        or RecipeCycleError if the new recipes form a cycle. Nothing is
+        updated in either case.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for recipe_id, recipe in recipes.items():
+            _check_nested_recipes(conn, recipe)
+            payload, nested_recipes_json = encode_recipe(recipe)
+            cursor = conn.execute(
+                "UPDATE recipes SET name = ?, ingredients = ?, shaped = ?, "
+                "crafting_block = ?, output_count = ?, nested_recipes_json = ? "
+                "WHERE id = ?",
+                (
+                    recipe.name,
+                    payload,
+                    recipe.shaped,
+                    recipe.crafting_block.name,
+                    recipe.output_count,
+                    nested_recipes_json,
+                    int(recipe_id),
+                ),
+            )
+            if cursor.rowcount == 0:
+                raise ValueError(f"Recipe not found: {recipe_id}")
+            for table, column in (
+                ("recipe_ingredients", "recipe_id"),
+                ("recipe_edges", "parent_id"),
+            ):
+                conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (recipe_id,))
+            _insert_recipe_rows(conn, int(recipe_id), recipe)
+        check_for_cycles(recipes, conn=conn)
+    except BaseException:
+        conn.rollback()
+        raise
     conn.commit()
+    bump_data_version(recipes, connection_path(conn))
+
+
+@with_db_connection()
+def check_for_cycles(
+    recipe_ids: Iterable[int], conn: Optional[sqlite3.Connection] = None
+) -> None:
+    """
+    Checks that no cycle of nested recipes is reachable from some recipes.
+    Only the edges reachable from them are read.
+
+    Args:
+        recipe_ids (iterable): IDs of the recipes to start from, typically
+        the ones just saved.
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Raises:
+        RecipeCycleError: If a cycle is found, with the names along it.
+    """
+    recipe_ids = list(map(int, recipe_ids))
+    if len(recipe_ids) > MAX_QUERY_PARAMS:
+        rows = conn.execute("SELECT parent_id, child_id FROM recipe_edges")
+    else:
+        rows = conn.execute(
+            f"""
+            WITH RECURSIVE reachable (id) AS (
+                VALUES {", ".join(["(?)"] * len(recipe_ids))}
+                UNION
+                SELECT e.child_id
+                FROM reachable AS r
+                JOIN recipe_edges AS e ON e.parent_id = r.id
+            )
+            SELECT parent_id, child_id FROM recipe_edges
+            WHERE parent_id IN reachable
+            """,
+            recipe_ids,
+        )
+    children: Dict[int, List[int]] = {}
+    for parent_id, child_id in rows:
+        children.setdefault(parent_id, []).append(child_id)
+    cycle = traversal.find_cycle(recipe_ids, lambda node: children.get(node, ()))
+    if cycle is None:
+        return
+    names = {}
+    for chunk in _chunked(sorted(set(cycle)), MAX_QUERY_PARAMS):
+        placeholders = ", ".join("?" * len(chunk))
+        names.update(
+            conn.execute(
+                f"SELECT id, name FROM recipes WHERE id IN ({placeholders})", chunk
+            )
+        )
+    raise RecipeCycleError([names.get(recipe_id, recipe_id) for recipe_id in cycle])
+
+
+@with_db_connection()
+def fetch_dependent_ids(
+    recipe_ids: Iterable[int], conn: Optional[sqlite3.Connection] = None
+) -> Set[int]:
+    """
+    Get the recipes whose results depend on some recipes: the recipes
+    themselves and every recipe that (indirectly) contains one of them as a
+    nested recipe. The query walks the child_id index of recipe_edges
+    upwards, so it only reads the affected part of the graph.
+
+    Args:
+        recipe_ids (iterable): IDs of the changed recipes.
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        set: The IDs of the affected recipes.
+    """
+    dependents: Set[int] = set()
+    for chunk in _chunked(list(map(int, recipe_ids)), MAX_QUERY_PARAMS):
+        placeholders = ", ".join("?" * len(chunk))
+        cursor = conn.execute(
+            f"""
+            WITH RECURSIVE dependents (id) AS (
+                SELECT id FROM recipes WHERE id IN ({placeholders})
+                UNION
+                SELECT e.parent_id
+                FROM dependents AS d
+                JOIN recipe_edges AS e ON e.child_id = d.id
+            )
+            SELECT id FROM dependents
+            """,
+            chunk,
+        )
+        dependents.update(row[0] for row in cursor)
+    return dependents
 
 
 @with_db_connection()
@@ -168,10 +1324,55 @@ def fetch_recipe_by_name(
     row = cursor.fetchone()
 
     if row:
-        return Recipe.from_json(row[0], row[1])
+        return Recipe.from_row(row[0], row[1])
     return None
 
 
+def _has_shared_recipes(conn: sqlite3.Connection) -> bool:
+    """
+    Tells whether a connection has the shared set's recipes attached.
+    """
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    return SHARED_SCHEMA in attached and bool(
+        conn.execute(
+            f"SELECT 1 FROM {SHARED_SCHEMA}.sqlite_master "
+            "WHERE type = 'table' AND name = 'recipes'"
+        ).fetchone()
+    )
+
+
+@with_db_connection()
+def resolve_recipe_name(
+    recipe_name: str, conn: Optional[sqlite3.Connection] = None
+) -> Optional[Tuple[Optional[str], int]]:
+    """
+    Find the recipe a name refers to in the current recipe set: the set's
+    own recipe if it has one, otherwise the shared set's. The shared set is
+    read through its attached database, in the same query, so common
+    recipes are not copied into every set. Nested recipes cannot fall back
+    this way: they are IDs within the set's own database.
+
+    Args:
+        recipe_name (str): The name of the recipe.
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        (recipe set, id) of the recipe, the set being the current one or
+        SHARED_SET, or None if neither has a recipe of that name.
+    """
+    query = "SELECT 0, id FROM main.recipes WHERE name = ?"
+    params = [recipe_name]
+    if _has_shared_recipes(conn):
+        query += f" UNION ALL SELECT 1, id FROM {SHARED_SCHEMA}.recipes WHERE name = ?"
+        params.append(recipe_name)
+    row = conn.execute(f"{query} ORDER BY 1, 2 LIMIT 1", params).fetchone()
+    if row is None:
+        return None
+    return (SHARED_SET if row[0] else current_recipe_set()), row[1]
+
+
 @with_db_connection()
 def fetch_recipe_by_id(
     recipe_id: int, conn: Optional[sqlite3.Connection] = None
@@ -196,10 +1397,145 @@ def fetch_recipe_by_id(
     row = cursor.fetchone()
 
     if row:
-        return Recipe.from_json(row[0], row[1])
+        return Recipe.from_row(row[0], row[1])
     return None
 
 
+def _chunked(values: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+@with_db_connection()
+def fetch_recipes_by_ids(
+    recipe_ids: Iterable[int], conn: Optional[sqlite3.Connection] = None
+) -> Dict[int, Recipe]:
+    """
+    Get many recipes from the database by ID.
+
+    Runs one query per MAX_QUERY_PARAMS IDs rather than one per recipe.
+
+    Args:
+        recipe_ids (iterable): The IDs of the recipes to query for.
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        dict: Recipe objects keyed by ID. Unknown IDs are left out.
+    """
+    recipes = {}
+    cursor = conn.cursor()
+    unique_ids = list({int(recipe_id) for recipe_id in recipe_ids})
+    for chunk in _chunked(unique_ids, MAX_QUERY_PARAMS):
+        cursor.execute(
+            "SELECT id, ingredients, nested_recipes_json FROM recipes "
+            f"WHERE id IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        )
+        for recipe_id, ingredients, nested_recipes_json in cursor:
+            recipes[recipe_id] = Recipe.from_row(ingredients, nested_recipes_json)
+    return recipes
+
+
+@with_db_connection()
+def fetch_recipes_by_names(
+    recipe_names: Iterable[str], conn: Optional[sqlite3.Connection] = None
+) -> Dict[int, Recipe]:
+    """
+    Get many recipes from the database by name.
+
+    Runs one query per MAX_QUERY_PARAMS names rather than one per recipe.
+
+    Args:
+        recipe_names (iterable): The names of the recipes to query for.
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        dict: Recipe objects keyed by ID. A name shared by several recipes
+        returns all of them; unknown names are left out.
+    """
+    recipes = {}
+    cursor = conn.cursor()
+    for chunk in _chunked(list(set(recipe_names)), MAX_QUERY_PARAMS):
+        cursor.execute(
+            "SELECT id, ingredients, nested_recipes_json FROM recipes "
+            f"WHERE name IN ({', '.join('?' * len(chunk))}) ORDER BY id",
+            chunk,
+        )
+        for recipe_id, ingredients, nested_recipes_json in cursor:
+            recipes[recipe_id] = Recipe.from_row(ingredients, nested_recipes_json)
+    return recipes
+
+
+@with_db_connection()
+def fetch_base_ingredients(
+    recipe_id: int,
+    runs_needed: int,
+    max_depth: Optional[int] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> Dict[str, int]:
+    """
+    Get the base ingredients for a number of runs of a recipe, expanding
+    the nested recipe tree inside SQLite with a recursive query.
+
+    Runs of every nested recipe are rounded up per branch, exactly like
+    recipe_logic.calculate_base_ingredients.
+
+    Args:
+        recipe_id (int): The ID of the recipe to expand.
+        runs_needed (int): The number of times the recipe needs to be executed.
+        max_depth (int, optional): How many levels of nested recipes to
+        follow. Defaults to traversal.MAX_DEPTH.
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        dict: A dictionary of base ingredients and their required quantities.
+
+    Raises:
+        RecipeCycleError: If the recipe (indirectly) contains itself.
+        RecipeDepthError: If the nested recipes are deeper than max_depth.
+    """
+    if max_depth is None:
+        max_depth = traversal.MAX_DEPTH
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        WITH RECURSIVE expand (recipe_id, runs, depth) AS (
+            SELECT ?, ?, 0
+            UNION ALL
+            SELECT e.child_id,
+                   (e.quantity * x.runs + r.output_count - 1) / r.output_count,
+                   x.depth + 1
+            FROM expand AS x
+            JOIN recipe_edges AS e ON e.parent_id = x.recipe_id
+            JOIN recipes AS r ON r.id = e.child_id
+            WHERE x.depth < ?
+        )
+        SELECT i.ingredient, SUM(i.quantity * x.runs),
+               (SELECT MAX(depth) FROM expand)
+        FROM expand AS x
+        LEFT JOIN recipe_ingredients AS i ON i.recipe_id = x.recipe_id
+        GROUP BY i.ingredient
+        """,
+        # Follow one level past max_depth to tell a tree that is exactly
+        # max_depth deep from one that is deeper.
+        (int(recipe_id), runs_needed, max_depth + 1),
+    )
+    base_ingredients = {}
+    for ingredient, quantity, depth in cursor.fetchall():
+        if depth > max_depth:
+            check_for_cycles([recipe_id], conn=conn)
+            raise RecipeDepthError(recipe_id, max_depth)
+        if ingredient is not None:
+            base_ingredients[ingredient] = quantity
+    return base_ingredients
+
+
 @with_db_connection()
 def list_recipes(
     conn: Optional[sqlite3.Connection] = None,
@@ -213,12 +1549,93 @@ def list_recipes(
         will be created.
 
     Returns:
-        A list of all recipes in DB
+        A list of (id, name, output_count) for all recipes in DB
     """
 
     cursor = conn.cursor()
-    query = "SELECT id, name, output_count FROM recipes"
+    query = "SELECT id, name, output_count FROM recipes ORDER BY id"
     cursor.execute(query)
-    recipes = cursor.fetchall()
+    return cursor.fetchall()
+
+
+@with_db_connection()
+def search_recipes(
+    query: str = "",
+    limit: int = SEARCH_PAGE_SIZE,
+    after: Optional[int] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> List[Tuple[int, str, int]]:
+    """
+    Get a page of the recipes whose name starts with a prefix, ignoring
+    ASCII case, ordered by name and then ID.
 
-    return [(idx + 1, recipe[1], recipe[2]) for idx, recipe in enumerate(recipes)]
+    Pages are fetched by keyset rather than by offset: pass the ID of the
+    last recipe of a page as ``after`` to get the next one. Every page is
+    a range scan of the name index, so its cost does not grow with the
+    number of recipes or of pages before it.
+
+    Args:
+        query (str): The name prefix. An empty query matches every recipe.
+        limit (int): Maximum number of recipes to return.
+        after (int, optional): ID of the last recipe of the previous page.
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        A list of (id, name, output_count), at most ``limit`` long.
+
+    Raises:
+        ValueError: If there is no recipe with the ID given as ``after``.
+    """
+    cursor = conn.cursor()
+    conditions = []
+    params: List[Any] = []
+    lower = query
+    if after is not None:
+        row = cursor.execute(
+            "SELECT name FROM recipes WHERE id = ?", (after,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown recipe ID: {after}")
+        # The previous page only held matches, so its last name is at or
+        # past the prefix; rows sharing that name continue by ID.
+        lower = row[0]
+        conditions.append("(name COLLATE NOCASE, id) > (?, ?)")
+        params += [lower, after]
+    if lower:
+        conditions.append("name >= ? COLLATE NOCASE")
+        params.append(lower)
+    if query:
+        conditions.append("name < ? COLLATE NOCASE")
+        params.append(query + _PREFIX_END)
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    cursor.execute(
+        f"SELECT id, name, output_count FROM recipes {where}"
+        "ORDER BY name COLLATE NOCASE, id LIMIT ?",
+        params + [limit],
+    )
+    return cursor.fetchall()
+
+
+@with_db_connection()
+def fetch_recipe_summary(
+    recipe_id: int, conn: Optional[sqlite3.Connection] = None
+) -> Optional[Tuple[int, str, int]]:
+    """
+    Get the ID, name and output count of a recipe without decoding it.
+
+    Args:
+        recipe_id (int): The ID of the recipe.
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        (id, name, output_count), or None if there is no such recipe.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, name, output_count FROM recipes WHERE id = ?", (recipe_id,)
+    )
+    return cursor.fetchone()
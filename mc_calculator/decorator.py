@@ -1,36 +1,233 @@
+"""
+This module provides the auto_log instrumentation decorator and the timing
+histograms it records into.
+"""
 import logging
 import functools
+import threading
 import time
-from typing import Callable, Any
+from typing import Callable, Any, Dict, Optional
 
+# Fraction of calls timed by auto_log when a decorator does not set its own.
+DEFAULT_SAMPLE_RATE = 1.0
 
-def auto_log(logger_name: str) -> Callable:
+
+class Histogram:
+    """
+    Aggregates call durations into power-of-two nanosecond buckets.
+
+    Attributes:
+        name (str): Qualified name of the timed function.
+        count (int): Number of recorded calls.
+        total_ns (int): Sum of recorded durations.
+        min_ns (int): Shortest recorded duration.
+        max_ns (int): Longest recorded duration.
+        buckets (list): buckets[i] counts durations d with d.bit_length() == i,
+        i.e. 2**(i-1) <= d < 2**i nanoseconds.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * 65
+
+    def reset(self) -> None:
+        """
+        Discards every recorded duration.
+        """
+        self.count = self.total_ns = self.min_ns = self.max_ns = 0
+        self.buckets = [0] * 65
+
+    def record(self, duration_ns: int) -> None:
+        """
+        Adds one duration to the histogram.
+
+        Args:
+            duration_ns (int): The duration in nanoseconds.
+        """
+        if not self.count or duration_ns < self.min_ns:
+            self.min_ns = duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+        self.count += 1
+        self.total_ns += duration_ns
+        self.buckets[min(duration_ns.bit_length(), 64)] += 1
+
+    def percentile(self, fraction: float) -> int:
+        """
+        Get an upper bound for a percentile of the recorded durations.
+
+        Args:
+            fraction (float): The percentile as a fraction, e.g. 0.99.
+
+        Returns:
+            int: Upper edge in nanoseconds of the bucket holding the percentile.
+        """
+        if not self.count:
+            return 0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return min(1 << index, self.max_ns)
+        return self.max_ns
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the histogram as plain data.
+
+        Returns:
+            dict: Count, total, min, max, mean, p50/p90/p99 and non-empty
+            buckets keyed by their upper edge in nanoseconds.
+        """
+        return {
+            "count": self.count,
+            "total_ns": self.total_ns,
+            "min_ns": self.min_ns,
+            "max_ns": self.max_ns,
+            "mean_ns": self.total_ns // self.count if self.count else 0,
+            "p50_ns": self.percentile(0.5),
+            "p90_ns": self.percentile(0.9),
+            "p99_ns": self.percentile(0.99),
+            "buckets": {
+                1 << index: bucket
+                for index, bucket in enumerate(self.buckets)
+                if bucket
+            },
+        }
+
+
+_timings: Dict[str, Histogram] = {}
+_timings_lock = threading.Lock()
+_timing_forced = False
+
+
+def get_histogram(name: str) -> Histogram:
+    """
+    Get (creating if needed) the timing histogram of a function.
+
+    Args:
+        name (str): Logger name and function name, joined with a dot.
+
+    Returns:
+        Histogram: The histogram.
+    """
+    histogram = _timings.get(name)
+    if histogram is None:
+        with _timings_lock:
+            histogram = _timings.setdefault(name, Histogram(name))
+    return histogram
+
+
+def timing_snapshot() -> Dict[str, Dict[str, Any]]:
     """
-    A decorator factory that creates a logging decorator.
+    Get every timing histogram that has recorded calls.
+
+    Returns:
+        dict: Histogram snapshots keyed by qualified function name.
+    """
+    return {
+        name: hist.snapshot()
+        for name, hist in sorted(_timings.items())
+        if hist.count
+    }
+
+
+def reset_timings() -> None:
+    """
+    Discards every recorded timing. Histograms stay registered, since the
+    decorated functions keep recording into them.
+    """
+    with _timings_lock:
+        for histogram in _timings.values():
+            histogram.reset()
+
+
+def force_timing(enabled: bool = True) -> None:
+    """
+    Times decorated calls even while their loggers are disabled, e.g. to
+    profile a single command.
+
+    Args:
+        enabled (bool): Whether timing is forced on.
+    """
+    global _timing_forced
+    _timing_forced = enabled
+
+
+def log_timings(logger_name: str = __name__, level: int = logging.INFO) -> None:
+    """
+    Logs one summary line per timed function.
+
+    Args:
+        logger_name (str): The name of the logger to write to.
+        level (int): The level to log at.
+    """
+    logger = logging.getLogger(logger_name)
+    if not logger.isEnabledFor(level):
+        return
+    for name, stats in timing_snapshot().items():
+        logger.log(
+            level,
+            "%s: %d calls, total %.3f ms, mean %d ns, p99 <= %d ns, max %d ns",
+            name,
+            stats["count"],
+            stats["total_ns"] / 1e6,
+            stats["mean_ns"],
+            stats["p99_ns"],
+            stats["max_ns"],
+        )
+
+
+def auto_log(logger_name: str, sample_rate: Optional[float] = None) -> Callable:
+    """
+    A decorator factory that creates a timing decorator.
+
+    While the logger is enabled for INFO (or force_timing() is on), calls
+    are timed with time.perf_counter_ns and aggregated into a per-function
+    Histogram (see timing_snapshot and log_timings) instead of writing log
+    lines per call. While it is disabled, the wrapper only checks the
+    logger's cached level before calling straight through.
 
     Args:
         logger_name (str): The name of the logger to be used.
+        sample_rate (float, optional): Fraction of calls to time, e.g. 0.01
+        times every 100th call. Defaults to DEFAULT_SAMPLE_RATE.
 
     Returns:
-        Callable: A decorator that wraps a function to add entry and exit logging.
+        Callable: A decorator that wraps a function to record its execution time.
     """
     logger = logging.getLogger(logger_name)
+    rate = DEFAULT_SAMPLE_RATE if sample_rate is None else sample_rate
+    interval = max(1, round(1 / rate)) if rate > 0 else 0
 
     def decorator(func: Callable) -> Callable:
+        histogram = get_histogram(f"{logger_name}.{func.__name__}")
+        calls = 0
+
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
-            start_time = time.time()
-            logger.info(f"Entering {func.__name__}")
+            nonlocal calls
+            if not interval or not (
+                _timing_forced or logger.isEnabledFor(logging.INFO)
+            ):
+                return func(*args, **kwargs)
+            calls += 1
+            if calls < interval:
+                return func(*args, **kwargs)
+            calls = 0
 
+            start_time = time.perf_counter_ns()
             try:
-                result = func(*args, **kwargs)
-                return result
+                return func(*args, **kwargs)
             finally:
-                end_time = time.time()
-                logger.info(
-                    f"Exiting {func.__name__}, Execution time: {end_time - start_time:.2f} seconds"
-                )
+                histogram.record(time.perf_counter_ns() - start_time)
 
+        wrapper.histogram = histogram  # type: ignore[attr-defined]
         return wrapper
 
     return decorator
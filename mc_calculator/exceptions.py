@@ -0,0 +1,52 @@
+"""
+This module defines the errors raised for recipe data that cannot be
+calculated: nested recipes that (indirectly) contain themselves, and nested
+recipe trees deeper than the configured maximum.
+
+Both derive from ValueError, which was raised for these cases before. It
+also defines the error that stops a calculation cancelled by its caller.
+"""
+from typing import Any, Sequence
+
+
+class RecipeCycleError(ValueError):
+    """
+    Raised when nested recipes form a cycle.
+
+    Attributes:
+        cycle (list): The recipes along the cycle, by name where known and
+        by ID otherwise, starting and ending with the same recipe.
+    """
+
+    def __init__(self, cycle: Sequence[Any]) -> None:
+        self.cycle = list(cycle)
+        super().__init__(
+            "Nested recipes contain a cycle: " + " -> ".join(map(str, self.cycle))
+        )
+
+
+class RecipeDepthError(ValueError):
+    """
+    Raised when nested recipes are deeper than the maximum depth.
+
+    Attributes:
+        recipe: Name or ID of the recipe whose nested recipes are too deep.
+        max_depth (int): The depth limit that was exceeded.
+    """
+
+    def __init__(self, recipe: Any, max_depth: int) -> None:
+        self.recipe = recipe
+        self.max_depth = max_depth
+        super().__init__(
+            f"Nested recipes of recipe {recipe} are deeper than {max_depth} levels."
+        )
+
+
+class CalculationCancelledError(Exception):
+    """
+    Raised inside a calculation whose cancel event was set (see
+    traversal.cancellation()), so its worker thread stops early.
+    """
+
+    def __init__(self) -> None:
+        super().__init__("The calculation was cancelled.")
@@ -0,0 +1,243 @@
+"""
+This module holds the runtime metrics registry: counters and gauges recorded
+by the database and calculation code, cache statistics, and the per-function
+timings collected by auto_log.
+
+Counters that would cost time on hot paths (queries, nodes visited, maximum
+depth) are only recorded while metrics are enabled, e.g. by ``calc --profile``.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+from . import decorator
+from .cache import CacheInfo
+
+PROMETHEUS_PREFIX = "mc_calculator"
+
+_enabled = False
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_gauges: Dict[str, int] = {}
+_caches: Dict[str, Callable[[], CacheInfo]] = {}
+
+# Help text of the counters and gauges recorded by the package.
+DESCRIPTIONS = {
+    "db_connections_opened": "SQLite connections opened.",
+    "db_queries": "SQL statements executed while metrics were enabled.",
+    "nodes_visited": "Recipe graph nodes expanded by calculations.",
+    "max_depth": "Deepest nested recipe level reached by a calculation.",
+}
+
+
+def enable(enabled: bool = True) -> None:
+    """
+    Turns recording of the detailed metrics on or off.
+
+    Enabling also forces auto_log timing on regardless of log levels.
+    Queries are counted on connections opened after metrics were enabled.
+
+    Args:
+        enabled (bool): Whether metrics are recorded.
+    """
+    global _enabled
+    _enabled = enabled
+    decorator.force_timing(enabled)
+
+
+def enabled() -> bool:
+    """
+    Get whether detailed metrics are being recorded.
+
+    Returns:
+        bool: True while metrics are enabled.
+    """
+    return _enabled
+
+
+def inc(name: str, amount: int = 1) -> None:
+    """
+    Increments a counter.
+
+    Args:
+        name (str): The counter name.
+        amount (int): The amount to add.
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe_max(name: str, value: int) -> None:
+    """
+    Raises a gauge to ``value`` if it is currently lower.
+
+    Args:
+        name (str): The gauge name.
+        value (int): The observed value.
+    """
+    if value > _gauges.get(name, 0):
+        with _lock:
+            _gauges[name] = max(_gauges.get(name, 0), value)
+
+
+def visit(depth: int) -> None:
+    """
+    Records one recipe graph node expanded at a nesting depth.
+
+    Args:
+        depth (int): Nesting level of the node, 1 for direct nested recipes.
+    """
+    inc("nodes_visited")
+    observe_max("max_depth", depth)
+
+
+def count_query(statement: str) -> None:
+    """
+    Counts one executed SQL statement. Installed as a connection's
+    trace callback.
+
+    Args:
+        statement (str): The SQL statement.
+    """
+    inc("db_queries")
+
+
+def register_cache(name: str, info: Callable[[], CacheInfo]) -> None:
+    """
+    Adds a cache to the snapshots.
+
+    Args:
+        name (str): The cache name used in reports.
+        info (callable): Returns the cache's CacheInfo.
+    """
+    _caches[name] = info
+
+
+def reset() -> None:
+    """
+    Resets every counter, gauge and timing histogram.
+    """
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+    decorator.reset_timings()
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    Get every metric as plain data.
+
+    Returns:
+        dict: "counters", "gauges", "caches" (CacheInfo fields per cache) and
+        "timings" (auto_log histograms per function).
+    """
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+    return {
+        "counters": counters,
+        "gauges": gauges,
+        "caches": {
+            name: info()._asdict() for name, info in sorted(_caches.items())
+        },
+        "timings": decorator.timing_snapshot(),
+    }
+
+
+def format_report(snap: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Formats a snapshot as a human readable report.
+
+    Args:
+        snap (dict, optional): A snapshot. Defaults to the current metrics.
+
+    Returns:
+        str: The report.
+    """
+    snap = snapshot() if snap is None else snap
+    lines = ["Metrics:"]
+    for name, value in sorted({**snap["counters"], **snap["gauges"]}.items()):
+        lines.append(f"  {name}: {value}")
+    for name, info in snap["caches"].items():
+        lookups = info["hits"] + info["misses"]
+        ratio = info["hits"] / lookups if lookups else 0.0
+        lines.append(
+            f"  cache {name}: {info['hits']} hits, {info['misses']} misses "
+            f"({ratio:.0%}), {info['currsize']}/{info['maxsize']} entries"
+        )
+    if snap["timings"]:
+        lines.append("Timings (calls, total ms, mean us, p99 us):")
+        for name, stats in snap["timings"].items():
+            lines.append(
+                f"  {name}: {stats['count']}, {stats['total_ns'] / 1e6:.3f}, "
+                f"{stats['mean_ns'] / 1e3:.1f}, {stats['p99_ns'] / 1e3:.1f}"
+            )
+    return "\n".join(lines)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(snap: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Formats a snapshot in the Prometheus text exposition format.
+
+    Args:
+        snap (dict, optional): A snapshot. Defaults to the current metrics.
+
+    Returns:
+        str: The exposition text.
+    """
+    snap = snapshot() if snap is None else snap
+    lines = []
+    for kind, values in (("counter", snap["counters"]), ("gauge", snap["gauges"])):
+        for name, value in sorted(values.items()):
+            metric = f"{PROMETHEUS_PREFIX}_{name}"
+            if kind == "counter":
+                metric += "_total"
+            if name in DESCRIPTIONS:
+                lines.append(f"# HELP {metric} {DESCRIPTIONS[name]}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {value}")
+
+    for field in ("hits", "misses", "evictions", "invalidations"):
+        metric = f"{PROMETHEUS_PREFIX}_cache_{field}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for name, info in snap["caches"].items():
+            lines.append(f'{metric}{{cache="{_escape(name)}"}} {info[field]}')
+    metric = f"{PROMETHEUS_PREFIX}_cache_size"
+    lines.append(f"# TYPE {metric} gauge")
+    for name, info in snap["caches"].items():
+        lines.append(f'{metric}{{cache="{_escape(name)}"}} {info["currsize"]}')
+
+    metric = f"{PROMETHEUS_PREFIX}_function_duration_seconds"
+    lines.append(f"# HELP {metric} Run time of auto_log instrumented functions.")
+    lines.append(f"# TYPE {metric} histogram")
+    for name, stats in snap["timings"].items():
+        label = f'function="{_escape(name)}"'
+        cumulative = 0
+        for upper_ns, count in sorted(stats["buckets"].items()):
+            cumulative += count
+            le = f"{upper_ns / 1e9:g}"
+            lines.append(f'{metric}_bucket{{{label},le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {stats["count"]}')
+        lines.append(f"{metric}_sum{{{label}}} {stats['total_ns'] / 1e9:.9f}")
+        lines.append(f"{metric}_count{{{label}}} {stats['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str, snap: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Writes a snapshot to a file in the Prometheus text exposition format, e.g.
+    for node_exporter's textfile collector.
+
+    The file is replaced atomically, so a scraper never reads it half written.
+
+    Args:
+        path (str): The file to write.
+        snap (dict, optional): A snapshot. Defaults to the current metrics.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as stream:
+        stream.write(to_prometheus(snap))
+    os.replace(tmp_path, path)
@@ -0,0 +1,112 @@
+"""
+This module provides calculate_many(), which spreads large batches of
+(recipe, quantity) requests over several processes.
+
+The compiled recipe graph is serialized once into a
+multiprocessing.shared_memory block. Every worker process maps that block
+and loads the graph from it without copying the adjacency arrays, so workers
+neither reopen the database nor unpickle the graph. Requests are split into
+chunks, and each chunk is evaluated in a worker with calculate_batch().
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from .batch import calculate_batch
+from .recipe_graph import RecipeGraph, get_graph
+
+Result = Tuple[Dict[str, int], List[Tuple[str, int, int, List, int]]]
+
+# Chunks per worker when no chunk size is given: enough to balance uneven
+# requests without paying per-task overhead on every request.
+CHUNKS_PER_WORKER = 4
+
+# State of a worker process, set by _init_worker().
+_worker_memory: Optional[shared_memory.SharedMemory] = None
+_worker_graph: Optional[RecipeGraph] = None
+
+
+def _init_worker(memory_name: str) -> None:
+    global _worker_memory, _worker_graph
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    _worker_graph = RecipeGraph.from_bytes(_worker_memory.buf)
+
+
+def _run_chunk(
+    requests: List[Tuple[Union[str, int], int]], aggregate: bool
+) -> List[Result]:
+    return list(calculate_batch(requests, _worker_graph, aggregate))
+
+
+def calculate_many(
+    requests: Iterable[Tuple[Union[str, int], int]],
+    graph: Optional[RecipeGraph] = None,
+    aggregate: bool = False,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> List[Result]:
+    """
+    Calculates many requests in parallel worker processes.
+
+    Result ``i`` matches ``calculate()`` (or, with ``aggregate``,
+    ``calculate_aggregated()``) for request ``i`` exactly. Starting the
+    workers costs tens of milliseconds, so use calculate_batch() for
+    batches that take less than that.
+
+    Args:
+        requests (iterable): (recipe name or database ID, desired quantity)
+        pairs.
+        graph (RecipeGraph, optional): Compiled graph to run against.
+        Defaults to the shared graph of the database.
+        aggregate (bool): Share leftover output of intermediates across
+        branches, like calculate_aggregated().
+        workers (int, optional): Number of worker processes. Defaults to the
+        number of CPUs.
+        chunk_size (int, optional): Requests per task. Defaults to spreading
+        the requests over CHUNKS_PER_WORKER tasks per worker.
+
+    Returns:
+        list: One (ingredients, steps) tuple per request, in request order.
+
+    Raises:
+        ValueError: If a requested recipe does not exist or contains a cycle.
+    """
+    requests = list(requests)
+    if not requests:
+        return []
+    if graph is None:
+        graph = get_graph()
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = -(-len(requests) // (workers * CHUNKS_PER_WORKER))
+    # Requests for the same recipe go to the same chunk where possible, so
+    # each worker builds the evaluation plan of a recipe once.
+    order = sorted(range(len(requests)), key=lambda index: str(requests[index][0]))
+    chunks = [
+        [requests[index] for index in order[start : start + chunk_size]]
+        for start in range(0, len(order), chunk_size)
+    ]
+
+    payload = graph.to_bytes()
+    memory = shared_memory.SharedMemory(create=True, size=len(payload))
+    try:
+        memory.buf[: len(payload)] = payload
+        del payload
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)),
+            initializer=_init_worker,
+            initargs=(memory.name,),
+        ) as executor:
+            results: List[Optional[Result]] = [None] * len(requests)
+            chunk_results = executor.map(
+                _run_chunk, chunks, itertools.repeat(aggregate)
+            )
+            for index, result in zip(
+                order, itertools.chain.from_iterable(chunk_results)
+            ):
+                results[index] = result
+            return results  # type: ignore[return-value]
+    finally:
+        memory.close()
+        memory.unlink()
@@ -1,11 +1,267 @@
 """
 This module defines the Recipe class, used for creating and manipulating
 crafting recipes in the Minecraft Recipe Calculator application.
+
+Recipes are stored compactly: ingredient names are interned once per process
+and mapped to integer item ids, and ingredients and nested recipes are kept
+as parallel ``array`` id/quantity pairs. The ``ingredients`` and
+``nested_recipes`` attributes are dict-like views over those arrays.
+
+Besides JSON, recipes can be encoded in a compact binary layout (see
+Recipe.to_bytes). Decoding it is lazy: nested recipes and quantities are
+memoryview casts over the row's buffer, and ingredient names and slots are
+only decoded when first accessed.
 """
 import json
-from typing import Dict, Optional
+import struct
+import sys
+import threading
+from abc import abstractmethod
+from array import array
+from collections.abc import ItemsView, MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
 from .crafting_block import CraftingBlock
 
+# Process-wide item name table. Names are never removed, so ids stay valid
+# for the lifetime of the process.
+_item_ids: Dict[str, int] = {}
+_item_names: List[str] = []
+_intern_lock = threading.Lock()
+
+# Quantities are stored as int64, the range SQLite stores integers in.
+MAX_QUANTITY = 2**63 - 1
+
+# Shared empty arrays. Views replace arrays on write instead of mutating
+# them in place, so sharing is safe.
+_EMPTY_IDS = array("I")
+_EMPTY_RECIPE_IDS = array("q")
+_EMPTY_QTY = array("q")
+
+# Binary recipe layout, all little-endian. The header holds magic, version,
+# output_count, shaped, the byte lengths of name, crafting block and slots
+# JSON, and the ingredient and nested recipe counts. It is followed by
+# 8-byte aligned sections: nested recipe ids (int64), nested quantities,
+# ingredient quantities (int64; uint32 in version 1 payloads), ingredient
+# name lengths (uint16), and finally the UTF-8 strings: name, crafting
+# block, ingredient names, slots.
+BINARY_MAGIC = b"MCR"
+BINARY_VERSION = 2
+_QTY_TYPECODES = {1: "I", 2: "q"}  # Quantity typecode per layout version
+_HEADER = struct.Struct("<3sBIBxHHIHH")
+_HEADER_SIZE = -(-_HEADER.size // 8) * 8
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def intern_item(item_name: str) -> int:
+    """
+    Get the process-wide integer id of an item name, assigning one if needed.
+
+    Args:
+        item_name (str): The ingredient or item name.
+
+    Returns:
+        int: The item id.
+    """
+    item_id = _item_ids.get(item_name)
+    if item_id is None:
+        with _intern_lock:
+            item_id = _item_ids.get(item_name)
+            if item_id is None:
+                item_id = len(_item_names)
+                item_name = sys.intern(item_name)
+                _item_names.append(item_name)
+                _item_ids[item_name] = item_id
+    return item_id
+
+
+def item_name(item_id: int) -> str:
+    """
+    Get the item name of an id returned by intern_item().
+
+    Args:
+        item_id (int): The item id.
+
+    Returns:
+        str: The item name.
+    """
+    return _item_names[item_id]
+
+
+class _PairItemsView(ItemsView):
+    def __iter__(self) -> Iterator[Tuple[Any, int]]:
+        return self._mapping._pairs()
+
+
+class _ArrayMappingView(MutableMapping):
+    """
+    Dict-like view of one of a recipe's id/quantity array pairs.
+
+    Subclasses name the arrays and implement _encode() and _decode(), which
+    map keys to the ids stored in the arrays and back.
+    """
+
+    __slots__ = ("_recipe",)
+    _ids_attr = ""
+    _qty_attr = ""
+    _ids_typecode = "I"
+
+    def __init__(self, recipe: "Recipe") -> None:
+        self._recipe = recipe
+
+    @abstractmethod
+    def _encode(self, key: Any, create: bool = False) -> Optional[int]:
+        """
+        Get the id stored for a key, None if it has none, assigning one if
+        ``create`` is true.
+        """
+
+    @abstractmethod
+    def _decode(self, key_id: int) -> Any:
+        """
+        Get the key of a stored id.
+        """
+
+    def _arrays(self) -> Tuple[array, array]:
+        recipe = self._recipe
+        return getattr(recipe, self._ids_attr), getattr(recipe, self._qty_attr)
+
+    def _pairs(self) -> Iterator[Tuple[Any, int]]:
+        ids, qty = self._arrays()
+        decode = self._decode
+        for pos, key_id in enumerate(ids):
+            yield decode(key_id), qty[pos]
+
+    def _position(self, key: Any) -> int:
+        key_id = self._encode(key)
+        if key_id is not None:
+            ids, _ = self._arrays()
+            for pos, value in enumerate(ids):
+                if value == key_id:
+                    return pos
+        raise KeyError(key)
+
+    def __getitem__(self, key: Any) -> int:
+        _, qty = self._arrays()
+        return qty[self._position(key)]
+
+    def _copy_arrays(self) -> Tuple[array, array]:
+        # Arrays may be shared or memoryviews over a binary row, so writes
+        # always go to fresh copies.
+        ids, qty = self._arrays()
+        return array(self._ids_typecode, ids), array("q", qty)
+
+    def __setitem__(self, key: Any, quantity: int) -> None:
+        (quantity,) = _quantity_array([quantity])
+        ids, qty = self._copy_arrays()
+        try:
+            qty[self._position(key)] = quantity
+        except KeyError:
+            ids.append(self._encode(key, create=True))
+            qty.append(quantity)
+        setattr(self._recipe, self._ids_attr, ids)
+        setattr(self._recipe, self._qty_attr, qty)
+
+    def __delitem__(self, key: Any) -> None:
+        pos = self._position(key)
+        ids, qty = self._copy_arrays()
+        del ids[pos]
+        del qty[pos]
+        setattr(self._recipe, self._ids_attr, ids)
+        setattr(self._recipe, self._qty_attr, qty)
+
+    def __iter__(self) -> Iterator[Any]:
+        ids, _ = self._arrays()
+        return map(self._decode, ids)
+
+    def __len__(self) -> int:
+        ids, _ = self._arrays()
+        return len(ids)
+
+    def items(self) -> ItemsView:
+        return _PairItemsView(self)
+
+    def copy(self) -> Dict[Any, int]:
+        """
+        Get the view's contents as a plain dict.
+        """
+        return dict(self._pairs())
+
+    def __repr__(self) -> str:
+        return repr(self.copy())
+
+
+class IngredientsView(_ArrayMappingView):
+    """
+    Dict-like view of a recipe's base ingredients, ``{item name: quantity}``.
+    """
+
+    __slots__ = ()
+    _ids_attr = "_ingredient_ids"
+    _qty_attr = "_ingredient_qty"
+
+    def _encode(self, key: Any, create: bool = False) -> Optional[int]:
+        if create:
+            return intern_item(key)
+        return _item_ids.get(key)
+
+    def _decode(self, key_id: int) -> str:
+        return _item_names[key_id]
+
+
+class NestedRecipesView(_ArrayMappingView):
+    """
+    Dict-like view of a recipe's nested recipes, ``{recipe id: quantity}``.
+    Keys are ints; string keys, as read from JSON, are accepted on lookup.
+    """
+
+    __slots__ = ()
+    _ids_attr = "_nested_ids"
+    _qty_attr = "_nested_qty"
+    _ids_typecode = "q"
+
+    def _encode(self, key: Any, create: bool = False) -> Optional[int]:
+        try:
+            return int(key)
+        except (TypeError, ValueError):
+            return None
+
+    def _decode(self, key_id: int) -> int:
+        return key_id
+
+
+def _quantity_array(quantities: Iterable[int]) -> array:
+    """
+    Packs quantities into an int64 array.
+
+    Raises:
+        ValueError: If a quantity is negative or above MAX_QUANTITY.
+    """
+    try:
+        qty = array("q", quantities)
+    except OverflowError:
+        qty = None
+    if qty is None or (qty and min(qty) < 0):
+        raise ValueError(f"Quantities must be from 0 to {MAX_QUANTITY}.")
+    return qty
+
+
+def _encode_ingredients(ingredients: Optional[Mapping[str, int]]) -> Tuple:
+    if not ingredients:
+        return _EMPTY_IDS, _EMPTY_QTY
+    return (
+        array("I", [intern_item(name) for name in ingredients]),
+        _quantity_array(ingredients.values()),
+    )
+
+
+def _encode_nested(nested_recipes: Optional[Mapping[Any, int]]) -> Tuple:
+    if not nested_recipes:
+        return _EMPTY_RECIPE_IDS, _EMPTY_QTY
+    return (
+        array("q", [int(n_id) for n_id in nested_recipes]),
+        _quantity_array(nested_recipes.values()),
+    )
+
 
 class Recipe:
     """
@@ -17,10 +273,28 @@ class Recipe:
         output_count (int): Number of items produced by the recipe.
         shaped (bool): Indicates if the recipe is shaped.
         slots (dict): Slot configuration for the recipe.
-        ingredients (dict): Ingredients required for the recipe.
-        nested_recipes (dict): Nested recipes within this recipe.
+        ingredients (IngredientsView): Ingredients required for the recipe,
+        as ``{item name: quantity}``.
+        nested_recipes (NestedRecipesView): Nested recipes within this recipe,
+        as ``{recipe id: quantity}`` with int keys.
+
+    Ingredient and nested recipe quantities range from 0 to MAX_QUANTITY;
+    setting others raises ValueError.
     """
 
+    __slots__ = (
+        "name",
+        "crafting_block",
+        "output_count",
+        "shaped",
+        "slots",
+        "_ingredient_ids",
+        "_ingredient_qty",
+        "_nested_ids",
+        "_nested_qty",
+        "_payload",
+    )
+
     def __init__(
         self,
         name: str,
@@ -40,10 +314,54 @@ class Recipe:
         self.output_count = output_count
         self.shaped = shaped
         self.slots = slots if slots else {}
-        self.ingredients = ingredients if ingredients else {}
-        self.nested_recipes = (
-            nested_recipes if nested_recipes else {}
-        )  # Format: {recipe_id: quantity, ...}
+        self.ingredients = ingredients
+        self.nested_recipes = nested_recipes  # Format: {recipe_id: quantity, ...}
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only reached for attributes from_bytes() left to decode on first use.
+        if attr == "_ingredient_ids":
+            self._decode_ingredient_names()
+        elif attr == "slots":
+            self._decode_slots()
+        else:
+            raise AttributeError(attr)
+        return getattr(self, attr)
+
+    def __reduce__(self) -> Tuple:
+        return Recipe.from_dict, (self.to_dict(),)
+
+    @property
+    def ingredients(self) -> IngredientsView:
+        return IngredientsView(self)
+
+    @ingredients.setter
+    def ingredients(self, ingredients: Optional[Mapping[str, int]]) -> None:
+        self._ingredient_ids, self._ingredient_qty = _encode_ingredients(ingredients)
+
+    @property
+    def nested_recipes(self) -> NestedRecipesView:
+        return NestedRecipesView(self)
+
+    @nested_recipes.setter
+    def nested_recipes(self, nested_recipes: Optional[Mapping[Any, int]]) -> None:
+        self._nested_ids, self._nested_qty = _encode_nested(nested_recipes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts the recipe into plain data.
+
+        Returns:
+            dict: The recipe's fields, with the crafting block by name.
+        """
+        return {
+            "name": self.name,
+            "crafting_block": self.crafting_block.name,
+            "output_count": self.output_count,
+            "shaped": self.shaped,
+            "slots": self.slots,
+            "ingredients": self.ingredients.copy(),
+            "nested_recipes": self.nested_recipes.copy(),
+        }
 
     def to_json(self) -> str:
         """
@@ -52,9 +370,187 @@ class Recipe:
         Returns:
             str: JSON string representation of the recipe.
         """
-        recipe_dict = self.__dict__.copy()
-        recipe_dict["crafting_block"] = self.crafting_block.name
-        return json.dumps(recipe_dict)
+        return json.dumps(self.to_dict())
+
+    @staticmethod
+    def from_dict(data: Mapping[str, Any]) -> "Recipe":
+        """
+        Creates a Recipe object from the output of to_dict().
+
+        Args:
+            data (dict): The recipe's fields.
+
+        Returns:
+            Recipe: The recipe.
+        """
+        return Recipe(
+            name=data["name"],
+            crafting_block=data["crafting_block"],
+            output_count=data["output_count"],
+            shaped=data["shaped"],
+            slots=data.get("slots"),
+            ingredients=data.get("ingredients"),
+            nested_recipes=data.get("nested_recipes"),
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        Converts the recipe into the compact binary layout.
+
+        Returns:
+            bytes: The encoded recipe.
+        """
+        ingredient_names = [name.encode("utf-8") for name in self.ingredients]
+        strings = [
+            self.name.encode("utf-8"),
+            self.crafting_block.name.encode("utf-8"),
+            *ingredient_names,
+            json.dumps(self.slots).encode("utf-8") if self.slots else b"",
+        ]
+        sections = [
+            array("q", self._nested_ids),
+            array("q", self._nested_qty),
+            array("q", self._ingredient_qty),
+            array("H", [len(name) for name in ingredient_names]),
+        ]
+        if not _LITTLE_ENDIAN:
+            for section in sections:
+                section.byteswap()
+        parts = [
+            _HEADER.pack(
+                BINARY_MAGIC,
+                BINARY_VERSION,
+                self.output_count,
+                1 if self.shaped else 0,
+                len(strings[0]),
+                len(strings[1]),
+                len(strings[-1]),
+                len(ingredient_names),
+                len(self._nested_ids),
+            ).ljust(_HEADER_SIZE, b"\0")
+        ]
+        for section in sections:
+            data = section.tobytes()
+            parts.append(data + b"\0" * (-len(data) % 8))
+        parts.extend(strings)
+        return b"".join(parts)
+
+    @staticmethod
+    def is_binary(payload: Any) -> bool:
+        """
+        Tells whether a stored payload uses the binary layout.
+
+        Args:
+            payload: The value of a recipe row's ingredients column.
+
+        Returns:
+            bool: True for binary payloads, False for JSON.
+        """
+        return isinstance(payload, (bytes, memoryview)) and (
+            bytes(payload[:3]) == BINARY_MAGIC
+        )
+
+    @staticmethod
+    def from_bytes(payload: Any) -> "Recipe":
+        """
+        Creates a Recipe object from the binary layout without copying it.
+
+        Nested recipes and quantities are read through memoryviews of
+        ``payload``; ingredient names and slots are decoded on first access.
+
+        Args:
+            payload (bytes-like): Output of to_bytes().
+
+        Returns:
+            Recipe: The recipe.
+
+        Raises:
+            ValueError: If the payload is not a supported binary recipe.
+        """
+        view = memoryview(payload).cast("B")
+        (
+            magic,
+            version,
+            output_count,
+            shaped,
+            name_len,
+            block_len,
+            slots_len,
+            n_ingredients,
+            n_nested,
+        ) = _HEADER.unpack_from(view)
+        if magic != BINARY_MAGIC or version not in _QTY_TYPECODES:
+            raise ValueError("Not a binary recipe payload.")
+
+        offset = _HEADER_SIZE
+        sections = []
+        qty_typecode = _QTY_TYPECODES[version]
+        for typecode, count in (
+            ("q", n_nested),
+            (qty_typecode, n_nested),
+            (qty_typecode, n_ingredients),
+            ("H", n_ingredients),
+        ):
+            size = struct.calcsize(typecode) * count
+            section = view[offset : offset + size].cast(typecode)
+            if not _LITTLE_ENDIAN:
+                section = array(typecode, section)
+                section.byteswap()
+            sections.append(section)
+            offset += size + (-size % 8)
+
+        recipe = Recipe.__new__(Recipe)
+        recipe.name = str(view[offset : offset + name_len], "utf-8")
+        offset += name_len
+        recipe.crafting_block = CraftingBlock.get_block(
+            str(view[offset : offset + block_len], "utf-8")
+        )
+        offset += block_len
+        recipe.output_count = output_count
+        recipe.shaped = bool(shaped)
+        recipe._nested_ids, recipe._nested_qty = sections[0], sections[1]
+        recipe._ingredient_qty = sections[2]
+        # _ingredient_ids and slots stay unset until __getattr__ decodes them.
+        recipe._payload = (view, offset, sections[3], slots_len)
+        return recipe
+
+    def _decode_ingredient_names(self) -> None:
+        view, offset, name_lengths, _ = self._payload
+        ids = array("I")
+        for length in name_lengths:
+            ids.append(intern_item(str(view[offset : offset + length], "utf-8")))
+            offset += length
+        self._ingredient_ids = ids
+
+    def _decode_slots(self) -> None:
+        view, offset, name_lengths, slots_len = self._payload
+        offset += sum(name_lengths)
+        self.slots = (
+            json.loads(str(view[offset : offset + slots_len], "utf-8"))
+            if slots_len
+            else {}
+        )
+
+    @staticmethod
+    def from_row(
+        payload: Any, nested_recipes_json_str: Optional[str] = None
+    ) -> "Recipe":
+        """
+        Creates a Recipe object from a recipes row, whichever encoding its
+        ingredients column uses.
+
+        Args:
+            payload (str or bytes): The row's ingredients column.
+            nested_recipes_json_str (str, optional): The row's
+            nested_recipes_json column. Ignored for binary payloads, which
+            carry their nested recipes.
+
+        Returns:
+            Recipe: The recipe.
+        """
+        if Recipe.is_binary(payload):
+            return Recipe.from_bytes(payload)
+        return Recipe.from_json(payload, nested_recipes_json_str)
 
     @staticmethod
     def from_json(
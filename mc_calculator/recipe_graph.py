@@ -0,0 +1,732 @@
+"""
+This module defines the RecipeGraph class, a compiled, read-only view of every
+recipe in the database that the calculation functions run against instead of
+fetching and decoding one recipe per visited edge.
+
+A graph can be serialized into one flat buffer (see RecipeGraph.to_bytes),
+for example to share it between processes through shared memory or to map a
+snapshot file (see the snapshot module). Loading it back parses nothing: the
+adjacency arrays become memoryview casts over the buffer, strings are decoded
+on first access, and lookups by ID or name binary-search sorted index
+sections instead of filling dictionaries.
+"""
+import bisect
+import itertools
+import sqlite3
+import struct
+import sys
+from array import array
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+from . import database_ops as db
+from . import recipe as rcp
+from . import traversal
+from .cache import VersionedLRUCache
+from .exceptions import RecipeCycleError
+
+_serials = itertools.count()
+
+# Binary graph layout, all little-endian. The header holds magic, version,
+# the data version and the node, item, ingredient and edge counts. It is
+# followed by 8-byte aligned sections in _SECTIONS order and then the UTF-8
+# text of every recipe name, crafting block and item name, concatenated;
+# string_offsets gives the byte offset of each of them in that text, plus
+# its end. The *_order sections list node or item indices sorted by ID or
+# name, for binary search.
+GRAPH_MAGIC = b"MCG"
+GRAPH_VERSION = 3
+_HEADER = struct.Struct("<3sBqIIII")
+_HEADER_SIZE = -(-_HEADER.size // 8) * 8
+_LITTLE_ENDIAN = sys.byteorder == "little"
+# (attribute, typecode, length: "nodes", "offsets", "items", "ing", "edges"
+# or "strings")
+_SECTIONS = (
+    ("recipe_ids", "q", "nodes"),
+    ("output_counts", "I", "nodes"),
+    ("ing_offsets", "I", "offsets"),
+    ("ing_items", "I", "ing"),
+    ("ing_qty", "q", "ing"),
+    ("edge_offsets", "I", "offsets"),
+    ("edge_child", "I", "edges"),
+    ("edge_qty", "q", "edges"),
+    ("id_order", "I", "nodes"),
+    ("name_order", "I", "nodes"),
+    ("item_order", "I", "items"),
+    ("string_offsets", "Q", "strings"),
+    ("shaped", "B", "nodes"),
+)
+
+
+class _StringTable(Sequence):
+    """
+    The strings of a binary graph, decoded from the buffer on first access.
+    """
+
+    def __init__(
+        self, text: memoryview, offsets: Sequence[int], start: int, count: int
+    ) -> None:
+        self._text = text
+        self._offsets = offsets
+        self._start = start
+        self._decoded: List[Optional[str]] = [None] * count
+
+    def __len__(self) -> int:
+        return len(self._decoded)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        value = self._decoded[index]
+        if value is None:
+            pos = self._start + index % len(self._decoded)
+            begin, end = self._offsets[pos], self._offsets[pos + 1]
+            value = self._decoded[index] = str(self._text[begin:end], "utf-8")
+        return value
+
+
+class _SortedIndex:
+    """
+    Maps keys to positions by binary search over a sorted permutation, like
+    the dictionaries of a compiled graph. Of equal keys the first position
+    wins.
+    """
+
+    def __init__(self, keys: Sequence[Any], order: Sequence[int]) -> None:
+        self._keys = keys
+        self._order = order
+
+    def get(self, key: Hashable, default: Optional[int] = None) -> Optional[int]:
+        order, keys = self._order, self._keys
+        try:
+            pos = bisect.bisect_left(order, key, key=keys.__getitem__)
+        except TypeError:  # Not comparable with the keys
+            return default
+        if pos < len(order) and keys[order[pos]] == key:
+            return order[pos]
+        return default
+
+
+class RecipeGraph:
+    """
+    Represents the recipes table compiled into flat adjacency arrays.
+
+    Every recipe is assigned a dense node index (0..n-1). Base ingredients and
+    nested recipe edges are stored CSR style: the entries for node ``i`` live
+    in ``[offsets[i], offsets[i + 1])`` of the matching item/quantity arrays.
+
+    Attributes:
+        version (int): Database data version the graph was compiled from.
+        token (tuple): Unique (version, serial) pair identifying this graph,
+        for caches of results computed against it.
+        stamp (tuple, optional): database_ops.database_stamp() of the
+        database when the graph was compiled, used to notice writes by other
+        processes. None if unknown.
+        db_path (str, optional): Database file of the shared graph, the
+        scope its results are cached under. None for other graphs.
+        recipe_ids (array): Database id of each node.
+        names (sequence): Recipe name of each node.
+        output_counts (array): Output count of each node.
+        crafting_blocks (sequence): Crafting block name of each node, "" if
+        none.
+        shaped (bytearray): 1 for shaped recipes, 0 otherwise.
+        item_names (sequence): Interned base ingredient names.
+        ing_offsets (array): Per-node offsets into ing_items / ing_qty.
+        ing_items (array): Base ingredient index into item_names.
+        ing_qty (array): Base ingredient quantity per run.
+        edge_offsets (array): Per-node offsets into edge_child / edge_qty.
+        edge_child (array): Node index of each nested recipe.
+        edge_qty (array): Nested recipe quantity per run.
+    """
+
+    def __init__(self, version: int = 0) -> None:
+        self.version = version
+        self.token = (version, next(_serials))
+        self.stamp: Optional[Tuple[int, int, int]] = None
+        self.db_path: Optional[str] = None
+        self.recipe_ids = array("q")
+        self.names: List[str] = []
+        self.output_counts = array("I")
+        self.crafting_blocks: List[str] = []
+        self.shaped = bytearray()
+        self.item_names: List[str] = []
+        self.ing_offsets = array("I", [0])
+        self.ing_items = array("I")
+        self.ing_qty = array("q")
+        self.edge_offsets = array("I", [0])
+        self.edge_child = array("I")
+        self.edge_qty = array("q")
+        # Dictionaries, or _SortedIndex lookups for graphs loaded from bytes.
+        self._node_of_id: Any = {}
+        self._node_of_name: Any = {}
+        self._item_index: Any = {}
+        # Reverse (child -> parent) adjacency, built on first use.
+        self._parent_offsets: Optional[array] = None
+        self._parent_nodes: Optional[array] = None
+
+    @classmethod
+    def from_rows(
+        cls,
+        recipe_rows: Iterable[Tuple[int, str, int, str, bool]],
+        ingredient_rows: Iterable[Tuple[int, str, int]],
+        edge_rows: Iterable[Tuple[int, int, int]],
+        version: int = 0,
+    ) -> "RecipeGraph":
+        """
+        Compiles a graph from rows shaped like the recipes, recipe_ingredients
+        and recipe_edges tables.
+
+        Ingredient and edge rows keep their order within each recipe. Edges
+        to recipe ids that are not part of ``recipe_rows`` are dropped,
+        matching how the calculator skips recipes it cannot fetch.
+
+        Args:
+            recipe_rows (iterable): (id, name, output_count, crafting_block, shaped)
+            ingredient_rows (iterable): (recipe_id, ingredient, quantity)
+            edge_rows (iterable): (parent_id, child_id, quantity)
+            version (int): Data version to stamp on the graph.
+
+        Returns:
+            RecipeGraph: The compiled graph.
+        """
+        graph = cls(version)
+        for recipe_id, name, output_count, crafting_block, shaped in recipe_rows:
+            node = len(graph.names)
+            graph.recipe_ids.append(recipe_id)
+            graph.names.append(name)
+            graph.output_counts.append(output_count)
+            graph.crafting_blocks.append(crafting_block or "")
+            graph.shaped.append(1 if shaped else 0)
+            graph._node_of_id[recipe_id] = node
+            graph._node_of_name.setdefault(name, node)
+
+        ingredients: Dict[int, List[Tuple[int, int]]] = {}
+        for recipe_id, ingredient, quantity in ingredient_rows:
+            node = graph._node_of_id.get(recipe_id)
+            if node is not None:
+                ingredients.setdefault(node, []).append(
+                    (graph._intern(ingredient), quantity)
+                )
+        edges: Dict[int, List[Tuple[int, int]]] = {}
+        for parent_id, child_id, quantity in edge_rows:
+            node = graph._node_of_id.get(parent_id)
+            child = graph._node_of_id.get(int(child_id))
+            if node is not None and child is not None:
+                edges.setdefault(node, []).append((child, quantity))
+
+        for node in range(len(graph.names)):
+            for item, quantity in ingredients.get(node, ()):
+                graph.ing_items.append(item)
+                graph.ing_qty.append(quantity)
+            graph.ing_offsets.append(len(graph.ing_items))
+            for child, quantity in edges.get(node, ()):
+                graph.edge_child.append(child)
+                graph.edge_qty.append(quantity)
+            graph.edge_offsets.append(len(graph.edge_child))
+        return graph
+
+    @classmethod
+    def build(
+        cls, rows: Iterable[Tuple[int, rcp.Recipe]], version: int = 0
+    ) -> "RecipeGraph":
+        """
+        Compiles a graph from ``(recipe_id, Recipe)`` pairs.
+
+        Args:
+            rows (iterable): Pairs of database id and decoded Recipe.
+            version (int): Data version to stamp on the graph.
+
+        Returns:
+            RecipeGraph: The compiled graph.
+        """
+        rows = list(rows)
+        return cls.from_rows(
+            (
+                (
+                    recipe_id,
+                    recipe.name,
+                    recipe.output_count,
+                    recipe.crafting_block.name if recipe.crafting_block else "",
+                    recipe.shaped,
+                )
+                for recipe_id, recipe in rows
+            ),
+            (
+                (recipe_id, ingredient, quantity)
+                for recipe_id, recipe in rows
+                for ingredient, quantity in recipe.ingredients.items()
+            ),
+            (
+                (recipe_id, int(nested_id), quantity)
+                for recipe_id, recipe in rows
+                for nested_id, quantity in recipe.nested_recipes.items()
+            ),
+            version,
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the graph into the flat binary layout.
+
+        Returns:
+            bytes: The encoded graph.
+        """
+        n_nodes, n_items = len(self.names), len(self.item_names)
+        encoded = [
+            string.encode("utf-8")
+            for string in itertools.chain(
+                self.names, self.crafting_blocks, self.item_names
+            )
+        ]
+        names, item_names = list(self.names), list(self.item_names)
+        columns: Dict[str, Any] = {
+            "id_order": array(
+                "I", sorted(range(n_nodes), key=self.recipe_ids.__getitem__)
+            ),
+            # Ties keep node order, so the first node with a name is found.
+            "name_order": array("I", sorted(range(n_nodes), key=names.__getitem__)),
+            "item_order": array(
+                "I", sorted(range(n_items), key=item_names.__getitem__)
+            ),
+            "string_offsets": array(
+                "Q", itertools.accumulate(map(len, encoded), initial=0)
+            ),
+        }
+        parts = [
+            _HEADER.pack(
+                GRAPH_MAGIC,
+                GRAPH_VERSION,
+                self.version,
+                n_nodes,
+                n_items,
+                len(self.ing_items),
+                len(self.edge_child),
+            ).ljust(_HEADER_SIZE, b"\0")
+        ]
+        for attribute, typecode, _ in _SECTIONS:
+            section = columns.get(attribute)
+            if section is None:
+                section = array(typecode, getattr(self, attribute))
+            if not _LITTLE_ENDIAN and typecode != "B":
+                section.byteswap()
+            data = section.tobytes()
+            parts.append(data + b"\0" * (-len(data) % 8))
+        parts.extend(encoded)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, buffer: Any, version: Optional[int] = None) -> "RecipeGraph":
+        """
+        Loads a graph from the binary layout without copying or parsing it.
+
+        The buffer must stay alive, and unchanged, for as long as the graph
+        is used.
+
+        Args:
+            buffer (bytes-like): Output of to_bytes(), e.g. the ``buf`` of a
+            multiprocessing.shared_memory.SharedMemory block or a mapped
+            snapshot file.
+            version (int, optional): Data version to stamp on the graph.
+            Defaults to the one it was serialized with.
+
+        Returns:
+            RecipeGraph: The graph, with a new token.
+
+        Raises:
+            ValueError: If the buffer is not a supported binary graph.
+        """
+        view = memoryview(buffer).cast("B")
+        if len(view) < _HEADER_SIZE:
+            raise ValueError("Not a binary recipe graph.")
+        magic, layout, data_version, n_nodes, n_items, n_ing, n_edges = (
+            _HEADER.unpack_from(view)
+        )
+        if magic != GRAPH_MAGIC or layout != GRAPH_VERSION:
+            raise ValueError("Not a binary recipe graph.")
+        counts = {
+            "nodes": n_nodes,
+            "offsets": n_nodes + 1,
+            "items": n_items,
+            "ing": n_ing,
+            "edges": n_edges,
+            "strings": 2 * n_nodes + n_items + 1,
+        }
+
+        graph = cls(data_version if version is None else version)
+        sections: Dict[str, Any] = {}
+        offset = _HEADER_SIZE
+        for attribute, typecode, length in _SECTIONS:
+            size = struct.calcsize(typecode) * counts[length]
+            if offset + size > len(view):
+                raise ValueError("Truncated binary recipe graph.")
+            section = view[offset : offset + size].cast(typecode)
+            if not _LITTLE_ENDIAN and typecode != "B":
+                section = array(typecode, section)
+                section.byteswap()
+            sections[attribute] = section
+            offset += size + (-size % 8)
+        for attribute, _, _ in _SECTIONS:
+            if hasattr(graph, attribute):
+                setattr(graph, attribute, sections[attribute])
+
+        text = view[offset:]
+        string_offsets = sections["string_offsets"]
+        if string_offsets[-1] != len(text):
+            raise ValueError("Truncated binary recipe graph.")
+        graph.names = _StringTable(text, string_offsets, 0, n_nodes)
+        graph.crafting_blocks = _StringTable(text, string_offsets, n_nodes, n_nodes)
+        graph.item_names = _StringTable(text, string_offsets, 2 * n_nodes, n_items)
+        graph._node_of_id = _SortedIndex(graph.recipe_ids, sections["id_order"])
+        graph._node_of_name = _SortedIndex(graph.names, sections["name_order"])
+        graph._item_index = _SortedIndex(graph.item_names, sections["item_order"])
+        return graph
+
+    def _intern(self, item_name: str) -> int:
+        index = self._item_index.get(item_name)
+        if index is None:
+            index = len(self.item_names)
+            self._item_index[item_name] = index
+            self.item_names.append(item_name)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def node(self, recipe_id: int) -> Optional[int]:
+        """
+        Get the node index of a recipe by its database ID.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+
+        Returns:
+            int: Node index, or None if the recipe is not in the graph.
+        """
+        return self._node_of_id.get(int(recipe_id))
+
+    def node_by_name(self, recipe_name: str) -> Optional[int]:
+        """
+        Get the node index of a recipe by name.
+
+        Args:
+            recipe_name (str): The name of the recipe.
+
+        Returns:
+            int: Node index, or None if the recipe is not in the graph.
+        """
+        return self._node_of_name.get(recipe_name)
+
+    def ingredients(self, node: int) -> Iterator[Tuple[int, int]]:
+        """
+        Iterates the base ingredients of a node as ``(item index, quantity)``.
+        """
+        for pos in range(self.ing_offsets[node], self.ing_offsets[node + 1]):
+            yield self.ing_items[pos], self.ing_qty[pos]
+
+    def children(self, node: int) -> Iterator[Tuple[int, int]]:
+        """
+        Iterates the nested recipes of a node as ``(child node, quantity)``.
+        """
+        for pos in range(self.edge_offsets[node], self.edge_offsets[node + 1]):
+            yield self.edge_child[pos], self.edge_qty[pos]
+
+    def parents(self, node: int) -> Iterator[int]:
+        """
+        Iterates the nodes that use a node as a nested recipe, once per edge.
+        """
+        if self._parent_offsets is None:
+            self._build_parent_index()
+        offsets, parents = self._parent_offsets, self._parent_nodes
+        for pos in range(offsets[node], offsets[node + 1]):
+            yield parents[pos]
+
+    def _build_parent_index(self) -> None:
+        # Counting sort of the edges by child: a CSR index of the transpose.
+        counts = [0] * (len(self.names) + 1)
+        for child in self.edge_child:
+            counts[child + 1] += 1
+        offsets = array("I", itertools.accumulate(counts))
+        fill = list(offsets)
+        parents = array("I", bytes(4 * len(self.edge_child)))
+        for parent in range(len(self.names)):
+            for pos in range(self.edge_offsets[parent], self.edge_offsets[parent + 1]):
+                child = self.edge_child[pos]
+                parents[fill[child]] = parent
+                fill[child] += 1
+        self._parent_offsets, self._parent_nodes = offsets, parents
+
+    def ancestors(self, nodes: Iterable[int]) -> Set[int]:
+        """
+        Get the nodes whose results depend on some nodes: the nodes
+        themselves and every node that (indirectly) contains one of them.
+        Only the affected part of the graph is visited.
+
+        Args:
+            nodes (iterable): Node indexes, e.g. of changed recipes.
+
+        Returns:
+            set: The affected node indexes.
+        """
+        seen = set(nodes)
+        stack = list(seen)
+        while stack:
+            for parent in self.parents(stack.pop()):
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+        return seen
+
+    def topological_order(self, roots: Iterable[int]) -> List[int]:
+        """
+        Orders every node reachable from ``roots`` so that each node comes
+        after all of its parents within the reachable subgraph.
+
+        Args:
+            roots (iterable): Node indexes to start from.
+
+        Returns:
+            list: Reachable node indexes in topological order.
+
+        Raises:
+            RecipeCycleError: If the reachable subgraph contains a cycle.
+        """
+        indegree: Dict[int, int] = {}
+        stack = []
+        for root in roots:
+            if root not in indegree:
+                indegree[root] = 0
+                stack.append(root)
+        while stack:
+            node = stack.pop()
+            for child, _ in self.children(node):
+                if child in indegree:
+                    indegree[child] += 1
+                else:
+                    indegree[child] = 1
+                    stack.append(child)
+
+        ready = [node for node, count in indegree.items() if count == 0]
+        order = []
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for child, _ in self.children(node):
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+
+        if len(order) != len(indegree):
+            cycle = traversal.find_cycle(
+                indegree, lambda node: (child for child, _ in self.children(node))
+            )
+            raise RecipeCycleError([self.names[node] for node in cycle or ()])
+        return order
+
+    def recipe(self, node: int) -> rcp.Recipe:
+        """
+        Rebuilds a Recipe object for a node.
+
+        Slot layouts are not part of the compiled graph, so the returned
+        recipe has no slots; fetch it from the database when they matter.
+
+        Args:
+            node (int): Node index.
+
+        Returns:
+            Recipe: The recipe, with nested recipes keyed by database ID.
+        """
+        return rcp.Recipe(
+            name=self.names[node],
+            crafting_block=self.crafting_blocks[node],
+            output_count=self.output_counts[node],
+            shaped=bool(self.shaped[node]),
+            ingredients={
+                self.item_names[item]: qty for item, qty in self.ingredients(node)
+            },
+            nested_recipes={
+                self.recipe_ids[child]: qty for child, qty in self.children(node)
+            },
+        )
+
+
+@db.with_db_connection()
+def load_graph(conn: Optional[sqlite3.Connection] = None) -> RecipeGraph:
+    """
+    Compiles a RecipeGraph from every recipe in the database.
+
+    Args:
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        RecipeGraph: The compiled graph.
+    """
+    version = db.data_version(db.connection_path(conn))
+    # Read first: a write landing mid-load only makes the graph look stale.
+    stamp = _database_stamp(conn=conn)
+    graph = RecipeGraph.from_rows(
+        conn.execute(
+            "SELECT id, name, output_count, crafting_block, shaped "
+            "FROM recipes ORDER BY id"
+        ),
+        conn.execute(
+            "SELECT recipe_id, ingredient, quantity FROM recipe_ingredients "
+            "ORDER BY recipe_id, rowid"
+        ),
+        conn.execute(
+            "SELECT parent_id, child_id, quantity FROM recipe_edges "
+            "ORDER BY parent_id, rowid"
+        ),
+        version,
+    )
+    graph.stamp = stamp
+    return graph
+
+
+@db.with_db_connection()
+def _database_stamp(
+    conn: Optional[sqlite3.Connection] = None,
+) -> Optional[Tuple[int, int, int]]:
+    try:
+        return db.database_stamp(conn)
+    except sqlite3.OperationalError:  # Schema before the meta table
+        return None
+
+
+# The shared graph of each database file, i.e. of each recipe set.
+_graphs: Dict[str, RecipeGraph] = {}
+# Caches of results derived from the shared graph, see track_cache().
+_tracked_caches: List[VersionedLRUCache] = []
+
+
+def track_cache(cache: VersionedLRUCache) -> None:
+    """
+    Registers a cache of results computed against the shared graph, so that
+    when recipes change only the entries depending on them are dropped.
+
+    Entries must be stored under the graph's token, in the scope of its
+    db_path, with tuple keys whose first element is the ID of the recipe the
+    result was computed for. An entry is kept as long as neither that recipe
+    nor any recipe it (indirectly) contains has changed.
+
+    Args:
+        cache (VersionedLRUCache): The cache.
+    """
+    _tracked_caches.append(cache)
+
+
+def affected_recipe_ids(graph: RecipeGraph, recipe_ids: Iterable[int]) -> Set[int]:
+    """
+    Propagates changes up the graph: get the IDs of the given recipes and of
+    every recipe that (indirectly) contains one of them.
+
+    Args:
+        graph (RecipeGraph): The graph to walk.
+        recipe_ids (iterable): IDs of changed recipes. IDs that are not in
+        the graph are returned unchanged.
+
+    Returns:
+        set: The affected recipe IDs.
+    """
+    affected = set()
+    nodes = []
+    for recipe_id in recipe_ids:
+        affected.add(int(recipe_id))
+        node = graph.node(recipe_id)
+        if node is not None:
+            nodes.append(node)
+    affected.update(graph.recipe_ids[node] for node in graph.ancestors(nodes))
+    return affected
+
+
+def _carry_over(old: RecipeGraph, new: RecipeGraph) -> None:
+    """
+    Moves the still-valid entries of the tracked caches from ``old`` to
+    ``new``. If the changes between them are unknown, or existing recipes
+    were renumbered, the caches are left to empty themselves.
+    """
+    changed = db.changed_since(old.version)
+    if changed is None:
+        return
+    if new.recipe_ids[: len(old.recipe_ids)] != array("q", old.recipe_ids):
+        return
+    # Edges into a changed recipe are the same in both graphs, except those
+    # out of changed recipes themselves; walking both covers removed ones.
+    dirty = affected_recipe_ids(old, changed) | affected_recipe_ids(new, changed)
+    for cache in _tracked_caches:
+        cache.rebase(
+            old.token, new.token, lambda key: key[0] in dirty, new.db_path
+        )
+
+
+def get_graph() -> RecipeGraph:
+    """
+    Get the shared graph for the current recipe set's database, recompiling
+    it if a recipe of that set has been saved since it was built. Each set
+    has its own graph, so saving to one set leaves the others' graphs and
+    cached results alone.
+
+    Every call also compares the database's persistent stamp (see
+    database_ops.database_stamp) with the graph's, a primary key lookup, so
+    recipes saved by other processes are picked up too.
+
+    The first graph of a process, and the graph after another process has
+    written, is mapped from the database's snapshot file when there is an
+    up-to-date one (see the snapshot module).
+
+    Cached results of tracked caches that do not depend on the saved recipes
+    are kept for the new graph.
+
+    Returns:
+        RecipeGraph: The up-to-date graph.
+    """
+    path = db.database_path()
+    graph = _graphs.get(path)
+    if (
+        graph is not None
+        and graph.version == db.data_version(path)
+        and graph.stamp != _database_stamp()
+    ):
+        # Another process wrote: which recipes changed is unknown.
+        db.bump_data_version(db_path=path)
+        graph = None
+    if graph is None or graph.version != db.data_version(path):
+        old = graph
+        graph = _load_snapshot() if old is None else None
+        if graph is None:
+            graph = load_graph()
+        graph.db_path = path
+        if old is not None:
+            _carry_over(old, graph)
+        _graphs[path] = graph
+    return graph
+
+
+def _load_snapshot() -> Optional[RecipeGraph]:
+    from . import snapshot  # It imports this module
+
+    return snapshot.load_snapshot()
+
+
+def refresh_graph() -> RecipeGraph:
+    """
+    Forces the shared graph of the current recipe set to be recompiled from
+    its database.
+
+    Returns:
+        RecipeGraph: The freshly compiled graph.
+    """
+    path = db.database_path()
+    graph = _graphs[path] = load_graph()
+    graph.db_path = path
+    return graph
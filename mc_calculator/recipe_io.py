@@ -0,0 +1,338 @@
+"""
+This module handles bulk import and export of recipes as JSON Lines or CSV.
+
+Both directions stream: records are read, parsed and written in chunks
+through generators, so memory use does not grow with the size of the file.
+Nested recipes are referenced by name in files, since database IDs are not
+portable between databases.
+"""
+import csv
+import itertools
+import json
+import sqlite3
+from typing import IO, Any, Dict, Iterable, Iterator, Optional
+from . import database_ops as db
+from .recipe import Recipe
+
+FORMATS = ("jsonl", "csv")
+CSV_FIELDS = (
+    "name",
+    "output_count",
+    "shaped",
+    "crafting_block",
+    "slots",
+    "ingredients",
+    "nested_recipes",
+)
+IMPORT_CHUNK_SIZE = 1000
+
+
+def guess_format(path: str) -> str:
+    """
+    Get the file format implied by a path's extension.
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        str: "csv" for .csv files, "jsonl" otherwise.
+    """
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def read_records(stream: IO[str], fmt: str) -> Iterator[Dict[str, Any]]:
+    """
+    Parses recipe records from a text stream, one at a time.
+
+    Args:
+        stream (IO): The text stream to read.
+        fmt (str): "jsonl" or "csv".
+
+    Returns:
+        Iterator of record dicts with the keys listed in CSV_FIELDS.
+    """
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield {
+                "name": row["name"],
+                "output_count": int(row.get("output_count") or 1),
+                "shaped": row.get("shaped", "").lower() in ("1", "true", "yes"),
+                "crafting_block": row.get("crafting_block") or "ctable3",
+                "slots": json.loads(row.get("slots") or "{}"),
+                "ingredients": json.loads(row.get("ingredients") or "{}"),
+                "nested_recipes": json.loads(row.get("nested_recipes") or "{}"),
+            }
+    elif fmt == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def write_records(
+    records: Iterable[Dict[str, Any]], stream: IO[str], fmt: str
+) -> int:
+    """
+    Writes recipe records to a text stream as they are produced.
+
+    Args:
+        records (iterable): Record dicts with the keys listed in CSV_FIELDS.
+        stream (IO): The text stream to write to.
+        fmt (str): "jsonl" or "csv".
+
+    Returns:
+        int: The number of records written.
+    """
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, CSV_FIELDS)
+        writer.writeheader()
+        for record in records:
+            row = dict(record)
+            for field in ("slots", "ingredients", "nested_recipes"):
+                row[field] = json.dumps(record.get(field) or {})
+            writer.writerow(row)
+            count += 1
+    elif fmt == "jsonl":
+        for record in records:
+            stream.write(json.dumps(record) + "\n")
+            count += 1
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+    return count
+
+
+@db.with_db_connection()
+def import_recipes(
+    records: Iterable[Dict[str, Any]], conn: Optional[sqlite3.Connection] = None
+) -> int:
+    """
+    Imports recipe records in a single transaction.
+
+    Recipes are inserted with executemany in chunks of IMPORT_CHUNK_SIZE.
+    Nested recipe references are staged by name and resolved in a second
+    pass once every recipe of the file exists, so records may reference
+    recipes that appear later in the file or are already in the database.
+
+    Args:
+        records (iterable): Record dicts, as produced by read_records().
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        int: The number of recipes imported.
+
+    Raises:
+        ValueError: If a nested recipe name cannot be resolved, including
+        names only the shared recipe set has, or RecipeCycleError if the
+        nested recipes form a cycle. Nothing is imported in either case.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        recipe_ids = _import_in_transaction(conn, records)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    db.bump_data_version(recipe_ids, db.connection_path(conn))
+    return len(recipe_ids)
+
+
+def _import_in_transaction(
+    conn: sqlite3.Connection, records: Iterable[Dict[str, Any]]
+) -> range:
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS import_edges "
+        "(parent_id INTEGER, child_name TEXT, quantity INTEGER)"
+    )
+    conn.execute("DELETE FROM import_edges")
+    # IDs are assigned up front so each chunk can be inserted with executemany.
+    cursor = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM recipes")
+    first_id = next_id = cursor.fetchone()[0]
+
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, IMPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+        recipe_rows, ingredient_rows, edge_rows = [], [], []
+        for record in chunk:
+            recipe = Recipe(
+                name=record["name"],
+                crafting_block=record.get("crafting_block", "ctable3"),
+                output_count=record.get("output_count", 1),
+                shaped=record.get("shaped", False),
+                slots=record.get("slots"),
+                ingredients=record.get("ingredients"),
+            )
+            recipe_rows.append(
+                (
+                    next_id,
+                    recipe.name,
+                    recipe.to_json(),
+                    recipe.shaped,
+                    record.get("crafting_block", "ctable3"),
+                    recipe.output_count,
+                )
+            )
+            ingredient_rows.extend(
+                (next_id, ing, qty) for ing, qty in recipe.ingredients.items()
+            )
+            edge_rows.extend(
+                (next_id, name, qty)
+                for name, qty in (record.get("nested_recipes") or {}).items()
+            )
+            next_id += 1
+        conn.executemany(
+            "INSERT INTO recipes "
+            "(id, name, ingredients, shaped, crafting_block, output_count) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            recipe_rows,
+        )
+        conn.executemany(
+            "INSERT INTO recipe_ingredients (recipe_id, ingredient, quantity) "
+            "VALUES (?, ?, ?)",
+            ingredient_rows,
+        )
+        conn.executemany("INSERT INTO import_edges VALUES (?, ?, ?)", edge_rows)
+
+    # Second pass: resolve nested references by name (lowest ID wins).
+    unresolved = [
+        row[0]
+        for row in conn.execute(
+            "SELECT DISTINCT child_name FROM import_edges "
+            "WHERE child_name NOT IN (SELECT name FROM recipes)"
+        )
+    ]
+    if unresolved:
+        message = "Unknown nested recipes: " + ", ".join(sorted(unresolved))
+        # Names resolved despite missing from this database are shared.
+        shared = [
+            name
+            for name in sorted(unresolved)
+            if db.resolve_recipe_name(name, conn=conn) is not None
+        ]
+        if shared:
+            message += (
+                f". Only the shared recipe set {db.SHARED_SET!r} has "
+                f"{', '.join(shared)}, and other sets' recipes cannot nest "
+                "its recipes: import them into this set too"
+            )
+        raise ValueError(message)
+    conn.execute(
+        """
+        INSERT INTO recipe_edges (parent_id, child_id, quantity)
+        SELECT e.parent_id, (SELECT MIN(id) FROM recipes WHERE name = e.child_name),
+               e.quantity
+        FROM import_edges AS e
+        ORDER BY e.rowid
+        """
+    )
+    conn.execute(
+        """
+        UPDATE recipes
+        SET nested_recipes_json = (
+            SELECT COALESCE(json_group_object(child_id, quantity), '{}')
+            FROM recipe_edges WHERE parent_id = recipes.id
+        )
+        WHERE id >= ?
+        """,
+        (first_id,),
+    )
+    conn.execute(
+        """
+        UPDATE recipes
+        SET ingredients = json_set(
+            ingredients, '$.nested_recipes', json(nested_recipes_json)
+        )
+        WHERE id >= ? AND nested_recipes_json != '{}'
+        """,
+        (first_id,),
+    )
+    conn.execute("DELETE FROM import_edges")
+    db.check_for_cycles(range(first_id, next_id), conn=conn)
+    return range(first_id, next_id)
+
+
+def iter_export_records(
+    conn: Optional[sqlite3.Connection] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Reads every recipe as an export record, iterating the cursor rather than
+    loading all rows at once. Nested recipe names are joined in by the same
+    query, so memory use does not grow with the number of recipes.
+
+    Args:
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, the current recipe set's
+        connection is used once iteration starts.
+
+    Returns:
+        Iterator of record dicts with nested recipes referenced by name.
+    """
+    if conn is None:
+        conn = db.get_connection()
+    cursor = conn.execute(
+        """
+        SELECT r.ingredients, r.nested_recipes_json, (
+            SELECT json_group_object(name, quantity) FROM (
+                SELECT c.name, e.quantity
+                FROM recipe_edges AS e JOIN recipes AS c ON c.id = e.child_id
+                WHERE e.parent_id = r.id
+                ORDER BY e.rowid
+            )
+        )
+        FROM recipes AS r
+        ORDER BY r.id
+        """
+    )
+    for ingredients, nested_recipes_json, nested_names_json in cursor:
+        recipe = Recipe.from_row(ingredients, nested_recipes_json)
+        yield {
+            "name": recipe.name,
+            "output_count": recipe.output_count,
+            "shaped": bool(recipe.shaped),
+            "crafting_block": (
+                recipe.crafting_block.name if recipe.crafting_block else "ctable3"
+            ),
+            "slots": recipe.slots,
+            "ingredients": dict(recipe.ingredients),
+            "nested_recipes": json.loads(nested_names_json),
+        }
+
+
+def import_file(path: str, fmt: Optional[str] = None) -> int:
+    """
+    Imports recipes from a JSON Lines or CSV file into the default database.
+
+    Args:
+        path (str): The file to read.
+        fmt (str, optional): "jsonl" or "csv". Guessed from the extension
+        if not provided.
+
+    Returns:
+        int: The number of recipes imported.
+    """
+    with open(path, newline="", encoding="utf-8") as stream:
+        return import_recipes(read_records(stream, fmt or guess_format(path)))
+
+
+def export_file(path: str, fmt: Optional[str] = None) -> int:
+    """
+    Exports every recipe of the default database to a JSON Lines or CSV file.
+
+    Args:
+        path (str): The file to write.
+        fmt (str, optional): "jsonl" or "csv". Guessed from the extension
+        if not provided.
+
+    Returns:
+        int: The number of recipes exported.
+    """
+    with open(path, "w", newline="", encoding="utf-8") as stream:
+        records = iter_export_records()
+        return write_records(records, stream, fmt or guess_format(path))
@@ -3,15 +3,46 @@ This module contains the logic for creating and calculating recipes
 in the Minecraft Recipe Calculator application.
 """
 import logging
-import math
-from typing import List, Tuple, Dict
+from typing import Iterable, Iterator, List, Tuple, Dict, Optional, Union
 from . import database_ops as db
+from . import metrics
+from . import rendering
+from . import traversal
 from .decorator import auto_log
 from . import recipe as rcp
-from typing import List, Dict, Tuple
+from .cache import CacheInfo, VersionedLRUCache
+from .exceptions import (
+    CalculationCancelledError,
+    RecipeCycleError,
+    RecipeDepthError,
+)
+from .recipe_graph import RecipeGraph, get_graph, track_cache
 
 logger = logging.getLogger(__name__)
 
+# Base-ingredient expansions keyed by (recipe id, runs). When a recipe is
+# saved, only the expansions of that recipe and the recipes containing it are
+# dropped as calculations move to the recompiled shared graph.
+EXPANSION_CACHE_SIZE = 4096
+expansion_cache = VersionedLRUCache(EXPANSION_CACHE_SIZE)
+metrics.register_cache("expansion", expansion_cache.info)
+track_cache(expansion_cache)
+
+
+def ceil_div(numerator: int, denominator: int) -> int:
+    """
+    Divides rounding up, exactly: math.ceil(a / b) goes through a float and
+    is off for quantities past 2**53.
+
+    Args:
+        numerator (int): The quantity needed.
+        denominator (int): The output count of one run.
+
+    Returns:
+        int: The number of runs.
+    """
+    return -(-numerator // denominator)
+
 
 @auto_log(__name__)
 def get_ingredient_input() -> Tuple[str, int]:
@@ -43,34 +74,57 @@ def get_ingredient_input() -> Tuple[str, int]:
 
 
 @auto_log(__name__)
-def get_nested_recipe_input(
-    existing_recipes: List[Tuple[int, str, int]]
-) -> Tuple[int, int]:
+def choose_recipe(action: str) -> Tuple[int, str, int]:
     """
-    Prompts the user to select an existing recipe to use as a nested recipe.
+    Prompts the user to find a recipe by name and select it by ID.
+
+    Matches are shown a page at a time from db.search_recipes(), so choosing
+    a recipe stays fast however many recipes the database holds. Callers
+    check that there is at least one recipe first.
 
     Args:
-        existing_recipes (list): A list of existing recipes to choose from.
+        action (str): What the recipe is selected for, e.g. "to calculate".
 
     Returns:
-        tuple: A tuple containing the selected recipe ID and the quantity needed.
+        tuple: The (id, name, output_count) of the selected recipe.
     """
+    query = input("Search recipes by name (leave blank to browse all): ").strip()
+    after = None
     while True:
-        try:
-            list_all_recipes()
-            selected_recipe_id = int(
-                input("Select the ID of the recipe to use as an ingredient: ")
-            )
-            logger.info(f"User selected recipe ID: {selected_recipe_id}")
-            if any(
-                recipe_id == selected_recipe_id for recipe_id, _, _ in existing_recipes
-            ):
-                logger.debug(f"Successfully selected recipe ID: {selected_recipe_id}")
-                break
-            logger.warning(f"User selected invalid recipe ID: {selected_recipe_id}")
+        page = db.search_recipes(query, db.SEARCH_PAGE_SIZE + 1, after)
+        more = len(page) > db.SEARCH_PAGE_SIZE
+        page = page[: db.SEARCH_PAGE_SIZE]
+        if not page:
+            print("No recipes match.")
+        for recipe_number, recipe_name, output_count in page:
+            print(f"{recipe_number}. {recipe_name} (Output: {output_count})")
+        more_hint = "'n' for more matches, " if more else ""
+        choice = input(
+            f"Enter the ID of the recipe {action}, {more_hint}or a new search: "
+        ).strip()
+        if choice.isdigit():
+            summary = db.fetch_recipe_summary(int(choice))
+            if summary is not None:
+                logger.debug(f"Successfully selected recipe ID: {choice}")
+                return summary
+            logger.warning(f"User selected invalid recipe ID: {choice}")
             print("Invalid ID. Please select a valid recipe ID.")
-        except ValueError:
-            print("Invalid input. Please enter a valid integer for the recipe ID.")
+        elif more and choice.lower() == "n":
+            after = page[-1][0]
+        else:
+            query, after = choice, None
+
+
+@auto_log(__name__)
+def get_nested_recipe_input() -> Tuple[int, int]:
+    """
+    Prompts the user to select an existing recipe to use as a nested recipe.
+
+    Returns:
+        tuple: A tuple containing the selected recipe ID and the quantity needed.
+    """
+    selected_recipe_id, _, _ = choose_recipe("to use as an ingredient")
+    logger.info(f"User selected recipe ID: {selected_recipe_id}")
     final_quantity_needed = int(
         input(f"Enter the quantity of recipe ID {selected_recipe_id} needed: ")
     )
@@ -85,7 +139,8 @@ def create_recipe() -> rcp.Recipe:
     This function allows the user to enter details of a new recipe,
     including its name, crafting block, output count, whether it's shaped,
     and its ingredients (including nested recipes). The new recipe
-    is then saved to the database.
+    is then saved to the database, unless its nested recipes would form
+    a cycle.
 
     Returns:
         rcp.Recipe: An instance of the Recipe class with the entered recipe details.
@@ -126,7 +181,7 @@ def create_recipe() -> rcp.Recipe:
     ingredients = {}
     nested_recipes = {}
 
-    existing_recipes = db.list_recipes()  # Retrieve existing recipes from the database
+    has_recipes = bool(db.search_recipes(limit=1))  # Any recipe to nest?
 
     while True:
         choice = input("Add ingredient (1) or use existing recipe (2) or 'done': ")
@@ -136,10 +191,8 @@ def create_recipe() -> rcp.Recipe:
             if choice == "1":
                 ingredient, quantity = get_ingredient_input()
                 ingredients[ingredient] = quantity
-            elif choice == "2" and existing_recipes:
-                selected_recipe_id, final_quantity_needed = get_nested_recipe_input(
-                    existing_recipes
-                )
+            elif choice == "2" and has_recipes:
+                selected_recipe_id, final_quantity_needed = get_nested_recipe_input()
                 nested_recipes[selected_recipe_id] = final_quantity_needed
         print("Invalid input. Please enter '1', '2', or 'done'.")
 
@@ -152,13 +205,17 @@ def create_recipe() -> rcp.Recipe:
         ingredients=ingredients,
         nested_recipes=nested_recipes,
     )
-    db.save_recipe_to_db(recipe)
+    try:
+        db.save_recipe_to_db(recipe)
+    except RecipeCycleError as exc:
+        logger.warning(f"Recipe {name} not saved: {exc}")
+        print(f"Recipe not saved. {exc}")
     return recipe
 
 
 @auto_log(__name__)
 def calculate(
-    recipe: rcp.Recipe, desired_quantity: int
+    recipe: rcp.Recipe, desired_quantity: int, graph: Optional[RecipeGraph] = None
 ) -> Tuple[Dict[str, int], List[Tuple[str, int, int, List, int]]]:
     """
     Calculates the ingredients and steps required for a given recipe and quantity.
@@ -166,42 +223,163 @@ def calculate(
     Args:
         recipe (Recipe): The recipe for which ingredients are to be calculated.
         desired_quantity (int): The desired quantity of the final product.
+        graph (RecipeGraph, optional): Compiled graph to resolve nested recipes
+        against. Defaults to the shared graph of the database.
 
     Returns:
         dict: A dictionary of ingredients and their required quantities.
         list: A list of steps involved in making the recipe.
+
+    Raises:
+        RecipeCycleError: If a nested recipe (indirectly) contains itself.
+        RecipeDepthError: If nested recipes are deeper than traversal.MAX_DEPTH.
+        CalculationCancelledError: If the calculation was cancelled (see
+        traversal.cancellation()).
     """
-    logger.info(
-        f"Starting calculation for recipe: {recipe.name} for quantity: {desired_quantity}"
+    logger.debug(
+        "Starting calculation for recipe: %s for quantity: %s",
+        recipe.name,
+        desired_quantity,
     )
+    if graph is None:
+        graph = get_graph()
     ingredients_needed = {}
     steps = []
 
-    desired_runs = math.ceil(desired_quantity / recipe.output_count)
+    desired_runs = ceil_div(desired_quantity, recipe.output_count)
     ingredients_needed.update(calculate_single_recipe_ingredients(recipe, desired_runs))
 
     for nested_id, quantity_needed in recipe.nested_recipes.items():
-        nested_recipe = db.fetch_recipe_by_id(nested_id)
-        if nested_recipe:
-            nested_runs = math.ceil(
-                quantity_needed * desired_runs / nested_recipe.output_count
-            )
-            nested_ingredients = calculate_base_ingredients(nested_recipe, nested_runs)
+        node = graph.node(nested_id)
+        if node is not None:
+            output_count = graph.output_counts[node]
+            nested_runs = ceil_div(quantity_needed * desired_runs, output_count)
+            totals: Dict[int, int] = {}
+            _expand_node(graph, node, nested_runs, totals)
 
             # Calculate the total output and waste for each nested recipe step
-            total_output = nested_runs * nested_recipe.output_count
+            total_output = nested_runs * output_count
             waste = total_output - (quantity_needed * desired_runs)
 
-            steps.append(
-                (nested_recipe.name, nested_runs, nested_recipe.output_count, [], waste)
-            )
+            steps.append((graph.names[node], nested_runs, output_count, [], waste))
 
-            for ing, qty in nested_ingredients.items():
+            for item, qty in totals.items():
+                ing = graph.item_names[item]
                 ingredients_needed[ing] = ingredients_needed.get(ing, 0) + qty
 
     return ingredients_needed, steps
 
 
+@auto_log(__name__)
+def calculate_aggregated(
+    recipe: rcp.Recipe, desired_quantity: int, graph: Optional[RecipeGraph] = None
+) -> Tuple[Dict[str, int], List[Tuple[str, int, int, List, int]]]:
+    """
+    Calculates the ingredients and steps required for a given recipe and quantity,
+    sharing leftover output between every branch that uses the same intermediate.
+
+    The nested recipe DAG is walked once in topological order: the demand for
+    each intermediate is summed over all of its parents before its runs are
+    rounded up, so every recipe is visited once and runs are minimal.
+
+    Args:
+        recipe (Recipe): The recipe for which ingredients are to be calculated.
+        desired_quantity (int): The desired quantity of the final product.
+        graph (RecipeGraph, optional): Compiled graph to resolve nested recipes
+        against. Defaults to the shared graph of the database.
+
+    Returns:
+        dict: A dictionary of base ingredients and their required quantities.
+        list: A list of steps, one per intermediate recipe, in crafting order
+        from the final product down.
+
+    Raises:
+        RecipeCycleError: If a nested recipe (indirectly) contains itself.
+        CalculationCancelledError: If the calculation was cancelled (see
+        traversal.cancellation()).
+    """
+    logger.debug(
+        "Starting aggregated calculation for recipe: %s for quantity: %s",
+        recipe.name,
+        desired_quantity,
+    )
+    if graph is None:
+        graph = get_graph()
+    desired_runs = ceil_div(desired_quantity, recipe.output_count)
+    ingredients_needed = calculate_single_recipe_ingredients(recipe, desired_runs)
+
+    demand: Dict[int, int] = {}
+    for nested_id, quantity_needed in recipe.nested_recipes.items():
+        node = graph.node(nested_id)
+        if node is not None:
+            demand[node] = demand.get(node, 0) + quantity_needed * desired_runs
+
+    steps = []
+    totals: Dict[int, int] = {}
+    # Nesting level per node, only tracked while metrics are recorded.
+    depth = dict.fromkeys(demand, 1) if metrics.enabled() else None
+    cancelled = traversal.cancel_event()
+    for node in graph.topological_order(demand):
+        if cancelled is not None and cancelled.is_set():
+            raise CalculationCancelledError()
+        if depth is not None:
+            metrics.visit(depth[node])
+            for child, _ in graph.children(node):
+                depth[child] = max(depth.get(child, 0), depth[node] + 1)
+        needed = demand[node]
+        output_count = graph.output_counts[node]
+        runs = ceil_div(needed, output_count)
+        waste = runs * output_count - needed
+        steps.append((graph.names[node], runs, output_count, [], waste))
+
+        for item, quantity in graph.ingredients(node):
+            totals[item] = totals.get(item, 0) + quantity * runs
+        for child, quantity in graph.children(node):
+            demand[child] = demand.get(child, 0) + quantity * runs
+
+    for item, qty in totals.items():
+        ing = graph.item_names[item]
+        ingredients_needed[ing] = ingredients_needed.get(ing, 0) + qty
+    return ingredients_needed, steps
+
+
+def calculation_to_dict(
+    recipe_name: str,
+    desired_quantity: int,
+    ingredients: Dict[str, int],
+    steps: List[Tuple[str, int, int, List, int]],
+) -> Dict:
+    """
+    Converts the output of calculate() or calculate_aggregated() into plain
+    data, as printed by ``calc --format json``.
+
+    Args:
+        recipe_name (str): The name of the calculated recipe.
+        desired_quantity (int): The desired quantity of the final product.
+        ingredients (dict): The calculated ingredients.
+        steps (list): The calculated steps.
+
+    Returns:
+        dict: The recipe, quantity, ingredients and steps with their total
+        output and waste.
+    """
+    return {
+        "recipe": recipe_name,
+        "quantity": desired_quantity,
+        "ingredients": ingredients,
+        "steps": [
+            {
+                "name": name,
+                "runs": runs,
+                "output_count": output_count,
+                "total_output": runs * output_count,
+                "waste": waste,
+            }
+            for name, runs, output_count, _, waste in steps
+        ],
+    }
+
+
 @auto_log(__name__)
 def calculate_single_recipe_ingredients(
     recipe: rcp.Recipe, desired_runs: int
@@ -218,7 +396,6 @@ def calculate_single_recipe_ingredients(
     """
     ingredients_needed = {}
     for ingredient, quantity in recipe.ingredients.items():
-        logger.info(f"Calculating {ingredient} with quantity {quantity}")
         total_quantity = quantity * desired_runs
         ingredients_needed[ingredient] = (
             ingredients_needed.get(ingredient, 0) + total_quantity
@@ -228,7 +405,10 @@ def calculate_single_recipe_ingredients(
 
 @auto_log(__name__)
 def calculate_nested_recipe_ingredients(
-    nested_recipe: rcp.Recipe, quantity_needed: int, desired_quantity: int
+    nested_recipe: rcp.Recipe,
+    quantity_needed: int,
+    desired_quantity: int,
+    graph: Optional[RecipeGraph] = None,
 ) -> Tuple[Dict[str, int], List, int]:
     """
     Calculates the ingredients required for nested recipes.
@@ -237,95 +417,253 @@ def calculate_nested_recipe_ingredients(
         nested_recipe (Recipe): The nested recipe.
         quantity_needed (int): The quantity of the nested recipe required.
         desired_quantity (int): The desired quantity of the final product.
+        graph (RecipeGraph, optional): Compiled graph to resolve nested recipes
+        against. Defaults to the shared graph of the database.
 
     Returns:
         tuple[dict, list, int]: A tuple containing the dictionary of
         ingredients/quantities, a list of steps,
         and the number of runs needed for a nested recipe
     """
-    logger.info(
-        f"Starting calculation for {nested_recipe.name}, quantity needed: {quantity_needed}, desired quantity: {desired_quantity}"
+    logger.debug(
+        "Starting calculation for %s, quantity needed: %s, desired quantity: %s",
+        nested_recipe.name,
+        quantity_needed,
+        desired_quantity,
     )
-    runs_needed = math.ceil(
-        quantity_needed * desired_quantity / nested_recipe.output_count
+    runs_needed = ceil_div(
+        quantity_needed * desired_quantity, nested_recipe.output_count
     )
-    nested_ingredients, nested_steps = calculate(nested_recipe, runs_needed)
+    nested_ingredients, nested_steps = calculate(nested_recipe, runs_needed, graph)
     return nested_ingredients, nested_steps, runs_needed
 
 
 @auto_log(__name__)
-def calculate_base_ingredients(recipe: rcp.Recipe, runs_needed: int) -> Dict[str, int]:
+def calculate_base_ingredients(
+    recipe: rcp.Recipe, runs_needed: int, graph: Optional[RecipeGraph] = None
+) -> Dict[str, int]:
+    """
+    Expands a recipe down to its base ingredients.
+
+    Args:
+        recipe (Recipe): The recipe to expand.
+        runs_needed (int): The number of times the recipe needs to be executed.
+        graph (RecipeGraph, optional): Compiled graph to resolve nested recipes
+        against. Defaults to the shared graph of the database.
+
+    Returns:
+        dict: A dictionary of base ingredients and their required quantities.
+
+    Raises:
+        RecipeCycleError: If a nested recipe (indirectly) contains itself.
+        RecipeDepthError: If nested recipes are deeper than traversal.MAX_DEPTH.
+    """
+    if graph is None:
+        graph = get_graph()
     base_ingredients = {}
     for ingredient, quantity in recipe.ingredients.items():
         base_ingredients[ingredient] = (
             base_ingredients.get(ingredient, 0) + quantity * runs_needed
         )
 
+    totals: Dict[int, int] = {}
     for nested_id, quantity_needed in recipe.nested_recipes.items():
-        nested_recipe = db.fetch_recipe_by_id(nested_id)
-        if nested_recipe:
-            nested_runs = math.ceil(
-                quantity_needed * runs_needed / nested_recipe.output_count
+        node = graph.node(nested_id)
+        if node is not None:
+            nested_runs = ceil_div(
+                quantity_needed * runs_needed, graph.output_counts[node]
             )
-            nested_base_ings = calculate_base_ingredients(nested_recipe, nested_runs)
-            for ing, qty in nested_base_ings.items():
-                base_ingredients[ing] = base_ingredients.get(ing, 0) + qty
+            _expand_node(graph, node, nested_runs, totals)
 
+    for item, qty in totals.items():
+        ing = graph.item_names[item]
+        base_ingredients[ing] = base_ingredients.get(ing, 0) + qty
     return base_ingredients
 
 
+def _expand_node(
+    graph: RecipeGraph,
+    node: int,
+    runs_needed: int,
+    totals: Dict[int, int],
+    depth: int = 1,
+) -> None:
+    """
+    Adds the base ingredients of ``runs_needed`` runs of a graph node into
+    ``totals`` (keyed by item index), rounding runs up on every branch.
+
+    The tree is walked depth first with an explicit stack. Expansions are
+    memoized per (recipe id, runs) in expansion_cache, so shared
+    sub-assemblies are only walked once per graph version. Each entry keeps
+    the height of its subtree, so reusing it deeper in another tree still
+    hits the depth limit.
+
+    Raises:
+        RecipeCycleError: If a nested recipe (indirectly) contains itself.
+        RecipeDepthError: If the tree is deeper than traversal.MAX_DEPTH.
+        CalculationCancelledError: If the calculation was cancelled (see
+        traversal.cancellation()).
+    """
+    token, scope = graph.token, graph.db_path
+    max_depth = traversal.MAX_DEPTH
+    cached = expansion_cache.get(token, (graph.recipe_ids[node], runs_needed), scope)
+    if cached is not None:
+        expanded, height = cached
+        if depth + height - 1 > max_depth:
+            raise RecipeDepthError(graph.names[node], max_depth)
+    else:
+        cancelled = traversal.cancel_event()
+        recording = metrics.enabled()
+        if depth > max_depth:
+            raise RecipeDepthError(graph.names[node], max_depth)
+        # Frames of (node, runs, expansion so far, remaining children); the
+        # frame at stack[i] is at depth ``depth + i`` and heights[i] is the
+        # height of its subtree walked so far.
+        stack = [_expansion_frame(graph, node, runs_needed)]
+        heights = [1]
+        on_path = {node}
+        if recording:
+            metrics.visit(depth)
+        while stack:
+            current, runs, partial, children = stack[-1]
+            for child, quantity_needed in children:
+                child_runs = ceil_div(
+                    quantity_needed * runs, graph.output_counts[child]
+                )
+                cached = expansion_cache.get(
+                    token, (graph.recipe_ids[child], child_runs), scope
+                )
+                if cached is not None:
+                    child_expanded, child_height = cached
+                    if depth + len(stack) + child_height - 1 > max_depth:
+                        raise RecipeDepthError(graph.names[node], max_depth)
+                    for item, quantity in child_expanded.items():
+                        partial[item] = partial.get(item, 0) + quantity
+                    heights[-1] = max(heights[-1], child_height + 1)
+                    continue
+                if child in on_path:
+                    path = [frame[0] for frame in stack]
+                    cycle = path[path.index(child) :] + [child]
+                    raise RecipeCycleError([graph.names[n] for n in cycle])
+                if depth + len(stack) > max_depth:
+                    raise RecipeDepthError(graph.names[node], max_depth)
+                if cancelled is not None and cancelled.is_set():
+                    raise CalculationCancelledError()
+                if recording:
+                    metrics.visit(depth + len(stack))
+                stack.append(_expansion_frame(graph, child, child_runs))
+                heights.append(1)
+                on_path.add(child)
+                break
+            else:
+                stack.pop()
+                height = heights.pop()
+                on_path.discard(current)
+                expansion_cache.put(
+                    token, (graph.recipe_ids[current], runs), (partial, height), scope
+                )
+                if stack:
+                    parent = stack[-1][2]
+                    for item, quantity in partial.items():
+                        parent[item] = parent.get(item, 0) + quantity
+                    heights[-1] = max(heights[-1], height + 1)
+                else:
+                    expanded = partial
+
+    for item, quantity in expanded.items():
+        totals[item] = totals.get(item, 0) + quantity
+
+
+def _expansion_frame(
+    graph: RecipeGraph, node: int, runs: int
+) -> Tuple[int, int, Dict[int, int], Iterator[Tuple[int, int]]]:
+    expanded: Dict[int, int] = {}
+    for item, quantity in graph.ingredients(node):
+        expanded[item] = expanded.get(item, 0) + quantity * runs
+    return node, runs, expanded, graph.children(node)
+
+
+def expansion_cache_info() -> CacheInfo:
+    """
+    Get the hit, miss and size counters of the base-ingredient expansion cache.
+
+    Returns:
+        CacheInfo: The cache statistics.
+    """
+    return expansion_cache.info()
+
+
 @auto_log(__name__)
-def print_steps(steps: List[Tuple[str, int, int, List, int]]) -> None:
+def print_steps(
+    steps: Iterable[Tuple[str, int, int, List, int]],
+    graph: Optional[RecipeGraph] = None,
+) -> None:
     """
-    Recursively prints the steps and ingredients required for a recipe and its nested recipes,
+    Prints the steps and ingredients required for a recipe and its nested recipes,
     including the total output and any waste.
 
+    The steps are streamed through rendering.render_steps(), which resolves
+    their recipes in bulk; see there for other output formats.
+
     Args:
-        steps (list): A list of tuples containing details about each recipe step.
+        steps (iterable): Tuples containing details about each recipe step.
                       Each tuple contains the recipe name, the number of runs needed,
                       the output count, any nested steps, and the waste.
+        graph (RecipeGraph, optional): Compiled graph to resolve the recipes
+        against. Defaults to fetching them from the database.
+
+    Raises:
+        RecipeDepthError: If steps are nested deeper than traversal.MAX_DEPTH.
     """
     logger.info("Printing steps. . .")
-    for step_name, step_multiplier, step_output, nested_steps, waste in steps:
-        nested_recipe = db.fetch_recipe_by_name(step_name)
-        total_output = step_multiplier * step_output
-        waste_info = f", Waste: {waste}x {step_name}" if waste > 0 else "Waste: None"
-
-        print(
-            f"- {step_multiplier}x Recipe {step_name} (Total Output: {total_output} {step_name} {waste_info}, Ingredients: "
-            + " ".join(
-                [f"{qty} {ing}" for ing, qty in nested_recipe.ingredients.items()]
-            )
-            + ", "
-            + " ".join(
-                [
-                    f"{n_qty} {db.fetch_recipe_by_id(int(n_id)).name}"
-                    for n_id, n_qty in nested_recipe.nested_recipes.items()
-                ]
-            )
-            + ")"
-        )
-        print_steps(nested_steps)  # Recursively print nested steps
+    rendering.render_steps(steps, rendering.TerminalSink(), graph)
 
 
 @auto_log(__name__)
-def calculate_ingredients(recipe_name: str, desired_quantity: int) -> None:
+def calculate_ingredients(
+    recipe_name: Union[str, int],
+    desired_quantity: int,
+    graph: Optional[RecipeGraph] = None,
+    aggregate: bool = False,
+) -> None:
     """
     Calculates the ingredients required for a given recipe and quantity.
 
+    Without a graph, a recipe name the current recipe set does not have is
+    calculated in the shared set (see database_ops.SHARED_SET) if that has it.
+
     Args:
-        recipe_name (str): The name of the recipe for which ingredients are to be calculated.
+        recipe_name (str or int): The name of the recipe for which ingredients
+        are to be calculated, or its ID, which picks one of several recipes
+        of the same name.
         desired_quantity (int): The desired quantity of the final product.
+        graph (RecipeGraph, optional): Compiled graph to run the calculation
+        against. Defaults to the shared graph of the current recipe set.
+        aggregate (bool): Use calculate_aggregated() so leftover output of
+        shared intermediates is reused instead of rounded up per branch.
 
     Returns:
         None: This function prints the required ingredients and their quantities to the console.
     """
-    recipe = db.fetch_recipe_by_name(recipe_name)
-    logger.info(f"Calculating: {recipe.name} for quantity: {desired_quantity}")
-    if recipe:
+    by_id = not isinstance(recipe_name, str)
+    if graph is None:
+        graph = get_graph()
+        if not by_id and graph.node_by_name(recipe_name) is None:
+            found = db.resolve_recipe_name(recipe_name)
+            if found is not None and found[0] != db.current_recipe_set():
+                with db.use_recipe_set(found[0]):
+                    calculate_ingredients(
+                        recipe_name, desired_quantity, aggregate=aggregate
+                    )
+                return
+    node = graph.node(recipe_name) if by_id else graph.node_by_name(recipe_name)
+    if node is not None:
+        recipe = graph.recipe(node)
+        logger.info(f"Calculating: {recipe.name} for quantity: {desired_quantity}")
         print(f"\nTo make {desired_quantity} {recipe.name}(s), you need to first make:")
-        total_ingredients, steps = calculate(recipe, desired_quantity)
-        print_steps(steps)
+        calculator = calculate_aggregated if aggregate else calculate
+        total_ingredients, steps = calculator(recipe, desired_quantity, graph)
+        print_steps(steps, graph)
         print("\nTotal:")
         for ingredient, quantity in total_ingredients.items():
             print(f"- {quantity} {ingredient}")
@@ -353,30 +691,13 @@ def select_and_calculate_recipe() -> None:
     """
     Prompts the user to select a recipe and calculates the required ingredients.
 
-    First, it displays a list of available recipes. Then, it prompts the user to select one
-    and specify the desired quantity of the final product. It calculates and displays the
-    required ingredients and their quantities.
+    First, it lets the user search the available recipes and select one by ID.
+    Then, it prompts the user to specify the desired quantity of the final
+    product. It calculates and displays the required ingredients and their
+    quantities.
     """
-    recipes = db.list_recipes()
-    if recipes:
-        for recipe_number, recipe_name, output_count in recipes:
-            print(f"{recipe_number}. {recipe_name} (Output: {output_count})")
-
-        while True:
-            list_all_recipes()
-            try:
-                recipe_choice = int(
-                    input("Enter the number of the recipe to calculate: ")
-                )
-                if 1 <= recipe_choice <= len(recipes):
-                    break
-                print(
-                    "Invalid recipe number. Please enter a number within the displayed range."
-                )
-            except ValueError:
-                print("Invalid input. Please enter a valid integer.")
-
-        _, recipe_name, _ = recipes[recipe_choice - 1]
+    if db.search_recipes(limit=1):
+        recipe_id, recipe_name, _ = choose_recipe("to calculate")
 
         while True:
             try:
@@ -389,6 +710,10 @@ def select_and_calculate_recipe() -> None:
             except ValueError:
                 print("Invalid input. Please enter a valid integer.")
 
-        calculate_ingredients(recipe_name, desired_quantity)
+        try:
+            calculate_ingredients(recipe_id, desired_quantity)
+        except (RecipeCycleError, RecipeDepthError) as exc:
+            logger.warning(f"Calculation of {recipe_name} failed: {exc}")
+            print(exc)
     else:
         print("No recipes available.")
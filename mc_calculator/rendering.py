@@ -0,0 +1,371 @@
+"""
+This module renders the steps of a calculation, as returned by calculate()
+or calculate_aggregated(), to pluggable sinks: the terminal, JSON Lines,
+Markdown or CSV.
+
+Rendering streams: nested steps are flattened by a generator, the recipes
+they reference are resolved a chunk at a time (from the compiled graph, or
+with two bulk queries per chunk), and every step is handed to the sink as
+soon as it is resolved. Memory use is bounded by the chunk size and the
+nesting depth, not by the size of the plan.
+"""
+import csv
+import itertools
+import json
+import sys
+from abc import ABC, abstractmethod
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from . import database_ops as db
+from . import traversal
+from .exceptions import RecipeDepthError
+from .recipe_graph import RecipeGraph
+
+RENDER_CHUNK_SIZE = 1000
+CSV_FIELDS = (
+    "depth",
+    "name",
+    "runs",
+    "output_count",
+    "total_output",
+    "waste",
+    "ingredients",
+    "nested_recipes",
+)
+
+Step = Tuple[str, int, int, List, int]
+
+
+class RenderedStep(NamedTuple):
+    """
+    A step with the recipe it runs resolved, ready to be written to a sink.
+    """
+
+    depth: int
+    name: str
+    runs: int
+    output_count: int
+    total_output: int
+    waste: int
+    ingredients: Tuple[Tuple[str, int], ...]
+    nested_recipes: Tuple[Tuple[str, int], ...]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts the step into plain data, with the ingredients and nested
+        recipes as name-to-quantity mappings.
+
+        Returns:
+            dict: The step, keyed like CSV_FIELDS.
+        """
+        return {
+            "depth": self.depth,
+            "name": self.name,
+            "runs": self.runs,
+            "output_count": self.output_count,
+            "total_output": self.total_output,
+            "waste": self.waste,
+            "ingredients": dict(self.ingredients),
+            "nested_recipes": dict(self.nested_recipes),
+        }
+
+
+class StepSink(ABC):
+    """
+    Receives rendered steps one at a time, in depth-first order.
+
+    Subclasses implement write(), and finish() if they need to.
+
+    Attributes:
+        stream (IO, optional): The text stream written to. Defaults to
+        whatever sys.stdout is at the time of writing.
+    """
+
+    def __init__(self, stream: Optional[IO[str]] = None) -> None:
+        self.stream = stream
+
+    def _out(self) -> IO[str]:
+        return self.stream if self.stream is not None else sys.stdout
+
+    @abstractmethod
+    def write(self, step: RenderedStep) -> None:
+        """
+        Writes one step.
+
+        Args:
+            step (RenderedStep): The step to write.
+        """
+
+    def finish(self) -> None:
+        """
+        Called once after the last step. The stream is left open.
+        """
+
+
+class TerminalSink(StepSink):
+    """
+    Writes steps as the lines print_steps() has always printed.
+    """
+
+    def write(self, step: RenderedStep) -> None:
+        name = step.name
+        if step.waste > 0:
+            waste_info = f", Waste: {step.waste}x {name}"
+        else:
+            waste_info = "Waste: None"
+        ingredients = " ".join(f"{qty} {ing}" for ing, qty in step.ingredients)
+        nested = " ".join(f"{qty} {n_name}" for n_name, qty in step.nested_recipes)
+        self._out().write(
+            f"- {step.runs}x Recipe {name} (Total Output: {step.total_output} "
+            f"{name} {waste_info}, Ingredients: {ingredients}, {nested})\n"
+        )
+
+
+class JsonLinesSink(StepSink):
+    """
+    Writes one JSON object per step, keyed like CSV_FIELDS.
+    """
+
+    def write(self, step: RenderedStep) -> None:
+        self._out().write(json.dumps(step.to_dict()) + "\n")
+
+
+class MarkdownSink(StepSink):
+    """
+    Writes steps as a Markdown list, nested steps indented below their
+    parent.
+    """
+
+    @staticmethod
+    def _escape(text: str) -> str:
+        return "".join(
+            "\\" + char if char in "\\`*_[]<>|" else char for char in text
+        )
+
+    def write(self, step: RenderedStep) -> None:
+        line = (
+            f"{'  ' * step.depth}- **{step.runs}x {self._escape(step.name)}**: "
+            f"total output {step.total_output}, waste {step.waste}"
+        )
+        if step.ingredients:
+            line += "; ingredients: " + ", ".join(
+                f"{qty} {self._escape(ing)}" for ing, qty in step.ingredients
+            )
+        if step.nested_recipes:
+            line += "; nested: " + ", ".join(
+                f"{qty} {self._escape(n_name)}"
+                for n_name, qty in step.nested_recipes
+            )
+        self._out().write(line + "\n")
+
+
+class CsvSink(StepSink):
+    """
+    Writes a header row and one row per step. Ingredients and nested
+    recipes are JSON objects, as in recipe_io's CSV files.
+    """
+
+    def __init__(self, stream: Optional[IO[str]] = None) -> None:
+        super().__init__(stream)
+        self._writer: Optional[Any] = None
+
+    def write(self, step: RenderedStep) -> None:
+        if self._writer is None:
+            self._writer = csv.writer(self._out(), lineterminator="\n")
+            self._writer.writerow(CSV_FIELDS)
+        row = step.to_dict()
+        row["ingredients"] = json.dumps(row["ingredients"])
+        row["nested_recipes"] = json.dumps(row["nested_recipes"])
+        self._writer.writerow([row[field] for field in CSV_FIELDS])
+
+    def finish(self) -> None:
+        if self._writer is None:
+            csv.writer(self._out(), lineterminator="\n").writerow(CSV_FIELDS)
+
+
+SINKS = {
+    "text": TerminalSink,
+    "jsonl": JsonLinesSink,
+    "markdown": MarkdownSink,
+    "csv": CsvSink,
+}
+FORMATS = tuple(SINKS)
+
+
+def make_sink(fmt: str, stream: Optional[IO[str]] = None) -> StepSink:
+    """
+    Creates the sink for an output format.
+
+    Args:
+        fmt (str): One of FORMATS.
+        stream (IO, optional): The text stream to write to. Defaults to
+        sys.stdout.
+
+    Returns:
+        StepSink: The sink.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if fmt not in SINKS:
+        raise ValueError(f"Unknown format: {fmt}")
+    return SINKS[fmt](stream)
+
+
+def iter_steps(steps: Iterable[Step]) -> Iterator[Tuple[int, Step]]:
+    """
+    Flattens nested steps depth-first, without recursing.
+
+    Args:
+        steps (iterable): Steps as returned by calculate(); each may carry
+        a list of nested steps.
+
+    Returns:
+        Iterator of ``(depth, step)`` pairs, depth 0 for the given steps.
+
+    Raises:
+        RecipeDepthError: If steps are nested deeper than traversal.MAX_DEPTH.
+    """
+    stack = [iter(steps)]
+    while stack:
+        step = next(stack[-1], None)
+        if step is None:
+            stack.pop()
+            continue
+        yield len(stack) - 1, step
+        if step[3]:
+            if len(stack) >= traversal.MAX_DEPTH:
+                raise RecipeDepthError(step[0], traversal.MAX_DEPTH)
+            stack.append(iter(step[3]))
+
+
+_Resolved = Tuple[Tuple[Tuple[str, int], ...], Tuple[Tuple[str, int], ...]]
+
+
+def _resolve_from_graph(graph: RecipeGraph, names: Iterable[str]) -> Dict:
+    resolved: Dict[str, _Resolved] = {}
+    for name in names:
+        node = graph.node_by_name(name)
+        if node is not None:
+            resolved[name] = (
+                tuple(
+                    (graph.item_names[item], qty)
+                    for item, qty in graph.ingredients(node)
+                ),
+                tuple(
+                    (graph.names[child], qty) for child, qty in graph.children(node)
+                ),
+            )
+    return resolved
+
+
+def _resolve_from_db(names: Iterable[str]) -> Dict:
+    recipes_by_name = {}
+    for _, recipe in sorted(db.fetch_recipes_by_names(names).items()):
+        recipes_by_name.setdefault(recipe.name, recipe)  # Lowest ID wins
+    nested_ids = {
+        int(n_id)
+        for recipe in recipes_by_name.values()
+        for n_id in recipe.nested_recipes
+    }
+    recipes_by_id = db.fetch_recipes_by_ids(nested_ids) if nested_ids else {}
+    resolved: Dict[str, _Resolved] = {}
+    for name, recipe in recipes_by_name.items():
+        resolved[name] = (
+            tuple(recipe.ingredients.items()),
+            tuple(
+                (recipes_by_id[int(n_id)].name, n_qty)
+                for n_id, n_qty in recipe.nested_recipes.items()
+                if int(n_id) in recipes_by_id
+            ),
+        )
+    return resolved
+
+
+def resolve_steps(
+    steps: Iterable[Step],
+    graph: Optional[RecipeGraph] = None,
+    chunk_size: int = RENDER_CHUNK_SIZE,
+) -> Iterator[RenderedStep]:
+    """
+    Resolves the recipe of every step, nested steps included, a chunk of
+    steps at a time.
+
+    Recipes are looked up in the graph when one is given; names it does
+    not know, and every name without a graph, are fetched from the
+    database with one bulk query for the recipes and one for their nested
+    recipes per chunk. Steps whose recipe cannot be found are rendered
+    without ingredients.
+
+    Args:
+        steps (iterable): Steps as returned by calculate().
+        graph (RecipeGraph, optional): Compiled graph to resolve against.
+        chunk_size (int): Number of steps resolved together.
+
+    Returns:
+        Iterator of RenderedStep, depth-first.
+
+    Raises:
+        RecipeDepthError: If steps are nested deeper than traversal.MAX_DEPTH.
+    """
+    flat = iter_steps(steps)
+    while True:
+        chunk = list(itertools.islice(flat, chunk_size))
+        if not chunk:
+            return
+        names = {step[0] for _, step in chunk}
+        resolved = _resolve_from_graph(graph, names) if graph is not None else {}
+        missing = names.difference(resolved)
+        if missing:
+            resolved.update(_resolve_from_db(missing))
+        for depth, (name, runs, output_count, _, waste) in chunk:
+            ingredients, nested = resolved.get(name, ((), ()))
+            yield RenderedStep(
+                depth,
+                name,
+                runs,
+                output_count,
+                runs * output_count,
+                waste,
+                ingredients,
+                nested,
+            )
+
+
+def render_steps(
+    steps: Iterable[Step],
+    sink: StepSink,
+    graph: Optional[RecipeGraph] = None,
+    chunk_size: int = RENDER_CHUNK_SIZE,
+) -> int:
+    """
+    Writes steps, nested steps included, to a sink as they are resolved.
+
+    Args:
+        steps (iterable): Steps as returned by calculate().
+        sink (StepSink): Where to write them, e.g. make_sink("markdown").
+        graph (RecipeGraph, optional): Compiled graph to resolve recipes
+        against instead of querying the database.
+        chunk_size (int): Number of steps resolved together.
+
+    Returns:
+        int: Number of steps written.
+
+    Raises:
+        RecipeDepthError: If steps are nested deeper than traversal.MAX_DEPTH.
+    """
+    count = 0
+    for step in resolve_steps(steps, graph, chunk_size):
+        sink.write(step)
+        count += 1
+    sink.finish()
+    return count
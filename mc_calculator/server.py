@@ -0,0 +1,281 @@
+"""
+This module implements ``mc-calculator serve``, a small HTTP/JSON service so
+a whole team can share one calculator instance.
+
+Endpoints (GET only):
+
+    /recipes                          every recipe: id, name, output_count
+    /recipes/{name}                   one recipe, nested recipes by name
+    /calculate?recipe=...&qty=...     same JSON as ``calc --format json``;
+                                      add &aggregate=1 for calculate_aggregated
+
+Every endpoint takes an optional &set=NAME to serve an existing recipe set
+instead of the current one.
+
+Recipes are served from the compiled recipe graph, which stays in memory
+between requests and is only recompiled after recipes change. Connections
+are kept alive (HTTP/1.1), and calculations run on the bounded compute pool
+of mc_calculator.aio.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+from . import aio
+from . import database_ops as db
+from . import recipe_logic as rl
+from .recipe_graph import RecipeGraph
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# Idle keep-alive connections are closed after this many seconds.
+KEEP_ALIVE_TIMEOUT = 15.0
+MAX_HEADERS = 100
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    """
+    An error answered with a JSON body of the form ``{"error": message}``.
+
+    Attributes:
+        status (int): The HTTP status code.
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _recipe_summary(graph: RecipeGraph, node: int) -> Dict[str, Any]:
+    return {
+        "id": graph.recipe_ids[node],
+        "name": graph.names[node],
+        "output_count": graph.output_counts[node],
+    }
+
+
+def _recipe_detail(graph: RecipeGraph, node: int) -> Dict[str, Any]:
+    return {
+        "name": graph.names[node],
+        "output_count": graph.output_counts[node],
+        "shaped": bool(graph.shaped[node]),
+        "crafting_block": graph.crafting_blocks[node] or None,
+        "ingredients": {
+            graph.item_names[item]: qty for item, qty in graph.ingredients(node)
+        },
+        "nested_recipes": {
+            graph.names[child]: qty for child, qty in graph.children(node)
+        },
+    }
+
+
+async def handle_request(method: str, target: str) -> Tuple[int, Any]:
+    """
+    Answers one request.
+
+    Args:
+        method (str): The HTTP method.
+        target (str): The request target, i.e. path and query string.
+
+    Returns:
+        tuple: The status code and the JSON-serializable body.
+    """
+    if method not in ("GET", "HEAD"):
+        raise HTTPError(405, f"Method not allowed: {method}")
+    url = urlsplit(target)
+    query = parse_qs(url.query)
+    recipe_set = query.get("set", [None])[0]
+    if recipe_set is None:
+        return await _route(url.path, query)
+    # Only existing sets, so requests never create database files.
+    if recipe_set not in db.list_recipe_sets():
+        raise HTTPError(404, f"Recipe set not found: {recipe_set}")
+    with db.use_recipe_set(recipe_set):
+        return await _route(url.path, query)
+
+
+async def _route(path: str, query: Dict[str, List[str]]) -> Tuple[int, Any]:
+    path = path.rstrip("/") or "/"
+    graph = await aio.get_graph()
+
+    if path == "/recipes":
+        return 200, [_recipe_summary(graph, node) for node in range(len(graph))]
+
+    if path.startswith("/recipes/"):
+        name = unquote(path[len("/recipes/") :])
+        node = graph.node_by_name(name)
+        if node is None:
+            raise HTTPError(404, f"Recipe not found: {name}")
+        return 200, _recipe_detail(graph, node)
+
+    if path == "/calculate":
+        name = query.get("recipe", [""])[0]
+        try:
+            quantity = int(query.get("qty", ["1"])[0])
+        except ValueError:
+            raise HTTPError(400, "qty must be an integer") from None
+        if quantity < 1:
+            raise HTTPError(400, "qty must be positive")
+        aggregate = query.get("aggregate", ["0"])[0].lower() in ("1", "true", "yes")
+        # Recipes this set lacks are calculated in the shared set, if it has them.
+        if graph.node_by_name(name) is None and not await aio.run_db(
+            db.resolve_recipe_name, name
+        ):
+            raise HTTPError(404, f"Recipe not found: {name}")
+        ingredients, steps = await aio.calculate(name, quantity, aggregate)
+        return 200, rl.calculation_to_dict(name, quantity, ingredients, steps)
+
+    raise HTTPError(404, f"Not found: {path}")
+
+
+async def _read_request(
+    reader: asyncio.StreamReader,
+) -> Optional[Tuple[str, str, str, Dict[str, str]]]:
+    """
+    Reads one request, or None if the client closed the connection.
+
+    Raises:
+        HTTPError: 400 if the request is malformed. The connection cannot be
+        reused afterwards, since where the next request starts is unknown.
+    """
+    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+    if not request_line.strip():
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise HTTPError(400, "Malformed request line")
+    method, target, version = parts
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADERS):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(400, "Too many headers")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length:
+        await reader.readexactly(length)  # Bodies are not used by any endpoint
+    return method, target, version, headers
+
+
+async def _write_response(
+    writer: asyncio.StreamWriter,
+    status: int,
+    body: Any,
+    keep_alive: bool,
+    head_only: bool = False,
+) -> None:
+    payload = json.dumps(body).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    ).encode("latin-1")
+    writer.write(head if head_only else head + payload)
+    await writer.drain()
+
+
+async def handle_connection(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """
+    Serves requests on one connection until the client closes it, asks to
+    close it, or leaves it idle for KEEP_ALIVE_TIMEOUT seconds.
+
+    Args:
+        reader (asyncio.StreamReader): The connection's reader.
+        writer (asyncio.StreamWriter): The connection's writer.
+    """
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except HTTPError as exc:
+                await _write_response(
+                    writer, exc.status, {"error": str(exc)}, keep_alive=False
+                )
+                break
+            if request is None:
+                break
+            method, target, version, headers = request
+            connection = headers.get("connection", "").lower()
+            keep_alive = (
+                connection != "close"
+                if version == "HTTP/1.1"
+                else connection == "keep-alive"
+            )
+            try:
+                status, body = await handle_request(method, target)
+            except HTTPError as exc:
+                status, body = exc.status, {"error": str(exc)}
+            except ValueError as exc:
+                status, body = 400, {"error": str(exc)}
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Error handling %s %s", method, target)
+                status, body = 500, {"error": "Internal server error"}
+
+            await _write_response(
+                writer, status, body, keep_alive, head_only=method == "HEAD"
+            )
+            if not keep_alive:
+                break
+    except (
+        asyncio.TimeoutError,
+        asyncio.IncompleteReadError,
+        ConnectionError,
+        ValueError,  # Lines longer than the stream limit
+    ):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    workers: Optional[int] = None,
+    ready: Optional[asyncio.Future] = None,
+) -> None:
+    """
+    Runs the HTTP service until cancelled.
+
+    Args:
+        host (str): The interface to listen on.
+        port (int): The port to listen on; 0 picks a free port.
+        workers (int, optional): Maximum number of concurrent calculations.
+        Defaults to aio.DEFAULT_COMPUTE_WORKERS.
+        ready (asyncio.Future, optional): Resolved with the bound
+        ``(host, port)`` once the server accepts connections.
+    """
+    if workers is not None:
+        aio.configure(workers)
+    await aio.get_graph()  # Warm the graph before the first request
+    server = await asyncio.start_server(handle_connection, host, port)
+    address = server.sockets[0].getsockname()[:2]
+    logger.info("Serving on http://%s:%s", *address)
+    if ready is not None:
+        ready.set_result(address)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        aio.shutdown(wait=False)
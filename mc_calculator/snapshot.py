@@ -0,0 +1,144 @@
+"""
+This module writes the compiled recipe graph of a database to a snapshot file
+and maps it back, so that short-lived processes start calculating without
+compiling the graph from SQLite.
+
+A snapshot is a header followed by the graph in RecipeGraph's binary layout.
+It is opened with mmap and read in place: only the pages that a calculation
+touches are read from disk. The header records the stamp of the database the
+graph was compiled from (see database_ops.database_stamp), and a snapshot
+whose stamp no longer matches is ignored, so callers fall back to SQLite.
+"""
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+from typing import Optional
+from . import database_ops as db
+from .recipe_graph import RecipeGraph, load_graph
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"MCSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".graph"
+# Magic, version, then the database stamp: schema version, database ID and
+# data version. Padded so the graph starts 8-byte aligned.
+_HEADER = struct.Struct("<6sHIqq")
+_HEADER_SIZE = -(-_HEADER.size // 8) * 8
+
+
+def snapshot_path(db_path: Optional[str] = None) -> str:
+    """
+    Get the default snapshot file of a database: the database path with
+    SNAPSHOT_SUFFIX appended.
+
+    Args:
+        db_path (str, optional): The database file. Defaults to the default
+        database.
+
+    Returns:
+        str: The snapshot path.
+    """
+    return (db_path or db.database_path()) + SNAPSHOT_SUFFIX
+
+
+@db.with_db_connection()
+def write_snapshot(
+    path: Optional[str] = None, conn: Optional[sqlite3.Connection] = None
+) -> int:
+    """
+    Compiles the graph of the database and writes it to a snapshot file.
+
+    The stamp and the graph are read in one transaction, so they agree even
+    if another process writes meanwhile. The file is replaced atomically;
+    processes that have the old one mapped keep using it.
+
+    Args:
+        path (str, optional): The snapshot file. Defaults to snapshot_path().
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        int: The number of recipes in the snapshot.
+    """
+    if path is None:
+        path = snapshot_path()
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN")
+    try:
+        stamp = db.database_stamp(conn)
+        graph = load_graph(conn=conn)
+    finally:
+        conn.commit()
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, *stamp)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as stream:
+            stream.write(header.ljust(_HEADER_SIZE, b"\0"))
+            stream.write(graph.to_bytes())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logger.info(f"Wrote snapshot of {len(graph)} recipes to {path}")
+    return len(graph)
+
+
+@db.with_db_connection()
+def load_snapshot(
+    path: Optional[str] = None, conn: Optional[sqlite3.Connection] = None
+) -> Optional[RecipeGraph]:
+    """
+    Maps a snapshot file, if it is up to date with the database.
+
+    Args:
+        path (str, optional): The snapshot file. Defaults to snapshot_path().
+        conn (sqlite3.Connection, optional): An existing
+        database connection. If not provided, a new connection
+        will be created.
+
+    Returns:
+        RecipeGraph: The mapped graph, stamped with the current in-process
+        data version, or None if the snapshot is missing, unreadable or
+        stale.
+    """
+    if path is None:
+        path = snapshot_path()
+    try:
+        with open(path, "rb") as stream:
+            mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # Missing, unreadable or empty
+        return None
+    if len(mapped) < _HEADER_SIZE:
+        logger.warning(f"Ignoring truncated snapshot {path}")
+        mapped.close()
+        return None
+    magic, version, *stamp = _HEADER.unpack_from(mapped)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring snapshot {path} of an unsupported format")
+        mapped.close()
+        return None
+    try:
+        current = db.database_stamp(conn)
+    except sqlite3.OperationalError:  # Schema before snapshots
+        current = None
+    if tuple(stamp) != current:
+        logger.info(f"Snapshot {path} is stale, loading the graph from SQLite")
+        mapped.close()
+        return None
+    try:
+        # The graph's memoryviews keep the mapping open while it is in use.
+        graph = RecipeGraph.from_bytes(
+            memoryview(mapped)[_HEADER_SIZE:],
+            db.data_version(db.connection_path(conn)),
+        )
+    except ValueError as exc:
+        logger.warning(f"Ignoring snapshot {path}: {exc}")
+        return None
+    graph.stamp = current
+    return graph
@@ -0,0 +1,119 @@
+"""
+This module holds what the walks over nested recipes share: the maximum
+nesting depth they follow, cycle detection and cooperative cancellation.
+
+Every walk uses an explicit stack instead of recursion, so the depth of a
+recipe tree is limited by MAX_DEPTH rather than by Python's recursion limit.
+"""
+import contextlib
+import os
+import threading
+from contextvars import ContextVar
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+# Maximum number of nested recipe levels below a calculated recipe. Set it
+# with set_max_depth() or the MC_CALCULATOR_MAX_DEPTH environment variable.
+DEFAULT_MAX_DEPTH = 10_000
+MAX_DEPTH = int(os.environ.get("MC_CALCULATOR_MAX_DEPTH", DEFAULT_MAX_DEPTH))
+
+T = TypeVar("T", bound=Hashable)
+
+# Set to stop the walks of the current context; see cancellation().
+_cancel_event: "ContextVar[Optional[threading.Event]]" = ContextVar(
+    "cancel_event", default=None
+)
+
+
+def set_max_depth(max_depth: int) -> None:
+    """
+    Sets the maximum nesting depth followed by calculations.
+
+    Args:
+        max_depth (int): Maximum number of nested recipe levels.
+
+    Raises:
+        ValueError: If max_depth is less than 1.
+    """
+    global MAX_DEPTH
+    if max_depth < 1:
+        raise ValueError("max_depth must be at least 1")
+    MAX_DEPTH = max_depth
+
+
+@contextlib.contextmanager
+def cancellation(event: threading.Event) -> Iterator[threading.Event]:
+    """
+    Makes the calculations started in this context, including those run in
+    copies of it on other threads, stop with CalculationCancelledError once
+    ``event`` is set. They check it at every recipe they expand.
+
+    Args:
+        event (threading.Event): The event that cancels them.
+
+    Yields:
+        threading.Event: The event.
+    """
+    token = _cancel_event.set(event)
+    try:
+        yield event
+    finally:
+        _cancel_event.reset(token)
+
+
+def cancel_event() -> Optional[threading.Event]:
+    """
+    Get the event that cancels the calculations of the current context.
+
+    Returns:
+        threading.Event: The event, or None if they cannot be cancelled.
+    """
+    return _cancel_event.get()
+
+
+def find_cycle(
+    roots: Iterable[T], children: Callable[[T], Iterable[T]]
+) -> Optional[List[T]]:
+    """
+    Looks for a cycle reachable from some nodes with an iterative depth-first
+    search. Every reachable node and edge is visited at most once.
+
+    Args:
+        roots (iterable): Nodes to start from.
+        children (callable): Returns the children of a node.
+
+    Returns:
+        list: The nodes along the first cycle found, starting and ending with
+        the same node, or None if there is no cycle.
+    """
+    done = set()
+    for root in roots:
+        if root in done:
+            continue
+        # Position of each node of the current path in the stack.
+        on_path: Dict[T, int] = {root: 0}
+        stack: List[Tuple[T, Iterator[T]]] = [(root, iter(children(root)))]
+        while stack:
+            node, pending = stack[-1]
+            for child in pending:
+                if child in on_path:
+                    start = on_path[child]
+                    return [frame[0] for frame in stack[start:]] + [child]
+                if child not in done:
+                    on_path[child] = len(stack)
+                    stack.append((child, iter(children(child))))
+                    break
+            else:
+                stack.pop()
+                del on_path[node]
+                done.add(node)
+    return None
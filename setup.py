@@ -9,7 +9,10 @@ setup(
     long_description=open("README.md").read(),
     long_description_content_type="text/markdown",
     url="https://github.com/nuclear-treestump/mc-calculator",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
+    extras_require={
+        "batch": ["numpy"],
+    },
     entry_points={
         "console_scripts": ["mc-calculator=mc_calculator.__main__:main"],
     },
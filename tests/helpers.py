@@ -0,0 +1,79 @@
+"""
+Helpers shared by the test modules: a small recipe graph, and a test case
+that runs against a fresh database in a temporary directory.
+
+The tests directory is not a package; test modules import this one as
+``helpers``, which works because the runner puts their directory on
+sys.path.
+"""
+import os
+import tempfile
+import unittest
+from mc_calculator import database_ops
+from mc_calculator.recipe import Recipe
+from mc_calculator.recipe_graph import RecipeGraph
+
+
+def build_graph() -> RecipeGraph:
+    """
+    Builds a graph of five recipes in which Machine uses Iron Plate and Stick
+    both directly and through Gear, so the branches share intermediates.
+
+    Returns:
+        RecipeGraph: The graph, with recipe IDs 1 to 5.
+    """
+    recipes = [
+        (1, Recipe("Iron Ingot", "ctable3", 1, ingredients={"Iron Ore": 1})),
+        (2, Recipe("Iron Plate", "ctable3", 2, nested_recipes={1: 3})),
+        (3, Recipe("Stick", "ctable3", 4, ingredients={"Plank": 2})),
+        (
+            4,
+            Recipe(
+                "Gear",
+                "ctable3",
+                3,
+                ingredients={"Stick": 1},
+                nested_recipes={2: 3, 3: 1},
+            ),
+        ),
+        (
+            5,
+            Recipe(
+                "Machine",
+                "ctable3",
+                1,
+                ingredients={"Redstone": 2},
+                nested_recipes={4: 2, 2: 3, 3: 5},
+            ),
+        ),
+    ]
+    return RecipeGraph.build(recipes)
+
+
+class TemporaryDatabaseTestCase(unittest.TestCase):
+    """
+    Points the default database and the recipe sets directory at a
+    temporary directory for each test, with the schema set up, and restores
+    the previous configuration afterwards.
+
+    Attributes:
+        tmpdir (TemporaryDirectory): The test's directory.
+        db_path (str): The default database file.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = os.path.join(self.tmpdir.name, "r.db")
+        previous = (database_ops._manager, database_ops.RECIPE_SETS_DIR)
+        self.addCleanup(self._restore, previous)
+        database_ops.configure(
+            db_path=self.db_path, sets_dir=os.path.join(self.tmpdir.name, "sets")
+        )
+        database_ops.setup_database()
+
+    @staticmethod
+    def _restore(previous):
+        database_ops.close_connections()
+        database_ops._manager, database_ops.RECIPE_SETS_DIR = previous
+        database_ops._set_managers.clear()
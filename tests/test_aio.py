@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+from mc_calculator import aio, database_ops, traversal
+from mc_calculator.exceptions import CalculationCancelledError
+from mc_calculator import recipe_logic as rl
+from mc_calculator.recipe import Recipe
+from helpers import TemporaryDatabaseTestCase
+
+
+class TestAsyncAPI(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        database_ops.save_recipe_to_db(
+            Recipe("Ingot", "ctable3", ingredients={"Ore": 1})
+        )
+        database_ops.save_recipe_to_db(
+            Recipe("Plate", "ctable3", 2, nested_recipes={1: 3})
+        )
+
+    def tearDown(self):
+        aio.shutdown()
+
+    def test_queries_run_off_loop(self):
+        async def scenario():
+            recipe = await aio.fetch_recipe_by_name("Plate")
+            recipes = await aio.list_recipes()
+            return recipe, recipes
+
+        recipe, recipes = asyncio.run(scenario())
+        self.assertEqual(recipe.output_count, 2)
+        self.assertEqual(recipes, [(1, "Ingot", 1), (2, "Plate", 2)])
+
+    def test_calculate_matches_sync(self):
+        ingredients, steps = asyncio.run(aio.calculate("Plate", 4))
+        plate = database_ops.fetch_recipe_by_name("Plate")
+        self.assertEqual((ingredients, steps), rl.calculate(plate, 4))
+        with self.assertRaises(ValueError):
+            asyncio.run(aio.calculate("Nothing", 1))
+
+    def test_identical_requests_are_coalesced(self):
+        calls = []
+        original = rl.calculate
+
+        def slow_calculate(*args):
+            calls.append(threading.current_thread().name)
+            time.sleep(0.05)
+            return original(*args)
+
+        async def scenario():
+            return await asyncio.gather(
+                *(aio.calculate("Plate", 4) for _ in range(5)),
+                aio.calculate("Plate", 6),
+            )
+
+        with mock.patch.object(rl, "calculate", slow_calculate):
+            results = asyncio.run(scenario())
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(
+            all(name.startswith("mc-calculator-compute") for name in calls)
+        )
+        self.assertTrue(all(result is results[0] for result in results[:5]))
+
+    def test_cancelling_last_waiter_cancels_computation(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_list(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return []
+
+        async def scenario():
+            first = asyncio.ensure_future(aio.list_recipes())
+            second = asyncio.ensure_future(aio.list_recipes())
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            (shared,) = aio._inflight.values()
+            first.cancel()
+            await asyncio.sleep(0)
+            self.assertFalse(shared.task.done())  # second is still waiting
+            second.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await shared.task
+            await asyncio.sleep(0)
+            self.assertEqual(aio._inflight, {})
+            release.set()
+            for task in (first, second):
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+        with mock.patch.object(database_ops, "list_recipes", blocking_list):
+            asyncio.run(scenario())
+
+    def test_cancelling_stops_a_running_calculation(self):
+        started = threading.Event()
+        stopped = []
+
+        def long_calculate(*args):
+            started.set()
+            # Stands in for a long walk, which checks the event per recipe.
+            stopped.append(traversal.cancel_event().wait(5))
+            raise CalculationCancelledError()
+
+        async def scenario():
+            task = asyncio.ensure_future(aio.calculate("Plate", 4))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with mock.patch.object(rl, "calculate", long_calculate):
+            asyncio.run(scenario())
+            aio.shutdown()
+        self.assertEqual(stopped, [True])
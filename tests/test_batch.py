@@ -0,0 +1,95 @@
+import unittest
+from mc_calculator import batch
+from mc_calculator.batch import calculate_batch
+from mc_calculator.recipe import Recipe
+from mc_calculator.recipe_graph import RecipeGraph
+from mc_calculator.recipe_logic import calculate, calculate_aggregated
+from helpers import build_graph
+
+
+class TestCalculateBatch(unittest.TestCase):
+    def setUp(self):
+        self.graph = build_graph()
+        self.requests = [
+            (name, quantity)
+            for quantity in (0, 1, 2, 5, 13, 100)
+            for name in ("Machine", "Gear", "Iron Plate", "Iron Ingot")
+        ]
+        self.addCleanup(setattr, batch, "np", batch.np)
+
+    def check(self, aggregate):
+        reference = calculate_aggregated if aggregate else calculate
+        result = calculate_batch(self.requests, self.graph, aggregate=aggregate)
+        self.assertEqual(len(result), len(self.requests))
+        for index, (name, quantity) in enumerate(self.requests):
+            recipe = self.graph.recipe(self.graph.node_by_name(name))
+            expected = reference(recipe, quantity, self.graph)
+            self.assertEqual(result.result(index), expected)
+
+            ingredients, steps = expected
+            for ingredient, total in ingredients.items():
+                column = result.ingredient_names.index(ingredient)
+                self.assertEqual(result.totals[index][column], total)
+            for step_name, runs, _, _, waste in steps:
+                column = result.step_names.index(step_name)
+                self.assertEqual(result.runs[index][column], runs)
+                self.assertEqual(result.waste[index][column], waste)
+
+    def test_matches_calculate(self):
+        self.check(aggregate=False)
+
+    def test_matches_calculate_aggregated(self):
+        self.check(aggregate=True)
+
+    def test_pure_python_fallback(self):
+        batch.np = None
+        batch._plans.clear()
+        self.addCleanup(batch._plans.clear)
+        self.check(aggregate=False)
+        self.check(aggregate=True)
+        self.assertIsInstance(calculate_batch([(5, 3)], self.graph).totals, list)
+
+    def test_shared_sub_recipes_do_not_unroll(self):
+        # Every level uses both recipes of the next one: 2**25 branches.
+        levels = 25
+        recipes = []
+        for level in range(levels + 1):
+            for side, name in ((1, "Left"), (2, "Right")):
+                recipe = Recipe(f"{name} {level}", "ctable3", side + 1)
+                if level:
+                    recipe.nested_recipes = {2 * level - 1: 2, 2 * level: 1}
+                else:
+                    recipe.ingredients = {"Ore": side}
+                recipes.append((2 * level + side, recipe))
+        graph = RecipeGraph.build(recipes)
+        top = graph.recipe(graph.node_by_name(f"Left {levels}"))
+        for aggregate, reference in ((False, calculate), (True, calculate_aggregated)):
+            result = calculate_batch(
+                [(f"Left {levels}", 7), (f"Left {levels}", 100)], graph, aggregate
+            )
+            self.assertEqual(result.result(0), reference(top, 7, graph))
+            self.assertEqual(result.result(1), reference(top, 100, graph))
+
+    def test_large_quantities_do_not_overflow(self):
+        # Demand grows tenfold per level, past the range of int64.
+        recipes = [(1, Recipe("Level 0", "ctable3", ingredients={"Ore": 1}))]
+        for level in range(1, 24):
+            recipe = Recipe(f"Level {level}", "ctable3", nested_recipes={level: 10})
+            recipes.append((level + 1, recipe))
+        graph = RecipeGraph.build(recipes)
+        top = graph.recipe(graph.node_by_name("Level 23"))
+        for quantity in (10, 10**4):
+            result = calculate_batch([("Level 23", quantity)], graph)
+            expected = calculate(top, quantity, graph)
+            self.assertEqual(result.result(0), expected)
+            self.assertEqual(result.totals[0][0], expected[0]["Ore"])
+        result = calculate_batch([("Level 23", 10)], graph)
+        self.assertEqual(result.totals[0][0], 10**24)
+
+    def test_unknown_recipe(self):
+        with self.assertRaises(ValueError):
+            calculate_batch([("Nothing", 1)], self.graph)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import sqlite3
+import unittest
+from benchmarks import generators, suite
+from mc_calculator.recipe_graph import load_graph
+
+
+class TestGenerators(unittest.TestCase):
+    def test_shapes_load_with_both_loaders(self):
+        for shape, build in generators.SHAPES.items():
+            recipes = build(40)
+            for loader in ("save", "import"):
+                with self.subTest(shape=shape, loader=loader):
+                    conn = sqlite3.connect(":memory:")
+                    generators.populate(recipes, conn, loader)
+                    graph = load_graph(conn=conn)
+                    self.assertEqual(len(graph), len(recipes))
+                    root = graph.node_by_name(recipes[-1].name)
+                    # Every recipe is reachable from the root except in
+                    # the random graph, which only samples recent ones.
+                    order = graph.topological_order([root])
+                    self.assertEqual(order[0], root)
+                    if shape != "random":
+                        self.assertEqual(len(order), len(recipes))
+                    conn.close()
+
+
+class TestCompare(unittest.TestCase):
+    def test_flags_regressions(self):
+        baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 2.0}}}
+        current = {
+            "results": {
+                "a": {"median": 1.05},
+                "b": {"median": 3.0},
+                "c": {"median": 1.0},
+            }
+        }
+        rows = {row["name"]: row for row in suite.compare(baseline, current, 0.1)}
+        self.assertEqual(set(rows), {"a", "b"})
+        self.assertFalse(rows["a"]["regressed"])
+        self.assertTrue(rows["b"]["regressed"])
+        self.assertAlmostEqual(rows["b"]["ratio"], 1.5)
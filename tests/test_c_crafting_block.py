@@ -1,5 +1,5 @@
 import unittest
-from mc_calculator.c_crafting_block import CraftingBlock
+from mc_calculator.crafting_block import CraftingBlock
 
 
 class TestCraftingBlock(unittest.TestCase):
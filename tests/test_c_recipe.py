@@ -1,6 +1,9 @@
+import json
 import unittest
-from mc_calculator.c_crafting_block import CraftingBlock
-from mc_calculator.c_recipe import Recipe
+from array import array
+from mc_calculator.crafting_block import CraftingBlock
+from mc_calculator import recipe
+from mc_calculator.recipe import Recipe
 
 
 class TestRecipe(unittest.TestCase):
@@ -34,6 +37,131 @@ class TestRecipe(unittest.TestCase):
         self.assertEqual(deserialized.name, recipe.name)
         self.assertEqual(deserialized.crafting_block.name, recipe.crafting_block.name)
 
+    def test_compact_storage_views(self):
+        recipe = Recipe("Torch", "ctable3", 4, ingredients={"Coal": 1, "Stick": 1})
+        self.assertFalse(hasattr(recipe, "__dict__"))
+        self.assertEqual(list(recipe.ingredients.items()), [("Coal", 1), ("Stick", 1)])
+        self.assertEqual(recipe.ingredients.get("Coal"), 1)
+        self.assertNotIn("Diamond", recipe.ingredients)
+
+        recipe.ingredients["Coal"] = 2
+        recipe.ingredients["Resin"] = 3
+        del recipe.ingredients["Stick"]
+        self.assertEqual(recipe.ingredients, {"Coal": 2, "Resin": 3})
+
+        other = Recipe("Lamp", "ctable3", ingredients={"Coal": 5})
+        self.assertEqual(other._ingredient_ids[0], recipe._ingredient_ids[0])
+
+    def test_nested_recipe_keys_are_ints(self):
+        recipe = Recipe.from_json(
+            Recipe("Torch", "ctable3").to_json(), '{"1": 2, "42": 3}'
+        )
+        self.assertEqual(recipe.nested_recipes, {1: 2, 42: 3})
+        self.assertEqual(list(recipe.nested_recipes), [1, 42])
+        self.assertEqual(recipe.nested_recipes["42"], 3)
+
+    def test_to_json_format(self):
+        recipe = Recipe(
+            "Torch", "ctable3", 4, ingredients={"Coal": 1}, nested_recipes={7: 1}
+        )
+        self.assertEqual(
+            json.loads(recipe.to_json()),
+            {
+                "name": "Torch",
+                "crafting_block": "ctable3",
+                "output_count": 4,
+                "shaped": False,
+                "slots": {},
+                "ingredients": {"Coal": 1},
+                "nested_recipes": {"7": 1},
+            },
+        )
+
+    def test_binary_round_trip_is_lazy(self):
+        recipe = Recipe(
+            "Torch",
+            "ctable3",
+            4,
+            shaped=True,
+            slots={"1": "Coal"},
+            ingredients={"Coal": 1, "Stick": 2},
+            nested_recipes={5: 3, 9: 1},
+        )
+        payload = recipe.to_bytes()
+        self.assertTrue(Recipe.is_binary(payload))
+        self.assertFalse(Recipe.is_binary(recipe.to_json()))
+
+        decoded = Recipe.from_row(payload)
+        self.assertIsInstance(decoded._nested_ids, memoryview)
+        self.assertEqual(decoded.nested_recipes, {5: 3, 9: 1})
+        self.assertEqual((decoded.name, decoded.output_count), ("Torch", 4))
+        with self.assertRaises(AttributeError):  # Names not decoded yet
+            object.__getattribute__(decoded, "_ingredient_ids")
+        self.assertEqual(decoded.ingredients, {"Coal": 1, "Stick": 2})
+        self.assertEqual(decoded.slots, {"1": "Coal"})
+        self.assertEqual(decoded.to_dict(), recipe.to_dict())
+
+        decoded.nested_recipes[5] = 1
+        self.assertEqual(decoded.nested_recipes, {5: 1, 9: 1})
+        self.assertEqual(Recipe.from_bytes(payload).nested_recipes, {5: 3, 9: 1})
+
+    def test_invalid_binary_payload(self):
+        with self.assertRaises(ValueError):
+            Recipe.from_bytes(b"XYZ" + bytes(21))
+
+    def test_quantities_up_to_int64(self):
+        large = Recipe(
+            "Block",
+            "ctable3",
+            ingredients={"Ore": 2**40},
+            nested_recipes={1: recipe.MAX_QUANTITY},
+        )
+        large.ingredients["Coal"] = 2**33
+        self.assertEqual(large.ingredients, {"Ore": 2**40, "Coal": 2**33})
+        self.assertEqual(Recipe.from_bytes(large.to_bytes()).to_dict(), large.to_dict())
+        self.assertEqual(Recipe.from_json(large.to_json()).to_dict(), large.to_dict())
+        for quantity in (-1, recipe.MAX_QUANTITY + 1):
+            with self.assertRaises(ValueError):
+                Recipe("Block", "ctable3", ingredients={"Ore": quantity})
+            with self.assertRaises(ValueError):
+                large.nested_recipes[1] = quantity
+        self.assertEqual(large.nested_recipes, {1: recipe.MAX_QUANTITY})
+
+    def test_reads_version_1_binary_payloads(self):
+        # Version 1 stored quantities as uint32; rebuild such a payload from
+        # a current one, whose sections are int64 but for the name lengths.
+        torch = Recipe(
+            "Torch",
+            "ctable3",
+            4,
+            ingredients={"Coal": 1, "Stick": 2},
+            nested_recipes={5: 3},
+        )
+        payload = torch.to_bytes()
+        header = bytearray(payload[: recipe._HEADER_SIZE])
+        header[3] = 1
+
+        def pad(data):
+            return data + b"\0" * (-len(data) % 8)
+
+        sections = [
+            array("q", [5]),
+            array("I", [3]),
+            array("I", [1, 2]),
+            array("H", [4, 5]),
+        ]
+        strings = payload[recipe._HEADER_SIZE + 8 * 4 + 8 :]
+        v1 = bytes(header) + b"".join(pad(s.tobytes()) for s in sections) + strings
+        self.assertEqual(Recipe.from_bytes(v1).to_dict(), torch.to_dict())
+
+    def test_views_must_implement_key_mapping(self):
+        class ItemsOnly(recipe._ArrayMappingView):
+            def _encode(self, key, create=False):
+                return None
+
+        with self.assertRaises(TypeError):
+            ItemsOnly(Recipe(**self.recipe_data))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from mc_calculator.cache import VersionedLRUCache
+
+
+class TestVersionedLRUCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = VersionedLRUCache(maxsize=2)
+        cache.put(1, "a", 1)
+        cache.put(1, "b", 2)
+        self.assertEqual(cache.get(1, "a"), 1)  # "b" is now least recent
+        cache.put(1, "c", 3)
+        self.assertIsNone(cache.get(1, "b"))
+        self.assertEqual(cache.get(1, "c"), 3)
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.evictions), (2, 1, 1))
+        self.assertEqual(info.currsize, 2)
+
+    def test_version_change_invalidates(self):
+        cache = VersionedLRUCache()
+        cache.put(1, "a", 1)
+        self.assertIsNone(cache.get(2, "a"))
+        self.assertEqual(cache.info().invalidations, 1)
+        cache.put(2, "a", 5)
+        self.assertEqual(cache.get(2, "a"), 5)
+
+    def test_rebase_keeps_valid_entries(self):
+        cache = VersionedLRUCache()
+        for key in ((1, 10), (2, 10), (3, 10)):
+            cache.put("v1", key, key[0])
+        self.assertEqual(cache.rebase("v1", "v2", lambda key: key[0] == 2), 1)
+        self.assertEqual(cache.get("v2", (1, 10)), 1)
+        self.assertIsNone(cache.get("v2", (2, 10)))
+        self.assertEqual(cache.info().invalidations, 0)
+        # Rebasing from a version the cache no longer holds changes nothing.
+        self.assertEqual(cache.rebase("v1", "v3", lambda key: False), 0)
+        self.assertIsNone(cache.get("v3", (1, 10)))
+
+    def test_scopes_have_their_own_versions(self):
+        cache = VersionedLRUCache()
+        cache.put(1, "a", 1, scope="x")
+        cache.put(7, "a", 2, scope="y")
+        self.assertEqual(cache.get(1, "a", "x"), 1)
+        self.assertEqual(cache.get(7, "a", "y"), 2)
+        self.assertEqual(cache.info().invalidations, 0)
+        self.assertIsNone(cache.get(2, "a", "x"))
+        self.assertEqual(cache.get(7, "a", "y"), 2)
+        self.assertEqual(cache.rebase(7, 8, lambda key: False, "y"), 0)
+        self.assertEqual(cache.get(8, "a", "y"), 2)
+
+    def test_disabled_cache(self):
+        cache = VersionedLRUCache(maxsize=0)
+        cache.put(1, "a", 1)
+        self.assertIsNone(cache.get(1, "a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Wall-clock budget for a one-shot calculation, interpreter start included.
+COLD_START_TARGET = 1.0
+
+RECIPES = """\
+{"name": "Iron Plate", "output_count": 2, "ingredients": {"Iron Ingot": 3}}
+{"name": "Gear", "output_count": 3, "ingredients": {"Stick": 1}, "nested_recipes": {"Iron Plate": 3}}
+"""
+
+
+class TestCommandLine(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = os.path.join(self.tmpdir.name, "recipes.db")
+        path = os.path.join(self.tmpdir.name, "recipes.jsonl")
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(RECIPES)
+        self.run_cli("import", path)
+
+    def run_cli(self, *args, check=True):
+        env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT)
+        return subprocess.run(
+            [sys.executable, "-m", "mc_calculator", "--db", self.db_path, *args],
+            cwd=self.tmpdir.name,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=check,
+        )
+
+    def test_calc_json(self):
+        args = ("calc", "--recipe", "Gear", "--qty", "5", "--format", "json")
+        result = json.loads(self.run_cli(*args).stdout)
+        self.assertEqual(result["ingredients"], {"Stick": 2, "Iron Ingot": 9})
+        self.assertEqual(result["steps"][0]["name"], "Iron Plate")
+        self.assertEqual(result["steps"][0]["runs"], 3)
+
+    def test_calc_step_formats(self):
+        args = ("calc", "--recipe", "Gear", "--qty", "5", "--format")
+        self.assertEqual(
+            self.run_cli(*args, "markdown").stdout,
+            "- **3x Iron Plate**: total output 6, waste 0; ingredients: 3 Iron Ingot\n",
+        )
+        rows = self.run_cli(*args, "csv").stdout.splitlines()
+        self.assertEqual(rows[0].split(",")[:3], ["depth", "name", "runs"])
+        self.assertEqual(rows[1].split(",")[:3], ["0", "Iron Plate", "3"])
+
+    def test_list_and_show(self):
+        listed = json.loads(self.run_cli("list", "--format", "json").stdout)
+        names = [recipe["name"] for recipe in listed]
+        self.assertEqual(names, ["Iron Plate", "Gear"])
+        shown = json.loads(self.run_cli("show", "Gear", "--format", "json").stdout)
+        self.assertEqual(shown["nested_recipes"], {"Iron Plate": 3})
+
+    def test_search_pages(self):
+        first = json.loads(
+            self.run_cli("search", "i", "--limit", "1", "--format", "json").stdout
+        )
+        self.assertEqual([r["name"] for r in first["recipes"]], ["Iron Plate"])
+        self.assertIsNone(first["next_after"])
+        page = self.run_cli("search", "--limit", "1")
+        self.assertEqual(page.stdout, "2. Gear (Output: 3)\n")
+        self.assertIn("--after 2", page.stderr)
+        page = self.run_cli("search", "--limit", "1", "--after", "2")
+        self.assertEqual(page.stdout, "1. Iron Plate (Output: 2)\n")
+
+    def test_recipe_sets(self):
+        path = os.path.join(self.tmpdir.name, "recipes.jsonl")
+        self.run_cli("--set", "vanilla", "import", path)
+        self.assertEqual(self.run_cli("--set", "gtnh", "list").stdout, "")
+        listed = json.loads(self.run_cli("sets", "--format", "json").stdout)
+        self.assertEqual(listed["sets"], ["gtnh", "vanilla"])
+        # gtnh has no Gear of its own, so the shared vanilla one is used.
+        args = ("calc", "--recipe", "Gear", "--qty", "5", "--format", "json")
+        result = json.loads(self.run_cli("--set", "gtnh", *args).stdout)
+        self.assertEqual(result["ingredients"], {"Stick": 2, "Iron Ingot": 9})
+        result = self.run_cli("--set", "../gtnh", "list", check=False)
+        self.assertEqual(result.returncode, 2)
+
+    def test_unknown_recipe_fails(self):
+        result = self.run_cli("calc", "--recipe", "Nope", check=False)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Recipe not found", result.stderr)
+
+    def test_invalid_numbers_are_usage_errors(self):
+        for args in (
+            ("calc", "--recipe", "Gear", "--qty", "0"),
+            ("calc", "--recipe", "Gear", "--qty", "-3"),
+            ("calc", "--recipe", "Gear", "--max-depth", "0"),
+            ("search", "--limit", "0"),
+            ("search", "--limit", "-1"),
+            ("serve", "--workers", "0"),
+        ):
+            with self.subTest(args=args):
+                result = self.run_cli(*args, check=False)
+                self.assertEqual(result.returncode, 2)
+                self.assertIn("must be a positive integer", result.stderr)
+                self.assertNotIn("Traceback", result.stderr)
+        for port in ("-1", "65536", "http"):
+            with self.subTest(port=port):
+                result = self.run_cli("serve", "--port", port, check=False)
+                self.assertEqual(result.returncode, 2)
+                self.assertIn("must be a port from 0 to 65535", result.stderr)
+
+    def test_cold_start(self):
+        start = time.perf_counter()
+        self.run_cli("calc", "--recipe", "Gear", "--format", "json")
+        self.assertLess(time.perf_counter() - start, COLD_START_TARGET)
+
+    def test_lazy_imports(self):
+        env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT)
+        code = "import sys, mc_calculator.__main__; print(sorted(sys.modules))"
+        output = subprocess.run(
+            [sys.executable, "-c", code], env=env, capture_output=True, text=True
+        ).stdout
+        self.assertNotIn("mc_calculator.recipe_logic", output)
+        self.assertNotIn("sqlite3", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,38 @@
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import threading
 import unittest
 import sqlite3
+from mc_calculator import aio, batch, database_ops, recipe_graph, recipe_io
 from mc_calculator.database_ops import (
+    ConnectionManager,
+    WriteQueue,
     setup_database,
     save_recipe_to_db,
+    fetch_dependent_ids,
+    fetch_recipe_by_id,
     fetch_recipe_by_name,
+    fetch_recipes_by_ids,
+    fetch_recipes_by_names,
+    list_recipes,
+    resolve_recipe_name,
+    search_recipes,
+    use_recipe_set,
+    update_recipe,
+    SCHEMA_VERSION,
 )
-from mc_calculator.c_recipe import Recipe
-from mc_calculator.c_crafting_block import CraftingBlock
+from mc_calculator.exceptions import RecipeCycleError
+from mc_calculator.recipe import Recipe
+from mc_calculator.recipe_logic import (
+    calculate,
+    calculate_ingredients,
+    expansion_cache,
+)
+from mc_calculator.crafting_block import CraftingBlock
+from helpers import TemporaryDatabaseTestCase
 
 
 class TestDatabaseOps(unittest.TestCase):
@@ -23,9 +49,9 @@ class TestDatabaseOps(unittest.TestCase):
         recipe = Recipe(
             "Test Recipe",
             crafting_block,
-            False,
-            {},
-            {"Ingredient1": 1, "Ingredient2": 2},
+            shaped=False,
+            slots={},
+            ingredients={"Ingredient1": 1, "Ingredient2": 2},
         )
         save_recipe_to_db(recipe, conn=self.conn)
         fetched_recipe = fetch_recipe_by_name("Test Recipe", conn=self.conn)
@@ -34,6 +60,467 @@ class TestDatabaseOps(unittest.TestCase):
         self.assertEqual(fetched_recipe.name, recipe.name)
         self.assertEqual(fetched_recipe.ingredients, recipe.ingredients)
 
+    def test_bulk_fetch_and_list_ids(self):
+        for name in ("A", "B", "C", "B"):
+            save_recipe_to_db(Recipe(name, "ctable3"), conn=self.conn)
+        self.conn.execute("DELETE FROM recipes WHERE name = 'A'")
+
+        recipes = list_recipes(conn=self.conn)
+        self.assertEqual(recipes, [(2, "B", 1), (3, "C", 1), (4, "B", 1)])
+
+        original = database_ops.MAX_QUERY_PARAMS
+        database_ops.MAX_QUERY_PARAMS = 2  # Force several chunks
+        try:
+            by_id = fetch_recipes_by_ids([1, 2, 3, 4], conn=self.conn)
+            by_name = fetch_recipes_by_names(["B", "C", "Z"], conn=self.conn)
+        finally:
+            database_ops.MAX_QUERY_PARAMS = original
+        self.assertEqual(
+            {recipe_id: recipe.name for recipe_id, recipe in by_id.items()},
+            {2: "B", 3: "C", 4: "B"},
+        )
+        self.assertEqual(sorted(by_name), [2, 3, 4])
+
+    def test_binary_and_json_rows_mix(self):
+        save_recipe_to_db(
+            Recipe("Plate", "ctable3", 2, ingredients={"Ingot": 3}), conn=self.conn
+        )
+        database_ops.set_recipe_encoding("binary")
+        try:
+            save_recipe_to_db(
+                Recipe(
+                    "Gear", "ctable3", ingredients={"Stick": 1}, nested_recipes={1: 4}
+                ),
+                conn=self.conn,
+            )
+        finally:
+            database_ops.set_recipe_encoding("json")
+        payload, nested_json = self.conn.execute(
+            "SELECT ingredients, nested_recipes_json FROM recipes WHERE id = 2"
+        ).fetchone()
+        self.assertTrue(Recipe.is_binary(payload))
+        self.assertIsNone(nested_json)
+
+        recipes = fetch_recipes_by_ids([1, 2], conn=self.conn)
+        self.assertEqual(recipes[1].ingredients, {"Ingot": 3})
+        self.assertEqual(recipes[2].name, "Gear")
+        self.assertEqual(recipes[2].ingredients, {"Stick": 1})
+        self.assertEqual(recipes[2].nested_recipes, {1: 4})
+        with self.assertRaises(ValueError):
+            database_ops.set_recipe_encoding("xml")
+
+    def test_update_recipe_and_dependents(self):
+        for recipe in (
+            Recipe("Ingot", "ctable3", ingredients={"Ore": 1}),
+            Recipe("Plate", "ctable3", nested_recipes={1: 2}),
+            Recipe("Gear", "ctable3", nested_recipes={2: 1}),
+            Recipe("Stick", "ctable3"),
+        ):
+            save_recipe_to_db(recipe, conn=self.conn)
+        version = database_ops.data_version()
+
+        update_recipe(
+            1, Recipe("Ingot", "ctable3", 2, ingredients={"Ore": 3}), conn=self.conn
+        )
+        ingot = fetch_recipe_by_id(1, conn=self.conn)
+        self.assertEqual((ingot.output_count, ingot.ingredients), (2, {"Ore": 3}))
+        self.assertEqual(
+            self.conn.execute(
+                "SELECT ingredient, quantity FROM recipe_ingredients "
+                "WHERE recipe_id = 1"
+            ).fetchall(),
+            [("Ore", 3)],
+        )
+        self.assertEqual(database_ops.changed_since(version), {1})
+        self.assertEqual(fetch_dependent_ids([1], conn=self.conn), {1, 2, 3})
+        self.assertEqual(fetch_dependent_ids([4, 99], conn=self.conn), {4})
+
+        # Moving Gear off Plate removes it from Ingot's dependents.
+        update_recipe(
+            3, Recipe("Gear", "ctable3", nested_recipes={4: 1}), conn=self.conn
+        )
+        self.assertEqual(fetch_dependent_ids([1], conn=self.conn), {1, 2})
+        self.assertEqual(database_ops.changed_since(version), {1, 3})
+
+        with self.assertRaises(ValueError):
+            update_recipe(99, Recipe("Nothing", "ctable3"), conn=self.conn)
+        database_ops.bump_data_version()
+        self.assertIsNone(database_ops.changed_since(version))
+
+    def test_cycles_are_rejected(self):
+        save_recipe_to_db(Recipe("Ingot", "ctable3"), conn=self.conn)
+        save_recipe_to_db(
+            Recipe("Plate", "ctable3", nested_recipes={1: 2}), conn=self.conn
+        )
+        with self.assertRaises(RecipeCycleError) as caught:
+            update_recipe(
+                2, Recipe("Plate", "ctable3", nested_recipes={2: 1}), conn=self.conn
+            )
+        self.assertEqual(caught.exception.cycle, ["Plate", "Plate"])
+        with self.assertRaises(RecipeCycleError) as caught:
+            update_recipe(
+                1, Recipe("Ingot", "ctable3", nested_recipes={2: 1}), conn=self.conn
+            )
+        self.assertEqual(caught.exception.cycle, ["Ingot", "Plate", "Ingot"])
+        self.assertEqual(
+            list_recipes(conn=self.conn), [(1, "Ingot", 1), (2, "Plate", 1)]
+        )
+        self.assertEqual(fetch_recipe_by_id(1, conn=self.conn).nested_recipes, {})
+
+    def test_missing_nested_recipes_are_rejected(self):
+        save_recipe_to_db(Recipe("Ingot", "ctable3"), conn=self.conn)
+        # Including the ID the recipe itself would get.
+        for nested_recipes in ({999: 1}, {1: 2, 2: 1, 999: 1}):
+            with self.assertRaisesRegex(ValueError, r"not found: (2, )?999$"):
+                save_recipe_to_db(
+                    Recipe("Plate", "ctable3", nested_recipes=nested_recipes),
+                    conn=self.conn,
+                )
+        with self.assertRaisesRegex(ValueError, "not found: 999$"):
+            update_recipe(
+                1, Recipe("Ingot", "ctable3", nested_recipes={999: 1}), conn=self.conn
+            )
+        self.assertEqual(list_recipes(conn=self.conn), [(1, "Ingot", 1)])
+
+    def test_search_recipes(self):
+        for name in ("iron", "Iron Plate", "IRON Ingot", "Irn", "Apple", "iron"):
+            save_recipe_to_db(Recipe(name, "ctable3"), conn=self.conn)
+        self.assertEqual(
+            search_recipes("Iron", limit=3, conn=self.conn),
+            [(1, "iron", 1), (6, "iron", 1), (3, "IRON Ingot", 1)],
+        )
+        # Keyset pages continue after the last ID, even within a shared name.
+        self.assertEqual(
+            search_recipes("Iron", limit=1, after=1, conn=self.conn),
+            [(6, "iron", 1)],
+        )
+        self.assertEqual(
+            search_recipes("iron", after=3, conn=self.conn), [(2, "Iron Plate", 1)]
+        )
+        names = [name for _, name, _ in search_recipes(conn=self.conn)]
+        self.assertEqual(names[:2], ["Apple", "Irn"])
+        self.assertEqual(search_recipes("Iron Plates", conn=self.conn), [])
+        with self.assertRaises(ValueError):
+            search_recipes(after=99, conn=self.conn)
+
+        plan = self.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM recipes WHERE name >= ? COLLATE NOCASE"
+            " AND name < ? COLLATE NOCASE ORDER BY name COLLATE NOCASE, id",
+            ("a", "b"),
+        ).fetchall()
+        self.assertIn("idx_recipes_name_nocase", plan[0][-1])
+
+
+class TestSchemaMigration(unittest.TestCase):
+    def setUp(self):
+        # A database as created by releases before schema versioning.
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript(
+            """
+            CREATE TABLE recipes (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                ingredients TEXT NOT NULL,
+                shaped BOOLEAN NOT NULL,
+                crafting_block TEXT NOT NULL,
+                output_count INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE TABLE flags (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        for name, ingredients, nested in (
+            ("Stick", {"Plank": 2}, {}),
+            ("Torch", {"Coal": 1}, {"1": 1, "42": 3}),
+        ):
+            recipe = Recipe(name, "ctable3", 4, ingredients=ingredients)
+            recipe.nested_recipes = nested
+            self.conn.execute(
+                "INSERT INTO recipes (name, ingredients, shaped, crafting_block,"
+                " output_count) VALUES (?, ?, 0, 'ctable3', 4)",
+                (name, recipe.to_json()),
+            )
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_legacy_database_is_migrated(self):
+        setup_database(conn=self.conn)
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        self.assertEqual(version, SCHEMA_VERSION)
+        self.assertEqual(
+            self.conn.execute(
+                "SELECT recipe_id, ingredient, quantity FROM recipe_ingredients"
+            ).fetchall(),
+            [(1, "Plank", 2), (2, "Coal", 1)],
+        )
+        # The link to the missing recipe 42 is dropped.
+        self.assertEqual(
+            self.conn.execute("SELECT * FROM recipe_edges").fetchall(), [(2, 1, 1)]
+        )
+        self.assertEqual(
+            fetch_recipe_by_name("Torch", conn=self.conn).nested_recipes,
+            {1: 1, 42: 3},
+        )
+
+        setup_database(conn=self.conn)  # Already current: a no-op
+        plan = self.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM recipes WHERE name = 'Torch'"
+        ).fetchall()
+        self.assertIn("idx_recipes_name", plan[0][-1])
+
+    def test_failed_migration_rolls_back(self):
+        self.conn.execute("CREATE TABLE recipe_edges (x)")
+        self.conn.commit()
+        with self.assertRaises(sqlite3.OperationalError):
+            setup_database(conn=self.conn)
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        self.assertEqual(version, 1)
+        tables = {
+            row[0]
+            for row in self.conn.execute("SELECT name FROM sqlite_master")
+        }
+        self.assertNotIn("recipe_ingredients", tables)
+
+
+class TestConnectionManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "recipes.db")
+        self.previous = database_ops._manager
+
+    def tearDown(self):
+        database_ops._manager.close()
+        database_ops._manager = self.previous
+        self.tmpdir.cleanup()
+
+    def test_connection_reused_per_thread(self):
+        manager = ConnectionManager(self.db_path, {"cache_size": -1000})
+        conn = manager.connection()
+        self.assertIs(manager.connection(), conn)
+        self.assertEqual(conn.execute("PRAGMA cache_size").fetchone()[0], -1000)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(manager.connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], conn)
+        manager.close()
+
+    def test_configure_routes_decorated_calls(self):
+        database_ops.configure(db_path=self.db_path)
+        setup_database()
+        crafting_block = CraftingBlock("ctable3", [1, 2, 3, 4, 5, 6, 7, 8, 9])
+        save_recipe_to_db(Recipe("Torch", crafting_block, 4, ingredients={"Coal": 1}))
+        self.assertEqual(fetch_recipe_by_name("Torch").output_count, 4)
+        self.assertIs(database_ops.get_connection(), database_ops.get_connection())
+
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT name FROM recipes").fetchone()
+        self.assertEqual(row, ("Torch",))
+
+
+class TestWriteQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "recipes.db")
+        self.manager = ConnectionManager(self.db_path)
+        self.conn = self.manager.connection()
+        setup_database(conn=self.conn)
+        self.conn.commit()
+
+    def tearDown(self):
+        self.manager.close()
+        self.tmpdir.cleanup()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def test_concurrent_writers_and_readers(self):
+        writers, saves_per_writer = 8, 50
+        write_queue = WriteQueue(self.db_path, flush_latency=0.01)
+        self.addCleanup(write_queue.close)
+        futures, errors, reads = [], [], []
+        done = threading.Event()
+
+        def write(writer):
+            for index in range(saves_per_writer):
+                recipe = Recipe(f"W{writer}-{index}", "ctable3", ingredients={"Ore": 1})
+                futures.append(write_queue.save_recipe(recipe))
+
+        def read():
+            manager = ConnectionManager(self.db_path)
+            conn = manager.connection()
+            try:
+                while not done.is_set():
+                    search_recipes("W", conn=conn)
+                    reads.append(len(list_recipes(conn=conn)))
+            except sqlite3.Error as exc:
+                errors.append(exc)
+            finally:
+                manager.close()
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        producers = [
+            threading.Thread(target=write, args=(writer,)) for writer in range(writers)
+        ]
+        for thread in readers + producers:
+            thread.start()
+        for thread in producers:
+            thread.join()
+        recipe_ids = [future.result(timeout=30) for future in futures]
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        total = writers * saves_per_writer
+        self.assertEqual(errors, [])
+        self.assertTrue(reads)
+        self.assertEqual(sorted(recipe_ids), list(range(1, total + 1)))
+        self.assertEqual(self.count(), total)
+        self.assertEqual(write_queue.writes, total)
+        self.assertLess(write_queue.batches, total / 4)
+        mode = self.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_failed_write_rolls_back_alone(self):
+        write_queue = WriteQueue(self.db_path, flush_latency=0.5)
+        first = write_queue.save_recipe(Recipe("A", "ctable3"))
+        # Would get ID 2, which does not exist yet.
+        missing = write_queue.save_recipe(
+            Recipe("Missing", "ctable3", nested_recipes={2: 1})
+        )
+        last = write_queue.save_recipe(Recipe("B", "ctable3", nested_recipes={1: 2}))
+        write_queue.close()
+        self.assertEqual((first.result(), last.result()), (1, 2))
+        self.assertRaises(ValueError, missing.result)
+        self.assertEqual(write_queue.batches, 1)
+        self.assertEqual(
+            list_recipes(conn=self.conn), [(1, "A", 1), (2, "B", 1)]
+        )
+        with self.assertRaises(RuntimeError):
+            write_queue.save_recipe(Recipe("C", "ctable3"))
+
+
+class TestRecipeSets(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # The shared set exists before other sets connect, so they attach it.
+        setup_database(recipe_set="vanilla")
+        for recipe in (
+            Recipe("Stick", "ctable3", 4, ingredients={"Planks": 2}),
+            Recipe("Torch", "ctable3", 4, ingredients={"Coal": 1, "Stick": 1}),
+        ):
+            save_recipe_to_db(recipe, recipe_set="vanilla")
+        with use_recipe_set("gtnh"):
+            setup_database()
+            save_recipe_to_db(
+                Recipe("Torch", "ctable3", 2, ingredients={"Coal": 1})
+            )
+
+    def test_sets_are_separate_databases(self):
+        self.assertEqual(database_ops.list_recipe_sets(), ["gtnh", "vanilla"])
+        self.assertIsNone(database_ops.current_recipe_set())
+        self.assertEqual(list_recipes(), [])
+        self.assertEqual(list_recipes(recipe_set="gtnh"), [(1, "Torch", 2)])
+        with use_recipe_set("vanilla"):
+            self.assertEqual(
+                database_ops.database_path(),
+                os.path.join(self.tmpdir.name, "sets", "vanilla.db"),
+            )
+            self.assertEqual(len(list_recipes()), 2)
+        for name in ("../default", "", ".hidden"):
+            with self.assertRaises(ValueError):
+                list_recipes(recipe_set=name)
+
+    def test_saves_only_invalidate_their_set(self):
+        with use_recipe_set("gtnh"):
+            graph = recipe_graph.get_graph()
+        with use_recipe_set("vanilla"):
+            vanilla_graph = recipe_graph.get_graph()
+            save_recipe_to_db(Recipe("Planks", "ctable3", 4, ingredients={"Log": 1}))
+            self.assertIsNot(recipe_graph.get_graph(), vanilla_graph)
+            self.assertEqual(len(recipe_graph.get_graph()), 3)
+        with use_recipe_set("gtnh"):
+            self.assertIs(recipe_graph.get_graph(), graph)
+
+    def test_write_queue_connects_like_its_set(self):
+        database_ops.configure(pragmas={"cache_size": "-4000"})
+        with use_recipe_set("gtnh"):
+            write_queue = WriteQueue()
+            self.addCleanup(write_queue.close)
+            writer = write_queue._manager.connection()
+            self.assertEqual(writer.execute("PRAGMA cache_size").fetchone()[0], -4000)
+            # The shared set is attached, so nesting its recipes is refused.
+            lamp = Recipe("Lamp", "ctable3", nested_recipes={2: 1})
+            with self.assertRaisesRegex(ValueError, "not found in this"):
+                write_queue.save_recipe(lamp).result(timeout=10)
+
+    def test_saves_bump_the_version_of_their_connections_database(self):
+        gtnh_path = database_ops.recipe_set_path("gtnh")
+        versions = database_ops.data_version(), database_ops.data_version(gtnh_path)
+        conn = sqlite3.connect(gtnh_path)
+        self.addCleanup(conn.close)
+        save_recipe_to_db(Recipe("Lamp", "ctable3"), conn=conn)
+        self.assertEqual(database_ops.data_version(), versions[0])
+        self.assertGreater(database_ops.data_version(gtnh_path), versions[1])
+
+    def test_sets_do_not_invalidate_each_others_cached_results(self):
+        lamp = {"gtnh": {1: 2}, "vanilla": {2: 2}}  # Torches
+        for name, nested_recipes in lamp.items():
+            save_recipe_to_db(
+                Recipe("Lamp", "ctable3", nested_recipes=nested_recipes),
+                recipe_set=name,
+            )
+        expansion_cache.clear()
+        batch._plans.clear()
+        misses = []
+        for _ in range(3):
+            for name in lamp:
+                with use_recipe_set(name):
+                    graph = recipe_graph.get_graph()
+                    calculate(graph.recipe(graph.node_by_name("Lamp")), 8, graph)
+                    batch.calculate_batch([("Lamp", 8)])
+            misses.append((expansion_cache.info().misses, batch._plans.info().misses))
+        self.assertEqual(misses[0], misses[-1])
+        self.assertEqual(batch._plans.info().misses, 2)
+        for cache in (expansion_cache, batch._plans):
+            self.assertEqual(cache.info().invalidations, 0)
+
+    def test_recipes_cannot_nest_shared_recipes(self):
+        with use_recipe_set("gtnh"):
+            lamp = Recipe("Lamp", "ctable3", nested_recipes={2: 1})
+            with self.assertRaisesRegex(ValueError, "not found in this .*: 2"):
+                save_recipe_to_db(lamp)
+            with self.assertRaisesRegex(ValueError, "not found in this .*: 2"):
+                update_recipe(1, lamp)
+            records = [{"name": "Lamp", "nested_recipes": {"Stick": 1}}]
+            with self.assertRaisesRegex(ValueError, "'vanilla' has Stick"):
+                recipe_io.import_recipes(records)
+            self.assertEqual(list_recipes(), [(1, "Torch", 2)])
+
+    def test_shared_set_lookups(self):
+        with use_recipe_set("gtnh"):
+            self.assertEqual(resolve_recipe_name("Stick"), ("vanilla", 1))
+            self.assertEqual(resolve_recipe_name("Torch"), ("gtnh", 1))
+            self.assertIsNone(resolve_recipe_name("Log"))
+        # The default database is not a recipe set and attaches nothing.
+        self.assertIsNone(resolve_recipe_name("Stick"))
+
+        output = io.StringIO()
+        with use_recipe_set("gtnh"), contextlib.redirect_stdout(output):
+            calculate_ingredients("Stick", 8)
+        self.assertIn("- 4 Planks", output.getvalue())
+        self.assertIsNone(database_ops.current_recipe_set())
+
+        async def calculate():
+            with use_recipe_set("gtnh"):
+                torch = await aio.calculate("Torch", 4)
+                stick = await aio.calculate("Stick", 8)
+            return torch[0], stick[0]
+
+        self.assertEqual(asyncio.run(calculate()), ({"Coal": 2}, {"Planks": 4}))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,72 @@
+import logging
+import unittest
+from mc_calculator.decorator import Histogram, auto_log, reset_timings, timing_snapshot
+
+LOGGER_NAME = "tests.decorator"
+
+
+class TestAutoLog(unittest.TestCase):
+    def setUp(self):
+        reset_timings()
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.logger.propagate = False
+
+    def tearDown(self):
+        self.logger.setLevel(logging.NOTSET)
+        reset_timings()
+
+    def test_disabled_logger_records_nothing(self):
+        self.logger.setLevel(logging.WARNING)
+        square = auto_log(LOGGER_NAME)(lambda x: x * x)
+        self.assertEqual(square(3), 9)
+        self.assertEqual(square.histogram.count, 0)
+
+    def test_enabled_logger_records_timings(self):
+        self.logger.setLevel(logging.INFO)
+
+        @auto_log(LOGGER_NAME)
+        def square(x):
+            return x * x
+
+        for i in range(5):
+            square(i)
+        stats = timing_snapshot()[f"{LOGGER_NAME}.square"]
+        self.assertEqual(stats["count"], 5)
+        self.assertGreater(stats["total_ns"], 0)
+        self.assertEqual(square.__name__, "square")
+
+    def test_sampling_interval(self):
+        self.logger.setLevel(logging.INFO)
+        identity = auto_log(LOGGER_NAME, sample_rate=0.25)(lambda x: x)
+        for i in range(20):
+            self.assertEqual(identity(i), i)
+        self.assertEqual(identity.histogram.count, 5)
+
+    def test_exceptions_are_timed_and_propagated(self):
+        self.logger.setLevel(logging.INFO)
+
+        @auto_log(LOGGER_NAME)
+        def fail():
+            raise KeyError("boom")
+
+        with self.assertRaises(KeyError):
+            fail()
+        self.assertEqual(fail.histogram.count, 1)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_stats(self):
+        histogram = Histogram("h")
+        for duration in (100, 200, 300, 5000):
+            histogram.record(duration)
+        stats = histogram.snapshot()
+        self.assertEqual(stats["count"], 4)
+        self.assertEqual(stats["min_ns"], 100)
+        self.assertEqual(stats["max_ns"], 5000)
+        self.assertEqual(stats["mean_ns"], 1400)
+        self.assertEqual(stats["p50_ns"], 256)
+        self.assertEqual(stats["p99_ns"], 5000)
+        self.assertEqual(sum(stats["buckets"].values()), 4)
+
+    def test_empty(self):
+        self.assertEqual(Histogram("h").percentile(0.5), 0)
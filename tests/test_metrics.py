@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from mc_calculator import metrics
+from mc_calculator.database_ops import (
+    ConnectionManager,
+    save_recipe_to_db,
+    setup_database,
+)
+from mc_calculator.recipe import Recipe
+from mc_calculator.recipe_graph import load_graph
+from mc_calculator.recipe_logic import calculate, calculate_aggregated, expansion_cache
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        expansion_cache.clear()
+        self.conn = sqlite3.connect(":memory:")
+        setup_database(conn=self.conn)
+        # Chain: Machine -> Gear -> Plate -> Ingot
+        save_recipe_to_db(
+            Recipe("Ingot", "ctable3", 1, ingredients={"Ore": 1}), conn=self.conn
+        )
+        save_recipe_to_db(
+            Recipe("Plate", "ctable3", 1, nested_recipes={1: 2}), conn=self.conn
+        )
+        save_recipe_to_db(
+            Recipe("Gear", "ctable3", 1, nested_recipes={2: 2}), conn=self.conn
+        )
+        self.machine = Recipe("Machine", "ctable3", 1, nested_recipes={3: 1, 2: 1})
+        save_recipe_to_db(self.machine, conn=self.conn)
+        self.graph = load_graph(conn=self.conn)
+
+    def tearDown(self):
+        metrics.enable(False)
+        metrics.reset()
+        self.conn.close()
+
+    def test_disabled_records_no_traversal(self):
+        calculate(self.machine, 1, self.graph)
+        snap = metrics.snapshot()
+        self.assertNotIn("nodes_visited", snap["counters"])
+        self.assertEqual(snap["timings"], {})
+
+    def test_traversal_counters(self):
+        metrics.enable()
+        calculate_aggregated(self.machine, 1, self.graph)
+        snap = metrics.snapshot()
+        self.assertEqual(snap["counters"]["nodes_visited"], 3)
+        self.assertEqual(snap["gauges"]["max_depth"], 3)
+        self.assertEqual(
+            snap["timings"]["mc_calculator.recipe_logic.calculate_aggregated"][
+                "count"
+            ],
+            1,
+        )
+
+        metrics.reset()
+        calculate(self.machine, 1, self.graph)
+        snap = metrics.snapshot()
+        # Plate is expanded under Gear (2 runs) and directly (1 run).
+        self.assertEqual(snap["counters"]["nodes_visited"], 5)
+        self.assertEqual(snap["gauges"]["max_depth"], 3)
+        self.assertEqual(snap["caches"]["expansion"]["misses"], 5)
+
+    def test_queries_and_connections_counted(self):
+        metrics.enable()
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = ConnectionManager(os.path.join(tmp, "m.db"))
+            conn = manager.connection()
+            conn.execute("SELECT 1")
+            conn.execute("SELECT 2")
+            manager.close()
+        snap = metrics.snapshot()
+        self.assertEqual(snap["counters"]["db_connections_opened"], 1)
+        self.assertEqual(snap["counters"]["db_queries"], 2)
+
+    def test_prometheus_export(self):
+        metrics.enable()
+        calculate(self.machine, 1, self.graph)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metrics.prom")
+            metrics.write_prometheus(path)
+            with open(path, encoding="utf-8") as stream:
+                text = stream.read()
+        self.assertIn("mc_calculator_nodes_visited_total 5\n", text)
+        self.assertIn('mc_calculator_cache_misses_total{cache="expansion"} 5', text)
+        self.assertIn(
+            'mc_calculator_function_duration_seconds_count'
+            '{function="mc_calculator.recipe_logic.calculate"} 1',
+            text,
+        )
+        self.assertIn('le="+Inf"', text)
+        self.assertIn("Metrics:", metrics.format_report())
@@ -0,0 +1,43 @@
+import unittest
+from mc_calculator.parallel import calculate_many
+from mc_calculator.recipe_logic import calculate, calculate_aggregated
+from helpers import build_graph
+
+
+class TestCalculateMany(unittest.TestCase):
+    def setUp(self):
+        self.graph = build_graph()
+        self.requests = [
+            (name, quantity)
+            for quantity in (1, 5, 13, 100)
+            for name in ("Machine", "Gear", "Iron Plate", 1)
+        ]
+
+    def check(self, aggregate):
+        reference = calculate_aggregated if aggregate else calculate
+        results = calculate_many(
+            self.requests, self.graph, aggregate=aggregate, workers=2, chunk_size=3
+        )
+        self.assertEqual(len(results), len(self.requests))
+        for (recipe, quantity), result in zip(self.requests, results):
+            if isinstance(recipe, str):
+                node = self.graph.node_by_name(recipe)
+            else:
+                node = self.graph.node(recipe)
+            expected = reference(self.graph.recipe(node), quantity, self.graph)
+            self.assertEqual(result, expected)
+
+    def test_matches_calculate(self):
+        self.check(aggregate=False)
+
+    def test_matches_calculate_aggregated(self):
+        self.check(aggregate=True)
+
+    def test_unknown_recipe(self):
+        self.assertEqual(calculate_many([], self.graph), [])
+        with self.assertRaises(ValueError):
+            calculate_many([("Nothing", 1)], self.graph, workers=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,365 @@
+import contextlib
+import io
+import math
+import sqlite3
+import threading
+import unittest
+from unittest import mock
+from mc_calculator import batch, database_ops, recipe_graph, traversal
+from mc_calculator.database_ops import (
+    setup_database,
+    save_recipe_to_db,
+    fetch_recipe_by_id,
+    fetch_recipe_by_name,
+    fetch_base_ingredients,
+)
+from mc_calculator.exceptions import (
+    CalculationCancelledError,
+    RecipeCycleError,
+    RecipeDepthError,
+)
+from mc_calculator.recipe import Recipe
+from mc_calculator.recipe_graph import RecipeGraph, load_graph
+from mc_calculator.recipe_logic import (
+    expansion_cache,
+    calculate,
+    calculate_aggregated,
+    calculate_base_ingredients,
+    print_steps,
+    select_and_calculate_recipe,
+)
+from helpers import TemporaryDatabaseTestCase
+
+
+def reference_base_ingredients(recipe, runs_needed, conn):
+    base = {}
+    for ingredient, quantity in recipe.ingredients.items():
+        base[ingredient] = base.get(ingredient, 0) + quantity * runs_needed
+    for nested_id, quantity_needed in recipe.nested_recipes.items():
+        nested = fetch_recipe_by_id(int(nested_id), conn=conn)
+        if nested:
+            runs = math.ceil(quantity_needed * runs_needed / nested.output_count)
+            for ing, qty in reference_base_ingredients(nested, runs, conn).items():
+                base[ing] = base.get(ing, 0) + qty
+    return base
+
+
+class TestRecipeGraph(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        setup_database(conn=self.conn)
+        save_recipe_to_db(
+            Recipe("Iron Ingot", "ctable3", 1, ingredients={"Iron Ore": 1}),
+            conn=self.conn,
+        )
+        save_recipe_to_db(
+            Recipe("Iron Plate", "ctable3", 2, nested_recipes={1: 3}), conn=self.conn
+        )
+        save_recipe_to_db(
+            Recipe(
+                "Gear",
+                "ctable3",
+                3,
+                ingredients={"Stick": 1},
+                nested_recipes={2: 3},
+            ),
+            conn=self.conn,
+        )
+        # Machine also nests a missing recipe, which save_recipe_to_db() now
+        # rejects but databases saved before it checked nested IDs can have.
+        with mock.patch.object(database_ops, "_check_nested_recipes"):
+            save_recipe_to_db(
+                Recipe(
+                    "Machine",
+                    "ctable3",
+                    1,
+                    ingredients={"Redstone": 2},
+                    nested_recipes={3: 2, 2: 3, 99: 1},
+                ),
+                conn=self.conn,
+            )
+        self.graph = load_graph(conn=self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_graph_structure(self):
+        self.assertEqual(len(self.graph), 4)
+        machine = self.graph.node_by_name("Machine")
+        self.assertEqual(self.graph.recipe_ids[machine], 4)
+        children = {
+            self.graph.names[child]: qty
+            for child, qty in self.graph.children(machine)
+        }
+        self.assertEqual(children, {"Gear": 2, "Iron Plate": 3})
+        rebuilt = self.graph.recipe(machine)
+        self.assertEqual(rebuilt.ingredients, {"Redstone": 2})
+        self.assertEqual(rebuilt.nested_recipes, {3: 2, 2: 3})
+
+    def test_binary_round_trip(self):
+        payload = self.graph.to_bytes()
+        loaded = RecipeGraph.from_bytes(bytearray(payload))
+        self.assertEqual(loaded.version, self.graph.version)
+        self.assertNotEqual(loaded.token, self.graph.token)
+        self.assertIsInstance(loaded.edge_child, memoryview)
+        for node in range(len(self.graph)):
+            self.assertEqual(
+                loaded.recipe(node).to_dict(), self.graph.recipe(node).to_dict()
+            )
+        machine = loaded.node_by_name("Machine")
+        self.assertEqual(loaded.node(4), machine)
+        self.assertEqual(
+            calculate(loaded.recipe(machine), 5, loaded),
+            calculate(self.graph.recipe(machine), 5, self.graph),
+        )
+        with self.assertRaises(ValueError):
+            RecipeGraph.from_bytes(b"MCR" + payload[3:])
+
+    def test_calculate_matches_database_lookups(self):
+        machine = fetch_recipe_by_name("Machine", conn=self.conn)
+        for quantity in (1, 2, 5, 17):
+            ingredients, steps = calculate(machine, quantity, self.graph)
+            runs = math.ceil(quantity / machine.output_count)
+            self.assertEqual(
+                ingredients, reference_base_ingredients(machine, runs, self.conn)
+            )
+            self.assertEqual([step[0] for step in steps], ["Gear", "Iron Plate"])
+
+    def test_calculate_base_ingredients(self):
+        gear = fetch_recipe_by_name("Gear", conn=self.conn)
+        self.assertEqual(
+            calculate_base_ingredients(gear, 7, self.graph),
+            reference_base_ingredients(gear, 7, self.conn),
+        )
+
+    def test_expansions_are_cached_per_graph(self):
+        expansion_cache.clear()
+        machine = fetch_recipe_by_name("Machine", conn=self.conn)
+        first = calculate(machine, 5, self.graph)
+        misses = expansion_cache.info().misses
+        self.assertEqual(calculate(machine, 5, self.graph), first)
+        info = expansion_cache.info()
+        self.assertEqual(info.misses, misses)
+        self.assertGreater(info.hits, 0)
+
+        # A recompiled graph never sees the previous graph's entries.
+        nail = Recipe("Nail", "ctable3", ingredients={"Iron Ore": 1})
+        save_recipe_to_db(nail, conn=self.conn)
+        calculate(machine, 5, load_graph(conn=self.conn))
+        self.assertEqual(expansion_cache.info().invalidations, 1)
+
+    def test_fetch_base_ingredients_matches_calculator(self):
+        for name in ("Iron Ingot", "Gear", "Machine"):
+            recipe = fetch_recipe_by_name(name, conn=self.conn)
+            recipe_id = self.graph.recipe_ids[self.graph.node_by_name(name)]
+            for runs in (1, 3, 10):
+                self.assertEqual(
+                    fetch_base_ingredients(recipe_id, runs, conn=self.conn),
+                    calculate_base_ingredients(recipe, runs, self.graph),
+                )
+
+    def test_fetch_base_ingredients_depth_limit(self):
+        self.assertEqual(
+            fetch_base_ingredients(3, 1, max_depth=2, conn=self.conn),
+            {"Stick": 1, "Iron Ore": 6},
+        )
+        with self.assertRaises(ValueError):
+            fetch_base_ingredients(3, 1, max_depth=1, conn=self.conn)
+
+    def test_parents_and_ancestors(self):
+        ingot = self.graph.node_by_name("Iron Ingot")
+        plate = self.graph.node_by_name("Iron Plate")
+        parents = sorted(self.graph.names[node] for node in self.graph.parents(plate))
+        self.assertEqual(parents, ["Gear", "Machine"])
+        ancestors = {self.graph.names[node] for node in self.graph.ancestors([ingot])}
+        self.assertEqual(ancestors, {"Iron Ingot", "Iron Plate", "Gear", "Machine"})
+        self.assertEqual(
+            recipe_graph.affected_recipe_ids(self.graph, [3, 42]), {3, 4, 42}
+        )
+
+    def test_topological_order(self):
+        machine = self.graph.node_by_name("Machine")
+        order = self.graph.topological_order([machine])
+        order = [self.graph.names[node] for node in order]
+        self.assertEqual(order, ["Machine", "Gear", "Iron Plate", "Iron Ingot"])
+
+    def test_calculate_aggregated_shares_leftovers(self):
+        machine = fetch_recipe_by_name("Machine", conn=self.conn)
+        ingredients, steps = calculate_aggregated(machine, 1, self.graph)
+        runs = {step[0]: step[1] for step in steps}
+        waste = {step[0]: step[4] for step in steps}
+        # Gear: 2 needed -> 1 run of 3. Iron Plate: 3 direct + 3 from Gear = 6
+        # -> 3 runs of 2, instead of rounding each branch up to 2 runs.
+        self.assertEqual(runs, {"Gear": 1, "Iron Plate": 3, "Iron Ingot": 9})
+        self.assertEqual(waste, {"Gear": 1, "Iron Plate": 0, "Iron Ingot": 0})
+        self.assertEqual(ingredients, {"Redstone": 2, "Stick": 1, "Iron Ore": 9})
+        per_branch, _ = calculate(machine, 1, self.graph)
+        self.assertLess(ingredients["Iron Ore"], per_branch["Iron Ore"])
+
+    def test_calculate_aggregated_chain_matches_calculate(self):
+        gear = fetch_recipe_by_name("Gear", conn=self.conn)
+        for quantity in (1, 4, 9):
+            self.assertEqual(
+                calculate_aggregated(gear, quantity, self.graph)[0],
+                calculate(gear, quantity, self.graph)[0],
+            )
+
+
+def chain_graph(depth, loop=False):
+    # R1 needs Ore, and each R(n) needs one R(n - 1). With loop, R1 needs
+    # the top recipe instead, closing the chain into a cycle.
+    first = {"nested_recipes": {depth: 1}} if loop else {"ingredients": {"Ore": 1}}
+    recipes = [(1, Recipe("R1", "ctable3", **first))]
+    for index in range(2, depth + 1):
+        recipes.append(
+            (index, Recipe(f"R{index}", "ctable3", nested_recipes={index - 1: 1}))
+        )
+    return RecipeGraph.build(recipes)
+
+
+class TestTraversal(unittest.TestCase):
+    def setUp(self):
+        expansion_cache.clear()
+        self.addCleanup(traversal.set_max_depth, traversal.MAX_DEPTH)
+
+    def test_cancelled_calculations_stop(self):
+        graph = chain_graph(50)
+        top = graph.recipe(len(graph) - 1)
+        event = threading.Event()
+        with traversal.cancellation(event):
+            self.assertEqual(calculate(top, 3, graph)[0], {"Ore": 3})
+            event.set()
+            expansion_cache.clear()
+            for calculator in (calculate, calculate_aggregated):
+                with self.assertRaises(CalculationCancelledError):
+                    calculator(top, 3, graph)
+        self.assertIsNone(traversal.cancel_event())
+
+    def test_deep_chain_does_not_recurse(self):
+        graph = chain_graph(5000)
+        top = graph.recipe(len(graph) - 1)
+        self.assertEqual(calculate(top, 3, graph)[0], {"Ore": 3})
+        self.assertEqual(calculate_aggregated(top, 3, graph)[0], {"Ore": 3})
+        self.assertEqual(
+            batch.calculate_batch([("R5000", 3)], graph).result(0),
+            calculate(top, 3, graph),
+        )
+
+    def test_max_depth(self):
+        graph = chain_graph(50)
+        traversal.set_max_depth(48)
+        with self.assertRaises(RecipeDepthError):
+            calculate(graph.recipe(49), 1, graph)
+        traversal.set_max_depth(49)
+        self.assertEqual(calculate(graph.recipe(49), 1, graph)[0], {"Ore": 1})
+        with self.assertRaises(ValueError):
+            traversal.set_max_depth(0)
+
+    def test_max_depth_applies_to_cached_expansions(self):
+        # R3 is nested both directly and, one level deeper, through R4.
+        graph = chain_graph(4)
+        traversal.set_max_depth(3)
+        for nested_recipes in ({3: 1, 4: 1}, {4: 1, 3: 1}):
+            expansion_cache.clear()
+            top = Recipe("Top", "ctable3", nested_recipes=nested_recipes)
+            with self.assertRaises(RecipeDepthError):
+                calculate(top, 1, graph)
+        # R4's expansion, cached while the limit allowed it, is too deep now.
+        top = Recipe("Top", "ctable3", nested_recipes={4: 1})
+        traversal.set_max_depth(4)
+        self.assertEqual(calculate(top, 1, graph)[0], {"Ore": 1})
+        traversal.set_max_depth(3)
+        with self.assertRaises(RecipeDepthError):
+            calculate(top, 1, graph)
+
+    def test_cycles_report_their_path(self):
+        graph = chain_graph(3, loop=True)
+        outside = Recipe("Machine", "ctable3", nested_recipes={3: 1})
+        for calculator in (calculate, calculate_aggregated):
+            with self.assertRaises(RecipeCycleError) as caught:
+                calculator(outside, 1, graph)
+            cycle = caught.exception.cycle
+            self.assertEqual(cycle[0], cycle[-1])
+            self.assertEqual(sorted(cycle[:-1]), ["R1", "R2", "R3"])
+            self.assertIn(" -> ".join(cycle), str(caught.exception))
+        edges = {1: [2, 3], 2: [3], 3: [2]}
+        self.assertEqual(traversal.find_cycle([1], edges.__getitem__), [2, 3, 2])
+        edges[3] = []
+        self.assertIsNone(traversal.find_cycle([1], edges.__getitem__))
+
+    def test_print_steps_deep_nesting(self):
+        steps = []
+        for index in range(1, 2001):
+            steps = [(f"R{index}", 1, 1, steps, 0)]
+        recipes = {
+            index: Recipe(f"R{index}", "ctable3") for index in range(1, 2001)
+        }
+        with mock.patch.object(
+            database_ops, "fetch_recipes_by_names", return_value=recipes
+        ), mock.patch.object(database_ops, "fetch_recipes_by_ids", return_value={}):
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                print_steps(steps)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 2000)
+        self.assertTrue(lines[0].startswith("- 1x Recipe R2000 "))
+        self.assertTrue(lines[-1].startswith("- 1x Recipe R1 "))
+
+
+class TestSelectiveInvalidation(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        save_recipe_to_db(Recipe("Ingot", "ctable3", ingredients={"Ore": 1}))
+        save_recipe_to_db(Recipe("Plate", "ctable3", 2, nested_recipes={1: 3}))
+        save_recipe_to_db(Recipe("Stick", "ctable3", 4, ingredients={"Plank": 2}))
+        save_recipe_to_db(Recipe("Torch", "ctable3", 4, nested_recipes={3: 1}))
+        expansion_cache.clear()
+        batch._plans.clear()
+
+    def cached_recipe_ids(self):
+        return {key[1][0] for key in expansion_cache._data}
+
+    def test_update_drops_only_dependents(self):
+        graph = recipe_graph.refresh_graph()
+        for name in ("Plate", "Torch"):
+            calculate_base_ingredients(graph.recipe(graph.node_by_name(name)), 2)
+        batch.calculate_batch([("Plate", 4), ("Torch", 4)])
+        # Expansions are cached for nested recipes, plans for batch roots.
+        self.assertEqual(self.cached_recipe_ids(), {1, 3})
+
+        database_ops.update_recipe(
+            1, Recipe("Ingot", "ctable3", ingredients={"Ore": 2})
+        )
+        graph = recipe_graph.get_graph()
+        self.assertEqual(self.cached_recipe_ids(), {3})
+        self.assertEqual({key[1][0] for key in batch._plans._data}, {4})
+        plate = graph.recipe(graph.node_by_name("Plate"))
+        self.assertEqual(calculate_base_ingredients(plate, 2), {"Ore": 12})
+        self.assertEqual(
+            batch.calculate_batch([("Plate", 4)]).result(0),
+            calculate(plate, 4, graph),
+        )
+
+        save_recipe_to_db(Recipe("Lamp", "ctable3", nested_recipes={4: 1}))
+        recipe_graph.get_graph()
+        self.assertEqual(self.cached_recipe_ids(), {1, 3})
+        self.assertEqual({key[1][0] for key in batch._plans._data}, {2, 4})
+
+
+class TestSelectAndCalculate(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        save_recipe_to_db(Recipe("Planks", "ctable3", 4, ingredients={"Oak Log": 1}))
+        save_recipe_to_db(Recipe("Planks", "ctable3", 4, ingredients={"Birch Log": 1}))
+
+    def test_calculates_the_selected_recipe(self):
+        output = io.StringIO()
+        answers = iter(["Planks", "2", "8"])  # Search, ID, quantity
+        with mock.patch("builtins.input", lambda prompt="": next(answers)):
+            with contextlib.redirect_stdout(output):
+                select_and_calculate_recipe()
+        self.assertIn("- 2 Birch Log", output.getvalue())
+        self.assertNotIn("Oak Log", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
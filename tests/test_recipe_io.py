@@ -0,0 +1,88 @@
+import io
+import sqlite3
+import unittest
+from unittest import mock
+from mc_calculator import database_ops
+from mc_calculator.database_ops import setup_database, fetch_recipe_by_name
+from mc_calculator.exceptions import RecipeCycleError
+from mc_calculator.recipe_io import (
+    import_recipes,
+    iter_export_records,
+    read_records,
+    write_records,
+)
+
+JSONL = """\
+{"name": "Gear", "output_count": 3, "ingredients": {"Stick": 1}, "nested_recipes": {"Iron Plate": 3}}
+{"name": "Iron Plate", "output_count": 2, "ingredients": {"Iron Ingot": 3}}
+
+{"name": "Machine", "ingredients": {"Redstone": 2}, "nested_recipes": {"Gear": 2, "Iron Plate": 1}}
+"""
+
+
+class TestRecipeIO(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        setup_database(conn=self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_import_resolves_names_in_second_pass(self):
+        records = read_records(io.StringIO(JSONL), "jsonl")
+        count = import_recipes(records, conn=self.conn)
+        self.assertEqual(count, 3)
+        machine = fetch_recipe_by_name("Machine", conn=self.conn)
+        self.assertEqual(machine.nested_recipes, {1: 2, 2: 1})
+        self.assertEqual(machine.ingredients, {"Redstone": 2})
+        self.assertEqual(
+            self.conn.execute("SELECT * FROM recipe_edges ORDER BY rowid").fetchall(),
+            [(1, 2, 3), (3, 1, 2), (3, 2, 1)],
+        )
+
+    def test_unknown_reference_rolls_back(self):
+        records = [{"name": "A", "nested_recipes": {"Missing": 1}}]
+        with self.assertRaises(ValueError):
+            import_recipes(records, conn=self.conn)
+        count = self.conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+        self.assertEqual(count, 0)
+
+    def test_cycle_rolls_back(self):
+        records = [
+            {"name": "A", "nested_recipes": {"B": 1}},
+            {"name": "B", "nested_recipes": {"A": 2}},
+        ]
+        with self.assertRaises(RecipeCycleError) as caught:
+            import_recipes(records, conn=self.conn)
+        self.assertEqual(caught.exception.cycle, ["A", "B", "A"])
+        count = self.conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+        self.assertEqual(count, 0)
+
+    def test_csv_round_trip(self):
+        import_recipes(read_records(io.StringIO(JSONL), "jsonl"), conn=self.conn)
+        exported = list(iter_export_records(conn=self.conn))
+        stream = io.StringIO()
+        self.assertEqual(write_records(exported, stream, "csv"), 3)
+
+        other = sqlite3.connect(":memory:")
+        self.addCleanup(other.close)
+        setup_database(conn=other)
+        stream.seek(0)
+        import_recipes(read_records(stream, "csv"), conn=other)
+        self.assertEqual(list(iter_export_records(conn=other)), exported)
+
+    def test_export_connects_when_iterated(self):
+        import_recipes(read_records(io.StringIO(JSONL), "jsonl"), conn=self.conn)
+        with mock.patch.object(
+            database_ops, "get_connection", return_value=self.conn
+        ) as get_connection:
+            records = iter_export_records()
+            get_connection.assert_not_called()
+            first = next(records)
+        self.assertEqual(first["nested_recipes"], {"Iron Plate": 3})
+        names = [record["name"] for record in records]
+        self.assertEqual(names, ["Iron Plate", "Machine"])
+
+
+if __name__ == "__main__":
+    unittest.main()
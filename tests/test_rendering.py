@@ -0,0 +1,122 @@
+import contextlib
+import csv
+import io
+import json
+import unittest
+from unittest import mock
+from mc_calculator import database_ops, rendering
+from mc_calculator.recipe import Recipe
+from mc_calculator.recipe_graph import RecipeGraph
+from mc_calculator.recipe_logic import calculate, print_steps
+
+RECIPES = {
+    1: Recipe("Iron Plate", "ctable3", output_count=2, ingredients={"Iron Ingot": 3}),
+    2: Recipe(
+        "Gear",
+        "ctable3",
+        output_count=3,
+        ingredients={"Stick": 1},
+        nested_recipes={1: 3},
+    ),
+}
+STEPS = [("Gear", 2, 3, [("Iron Plate", 3, 2, [], 0)], 1), ("Iron Plate", 1, 2, [], 1)]
+
+
+def fetch_by_names(names, conn=None):
+    return {
+        recipe_id: recipe
+        for recipe_id, recipe in RECIPES.items()
+        if recipe.name in set(names)
+    }
+
+
+def fetch_by_ids(recipe_ids, conn=None):
+    return {recipe_id: RECIPES[recipe_id] for recipe_id in recipe_ids}
+
+
+class TestRendering(unittest.TestCase):
+    def setUp(self):
+        self.graph = RecipeGraph.build(RECIPES.items())
+
+    def render(self, fmt, graph=None, steps=STEPS):
+        stream = io.StringIO()
+        rendering.render_steps(steps, rendering.make_sink(fmt, stream), graph)
+        return stream.getvalue()
+
+    def test_terminal_lines(self):
+        self.assertEqual(
+            self.render("text", self.graph).splitlines(),
+            [
+                "- 2x Recipe Gear (Total Output: 6 Gear , Waste: 1x Gear, "
+                "Ingredients: 1 Stick, 3 Iron Plate)",
+                "- 3x Recipe Iron Plate (Total Output: 6 Iron Plate Waste: None, "
+                "Ingredients: 3 Iron Ingot, )",
+                "- 1x Recipe Iron Plate (Total Output: 2 Iron Plate , "
+                "Waste: 1x Iron Plate, Ingredients: 3 Iron Ingot, )",
+            ],
+        )
+
+    def test_database_matches_graph_in_bulk(self):
+        with mock.patch.object(
+            database_ops, "fetch_recipes_by_names", side_effect=fetch_by_names
+        ) as by_names, mock.patch.object(
+            database_ops, "fetch_recipes_by_ids", side_effect=fetch_by_ids
+        ) as by_ids:
+            for fmt in rendering.FORMATS:
+                self.assertEqual(self.render(fmt), self.render(fmt, self.graph))
+        # One query for the recipes and one for their nested recipes per run.
+        self.assertEqual(by_names.call_count, len(rendering.FORMATS))
+        self.assertEqual(by_ids.call_count, len(rendering.FORMATS))
+
+    def test_structured_formats(self):
+        lines = self.render("jsonl", self.graph).splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record["depth"] for record in records], [0, 1, 0])
+        self.assertEqual(records[0]["nested_recipes"], {"Iron Plate": 3})
+        self.assertEqual(records[1]["total_output"], 6)
+
+        rows = list(csv.DictReader(io.StringIO(self.render("csv", self.graph))))
+        self.assertEqual([row["name"] for row in rows], [r["name"] for r in records])
+        self.assertEqual(json.loads(rows[0]["ingredients"]), {"Stick": 1})
+        self.assertEqual(
+            self.render("csv", self.graph, []), ",".join(rendering.CSV_FIELDS) + "\n"
+        )
+
+        markdown = self.render("markdown", self.graph).splitlines()
+        self.assertEqual(
+            markdown[1],
+            "  - **3x Iron Plate**: total output 6, waste 0; ingredients: "
+            "3 Iron Ingot",
+        )
+
+    def test_streams_in_chunks(self):
+        def steps():
+            for _ in range(10):
+                yield ("Iron Plate", 1, 2, [], 1)
+            raise AssertionError("consumed past the first chunk")
+
+        resolved = rendering.resolve_steps(steps(), self.graph, chunk_size=4)
+        self.assertEqual(next(resolved).name, "Iron Plate")
+
+    def test_print_steps_matches_calculate(self):
+        _, steps = calculate(RECIPES[2], 6, self.graph)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            print_steps(steps, self.graph)
+        self.assertEqual(
+            output.getvalue(),
+            "- 3x Recipe Iron Plate (Total Output: 6 Iron Plate Waste: None, "
+            "Ingredients: 3 Iron Ingot, )\n",
+        )
+
+    def test_sinks_must_implement_write(self):
+        class FinishOnly(rendering.StepSink):
+            def finish(self):
+                pass
+
+        with self.assertRaises(TypeError):
+            FinishOnly()
+
+
+if __name__ == "__main__":
+    unittest.main()
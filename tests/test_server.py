@@ -0,0 +1,123 @@
+import asyncio
+import http.client
+import json
+import socket
+import unittest
+from mc_calculator import aio, database_ops, server
+from mc_calculator import recipe_logic as rl
+from mc_calculator.recipe import Recipe
+from helpers import TemporaryDatabaseTestCase
+
+
+class TestServer(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        database_ops.save_recipe_to_db(
+            Recipe("Ingot", "ctable3", ingredients={"Ore": 1})
+        )
+        database_ops.save_recipe_to_db(
+            Recipe("Iron Plate", "ctable3", 2, nested_recipes={1: 3})
+        )
+
+    def tearDown(self):
+        aio.shutdown()
+
+    def _exchange(self, paths):
+        """Serves on a free port and GETs ``paths`` over one connection."""
+
+        def client(port):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            responses = []
+            for path in paths:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                responses.append(
+                    (
+                        response.status,
+                        response.getheader("Connection"),
+                        json.loads(response.read()),
+                    )
+                )
+            conn.close()
+            return responses
+
+        return self._serve(client)
+
+    def _serve(self, client):
+        """Serves on a free port while ``client(port)`` runs in a thread."""
+
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            ready = loop.create_future()
+            task = asyncio.ensure_future(server.serve("127.0.0.1", 0, 2, ready))
+            _, port = await ready
+            try:
+                return await loop.run_in_executor(None, client, port)
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        return asyncio.run(scenario())
+
+    def test_endpoints_over_keep_alive(self):
+        responses = self._exchange(
+            [
+                "/recipes",
+                "/recipes/Iron%20Plate",
+                "/calculate?recipe=Iron+Plate&qty=4",
+                "/calculate?recipe=Iron+Plate&qty=4&aggregate=1",
+            ]
+        )
+        for status, connection, _ in responses:
+            self.assertEqual(status, 200)
+            self.assertEqual(connection, "keep-alive")
+        recipes, detail, calculation, aggregated = (r[2] for r in responses)
+        self.assertEqual(
+            recipes,
+            [
+                {"id": 1, "name": "Ingot", "output_count": 1},
+                {"id": 2, "name": "Iron Plate", "output_count": 2},
+            ],
+        )
+        self.assertEqual(detail["nested_recipes"], {"Ingot": 3})
+        self.assertEqual(detail["crafting_block"], "ctable3")
+        plate = database_ops.fetch_recipe_by_name("Iron Plate")
+        ingredients, steps = rl.calculate(plate, 4)
+        self.assertEqual(
+            calculation, rl.calculation_to_dict("Iron Plate", 4, ingredients, steps)
+        )
+        self.assertEqual(aggregated["ingredients"], {"Ore": 6})
+
+    def test_errors(self):
+        responses = self._exchange(
+            [
+                "/recipes/Nothing",
+                "/calculate?recipe=Iron+Plate&qty=many",
+                "/calculate?recipe=Nothing",
+                "/nowhere",
+            ]
+        )
+        self.assertEqual([r[0] for r in responses], [404, 400, 404, 404])
+        self.assertTrue(all("error" in r[2] for r in responses))
+
+    def test_malformed_requests_get_bad_request(self):
+        def client(port):
+            replies = []
+            for request in (b"GARBAGE\r\n\r\n", b"GET / HTTP/1.1 extra\r\n\r\n"):
+                with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+                    sock.sendall(request)
+                    reply = b""
+                    while chunk := sock.recv(4096):
+                        reply += chunk
+                    replies.append(reply)
+            return replies
+
+        for reply in self._serve(client):
+            head, _, body = reply.partition(b"\r\n\r\n")
+            self.assertTrue(head.startswith(b"HTTP/1.1 400 Bad Request"))
+            self.assertIn(b"Connection: close", head)
+            self.assertEqual(json.loads(body), {"error": "Malformed request line"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import sqlite3
+import unittest
+from mc_calculator import database_ops, recipe_graph, snapshot
+from mc_calculator.recipe import Recipe
+from mc_calculator.recipe_logic import calculate
+from helpers import TemporaryDatabaseTestCase
+
+
+class TestSnapshot(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for recipe in (
+            Recipe("Ingot", "ctable3", ingredients={"Ore": 1}),
+            Recipe("Plate", "ctable3", 2, nested_recipes={1: 3}),
+            Recipe("Gear", "ctable3", ingredients={"Stick": 1}, nested_recipes={2: 2}),
+            Recipe("Plate", "ctable3", 4, ingredients={"Ore": 9}),
+        ):
+            database_ops.save_recipe_to_db(recipe)
+        self.path = snapshot.snapshot_path()
+        recipe_graph._graphs.clear()
+
+    def tearDown(self):
+        recipe_graph._graphs.clear()
+
+    def test_round_trip(self):
+        self.assertEqual(self.path, self.db_path + ".graph")
+        self.assertEqual(snapshot.write_snapshot(), 4)
+        compiled = recipe_graph.load_graph()
+        mapped = snapshot.load_snapshot()
+        self.assertIsInstance(mapped.edge_child, memoryview)
+        self.assertEqual(mapped.version, database_ops.data_version())
+        for node in range(len(compiled)):
+            self.assertEqual(
+                mapped.recipe(node).to_dict(), compiled.recipe(node).to_dict()
+            )
+        # Binary search finds the first of duplicate names, like the dicts.
+        self.assertEqual(mapped.node_by_name("Plate"), 1)
+        self.assertEqual(mapped.node(3), 2)
+        self.assertIsNone(mapped.node_by_name("Nope"))
+        self.assertIsNone(mapped.node(99))
+        gear = compiled.recipe(2)
+        self.assertEqual(calculate(gear, 7, mapped), calculate(gear, 7, compiled))
+
+    def test_get_graph_maps_fresh_snapshots_only(self):
+        snapshot.write_snapshot()
+        self.assertIsInstance(recipe_graph.get_graph().recipe_ids, memoryview)
+
+        # A write by another process leaves the snapshot stale.
+        recipe_graph._graphs.clear()
+        other = sqlite3.connect(self.db_path)
+        other.execute("UPDATE recipes SET output_count = 5 WHERE id = 1")
+        other.commit()
+        other.close()
+        self.assertIsNone(snapshot.load_snapshot())
+        graph = recipe_graph.get_graph()
+        self.assertNotIsInstance(graph.recipe_ids, memoryview)
+        self.assertEqual(graph.output_counts[0], 5)
+
+    def test_writes_by_other_processes_are_picked_up(self):
+        graph = recipe_graph.get_graph()
+        self.assertIs(recipe_graph.get_graph(), graph)
+        other = sqlite3.connect(self.db_path)
+        other.execute(
+            "INSERT INTO recipes (name, ingredients, shaped, crafting_block, "
+            "output_count) VALUES ('Bolt', '{}', 0, 'ctable3', 1)"
+        )
+        other.commit()
+        other.close()
+        fresh = recipe_graph.get_graph()
+        self.assertEqual(len(fresh), len(graph) + 1)
+        self.assertEqual(fresh.names[-1], "Bolt")
+
+        # A snapshot written by another process is mapped instead.
+        snapshot.write_snapshot()
+        other = sqlite3.connect(self.db_path)
+        other.execute("UPDATE recipes SET output_count = 5 WHERE id = 1")
+        other.commit()
+        other.close()
+        snapshot.write_snapshot()
+        mapped = recipe_graph.get_graph()
+        self.assertIsInstance(mapped.recipe_ids, memoryview)
+        self.assertEqual(mapped.output_counts[0], 5)
+        self.assertIs(recipe_graph.get_graph(), mapped)
+
+    def test_unusable_files_are_ignored(self):
+        self.assertIsNone(snapshot.load_snapshot())
+        for payload in (b"", b"MCSNAP", b"garbage" * 10):
+            with open(self.path, "wb") as stream:
+                stream.write(payload)
+            self.assertIsNone(snapshot.load_snapshot())
+        snapshot.write_snapshot()
+        with open(self.path, "rb") as stream:
+            payload = stream.read()
+        with open(self.path, "wb") as stream:
+            stream.write(payload[:-3])
+        self.assertIsNone(snapshot.load_snapshot())
+
+
+if __name__ == "__main__":
+    unittest.main()